@@ -0,0 +1,73 @@
+"""
+enrich-post: all text enrichment of a post in one call.
+
+Runs topic classification, keyword extraction, offensive word detection and
+sentiment analysis on one {"text": ..., "unique_id": ...} payload and returns
+one merged result, so the post's text crosses the network and is parsed once
+instead of once per function. The other functions' handlers are imported
+from this package, so in the gateway they are the same modules (and loaded
+models) their own endpoints use.
+
+A failing step doesn't fail the call: its error goes under "errors" and the
+other results are still returned.
+"""
+from importlib import import_module
+
+
+def _module(name: str):
+    return import_module(f"functions.{name}.handler")
+
+
+def topics(text: str, event: dict) -> list[dict]:
+    result = _module("categorize_post").handler({"text": text})
+    if "error" in result:
+        raise ValueError(result["error"])
+    return result["topics"]
+
+
+def keywords(text: str, event: dict) -> list[str]:
+    result = _module("extract_keywords").handler({"text": text, "max_count": event.get("max_count", 10)})
+    if result["status"] != "success":
+        raise ValueError(result["body"])
+    return result["body"]["keywords"]
+
+
+def offensive(text: str, event: dict) -> dict:
+    result = _module("offensive_word_detection").handler({"text": text})
+    if "error" in result:
+        raise ValueError(result["error"])
+    return result
+
+
+def sentiment(text: str, event: dict) -> dict:
+    # Same output as the `sentimentanalysis` store function
+    from textblob import TextBlob
+
+    blob = TextBlob(text)
+    return {
+        "polarity": blob.sentiment.polarity,
+        "subjectivity": blob.sentiment.subjectivity,
+        "sentence_count": len(blob.sentences),
+    }
+
+
+STEPS = {
+    "topics": topics,
+    "keywords": keywords,
+    "offensive": offensive,
+    "sentiment": sentiment,
+}
+
+
+def handler(event, context=None):
+    text = event.get("text", "")
+    if not text:
+        return {"error": "No text provided", "unique_id": event.get("unique_id")}
+
+    result = {"unique_id": event.get("unique_id")}
+    for name, step in STEPS.items():
+        try:
+            result[name] = step(text, event)
+        except Exception as e:
+            result.setdefault("errors", {})[name] = str(e)
+    return result
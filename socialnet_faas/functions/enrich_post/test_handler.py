@@ -0,0 +1,38 @@
+import pytest
+
+from . import handler as enrich_post
+from .handler import handler
+
+
+@pytest.fixture
+def steps(monkeypatch):
+    monkeypatch.setitem(enrich_post.STEPS, "topics", lambda text, event: [{"label": "music", "score": 0.9}])
+    monkeypatch.setitem(enrich_post.STEPS, "keywords", lambda text, event: ["new song"])
+    monkeypatch.setitem(enrich_post.STEPS, "offensive", lambda text, event: {"toxic": False, "found_words": [], "censored": text})
+    monkeypatch.setitem(enrich_post.STEPS, "sentiment", lambda text, event: {"polarity": 0.5, "subjectivity": 0.6, "sentence_count": 1})
+
+
+def test_enrich_post_merges_all_results(steps):
+    result = handler({"text": "I love this new song", "unique_id": 7})
+    assert result == {
+        "unique_id": 7,
+        "topics": [{"label": "music", "score": 0.9}],
+        "keywords": ["new song"],
+        "offensive": {"toxic": False, "found_words": [], "censored": "I love this new song"},
+        "sentiment": {"polarity": 0.5, "subjectivity": 0.6, "sentence_count": 1},
+    }
+
+
+def test_enrich_post_keeps_results_of_other_steps_on_failure(steps, monkeypatch):
+    def fail(text, event):
+        raise ValueError("model not loaded")
+
+    monkeypatch.setitem(enrich_post.STEPS, "topics", fail)
+    result = handler({"text": "I love this new song", "unique_id": 7})
+    assert "topics" not in result
+    assert result["errors"] == {"topics": "model not loaded"}
+    assert result["keywords"] == ["new song"]
+
+
+def test_enrich_post_without_text():
+    assert handler({"unique_id": 7}) == {"error": "No text provided", "unique_id": 7}
@@ -0,0 +1,31 @@
+from unittest.mock import patch
+
+import pytest
+from django_redis import get_redis_connection
+
+# Redis caches and buffers keyed by user or post id. Ids are reused between
+# tests, so keys left by a previous test would leak into the next one.
+CACHED_KEY_PATTERNS = ("engagement:*", "follows:*", "counters:*", "timeline:*", "faas:callbacks")
+
+
+@pytest.fixture(autouse=True)
+def clean_user_caches():
+    conn = get_redis_connection("default")
+    for pattern in CACHED_KEY_PATTERNS:
+        for key in conn.scan_iter(pattern):
+            conn.delete(key)
+    yield
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "faas: let new posts queue their FaaS enrichment")
+
+
+@pytest.fixture(autouse=True)
+def no_faas(request):
+    # Posts created in tests don't queue enrichment (see posts/signals.py) unless the test is marked `faas`.
+    if request.node.get_closest_marker("faas"):
+        yield
+        return
+    with patch("posts.signals._call_faas_for_post"):
+        yield
@@ -1,9 +1,12 @@
 import multiprocessing
+import os
 bind = "0.0.0.0:8000"
 
 # Vertical scaling knobs
 workers = max(2, multiprocessing.cpu_count() * 2 + 1)   # start point
 threads = 8                                             # adds concurrency without extra processes
+# Each thread holds at most one FaaS connection, so size the per-worker pool to match (faas/transport.py).
+os.environ.setdefault("FAAS_POOL_MAXSIZE", str(threads))
 worker_class = "gthread"                                # good general default for Django I/O mix
 timeout = 60
 graceful_timeout = 30
@@ -0,0 +1,132 @@
+"""
+Durable queue of FaaS callbacks.
+
+The callback view only appends each successful callback to the Redis stream
+FAAS_CALLBACK_STREAM and answers. `consume_faas_callbacks` workers read the
+stream as one consumer group. Each round collects callbacks for up to
+FAAS_CALLBACK_WINDOW seconds (or FAAS_CALLBACK_BATCH_SIZE of them), applies
+them with `services.apply_post_updates()`, which merges the updates per post
+and writes posts changing the same fields in one statement, and only then
+acknowledges and deletes the entries. Entries that can't be applied (bad
+results, values the database rejects) are logged and acknowledged with the
+rest rather than retried, so they never hold back a batch. Entries read by a
+worker that died before acknowledging them, or whose database was
+unavailable, are claimed by another worker once they have been pending for
+FAAS_CALLBACK_CLAIM_IDLE seconds.
+
+If the stream can't be written, the callback is applied in the request.
+"""
+import logging
+import time
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError, ResponseError
+
+from faas import services
+from faas.interface import FaasService
+
+logger = logging.getLogger(__name__)
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def submit(request):
+    """Queue the callback in `request`, or apply it right away when Redis is unavailable."""
+    callback = services.callback_from_request(request)
+    if callback is None:
+        return
+    function_name, call_id, body = callback
+    try:
+        _redis().xadd(
+            settings.FAAS_CALLBACK_STREAM,
+            {"function": function_name, "call_id": call_id, "body": body},
+            maxlen=settings.FAAS_CALLBACK_STREAM_MAXLEN,
+            approximate=True,
+        )
+    except RedisError as e:
+        logger.warning("Could not queue %s callback %s, applying it now: %s", function_name, call_id, e)
+        services.handle_faas_callback(function_name, call_id, body)
+
+
+def ensure_group(conn):
+    try:
+        conn.xgroup_create(settings.FAAS_CALLBACK_STREAM, settings.FAAS_CALLBACK_GROUP, id="0", mkstream=True)
+    except ResponseError as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+def read_batch(conn, consumer: str, batch_size: int, window: float) -> list[tuple[bytes, dict]]:
+    """Entries abandoned by other consumers, then new ones until the window closes or the batch is full."""
+    stream, group = settings.FAAS_CALLBACK_STREAM, settings.FAAS_CALLBACK_GROUP
+    _, claimed, *_ = conn.xautoclaim(
+        stream, group, consumer, min_idle_time=int(settings.FAAS_CALLBACK_CLAIM_IDLE * 1000), count=batch_size,
+    )
+    entries = [(entry_id, fields) for entry_id, fields in claimed if fields]
+
+    deadline = time.monotonic() + window
+    while len(entries) < batch_size:
+        # Block until the window closes, then only take what is already there (BLOCK 0 would wait forever).
+        block = int((deadline - time.monotonic()) * 1000)
+        response = conn.xreadgroup(
+            group, consumer, {stream: ">"}, count=batch_size - len(entries), block=block if block > 0 else None,
+        )
+        if not response:
+            break
+        for _, stream_entries in response:
+            entries.extend(stream_entries)
+    return entries
+
+
+def apply(entries) -> int:
+    """
+    Apply stream entries.
+
+    :return: Number of posts updated (text-to-speech files not included)
+    """
+    updates = []
+    for entry_id, fields in entries:
+        try:
+            function_name, call_id, body = fields[b"function"].decode(), fields[b"call_id"].decode(), fields[b"body"]
+        except (KeyError, UnicodeDecodeError):
+            # Acknowledged with the batch: an entry that can't be read never will be.
+            logger.exception("Dropping malformed FaaS callback entry %s: %r", entry_id, fields)
+            continue
+        if function_name == FaasService.function_text_to_speech:
+            try:
+                services.save_text_to_speech(call_id, body)
+            except Exception:
+                # Not retried: a failing entry would otherwise hold back every batch it is claimed in.
+                logger.exception("Could not save text-to-speech result of call %s", call_id)
+        elif (update := services.parse_callback(function_name, call_id, body)) is not None:
+            updates.append(update)
+    return services.apply_post_updates(updates)
+
+
+def consume(consumer: str, batch_size: int | None = None, window: float | None = None) -> int:
+    """
+    One round: read a batch, apply it, acknowledge it.
+
+    :return: Number of callbacks applied
+    """
+    conn = _redis()
+    ensure_group(conn)
+    entries = read_batch(
+        conn,
+        consumer,
+        batch_size or settings.FAAS_CALLBACK_BATCH_SIZE,
+        settings.FAAS_CALLBACK_WINDOW if window is None else window,
+    )
+    if not entries:
+        return 0
+    apply(entries)
+
+    entry_ids = [entry_id for entry_id, _ in entries]
+    pipe = conn.pipeline(transaction=True)
+    pipe.xack(settings.FAAS_CALLBACK_STREAM, settings.FAAS_CALLBACK_GROUP, *entry_ids)
+    pipe.xdel(settings.FAAS_CALLBACK_STREAM, *entry_ids)
+    pipe.execute()
+    return len(entries)
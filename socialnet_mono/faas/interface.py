@@ -1,9 +1,12 @@
-import requests
 import json
+import httpx
+from asgiref.sync import sync_to_async
 from requests import Response
 from django.conf import settings
 from django.core.cache import cache
 
+from faas import transport
+
 
 class FaasService:
     sync_function_path = '/function/{}'
@@ -15,6 +18,7 @@ class FaasService:
     function_image_thumbnail = 'image-thumbnail'  # always
     function_offensive_word_detection = 'offensive-word-detection'  # always
     function_video_thumbnail = 'video-thumbnail'  # always
+    function_enrich_post = 'enrich-post'  # always, categorize + keywords + offensive words + sentiment in one call
 
     # function_image_encoding = 'image_encoding'
     # function_video_encoding = 'video_encoding'
@@ -25,6 +29,22 @@ class FaasService:
     function_text_to_speech = 'my-text-to-speech'  # action-based (or never - simple API call)
     function_text_to_qrcode = 'qrcode-go'  # action-based
 
+    # Safe to run twice (no side effects besides overwriting the same output), so failed sync calls are retried.
+    idempotent_functions = frozenset({
+        function_generate_report,
+        function_categorize_post_text,
+        function_extract_keywords,
+        function_enrich_post,
+        function_image_thumbnail,
+        function_offensive_word_detection,
+        function_video_thumbnail,
+        function_sentiment_analysis,
+        function_image_inception,
+        function_nsfw_recognition,
+        function_text_to_speech,
+        function_text_to_qrcode,
+    })
+
     def __init__(self, base_url: str = None, fake_async: bool = True):
         self.base_url = base_url or settings.FAAS_URL
         self.fake_async = fake_async
@@ -53,7 +73,8 @@ class FaasService:
             :param is_async: Whether to call the function asynchronously
             :param callback_hook: URL to send the callback to (only for async calls)
             :param metadata Extra info to save in cache for async calls
-            :param request_kwargs: Additional arguments to pass to the requests.post method (like data, timeout, etc.)
+            :param request_kwargs: Additional arguments to pass to the requests.post method (like data, timeout, etc.),
+                the timeout defaults to the function's FAAS_TIMEOUTS entry
 
             :return: Response from the FaaS function as a dictionary
         """
@@ -78,21 +99,25 @@ class FaasService:
             request_kwargs['json'] = payload
         else:
             request_kwargs['data'] = payload
-        response = requests.post(url, headers=headers, **request_kwargs)
-        response = requests.post(url, headers=headers, **request_kwargs)
+        idempotent = function_name in self.idempotent_functions
+        response = transport.post(url, function_name, idempotent, headers=headers, **request_kwargs)
         response.raise_for_status()
         return response
     
     def _call_fake_async_function(self, function_name: str, payload: dict, headers: dict, metadata: dict | None = None, **request_kwargs) -> Response:
         resp = self._call_sync_function(function_name, payload, headers=headers, **request_kwargs)
-        self._process_call_id(resp, metadata)
 
         print("FAKE ASYNC CALL - handling callback directly")
-
-        from faas.services import handle_faas_callback
-        handle_faas_callback(function_name, resp.headers.get("X-Call-Id", None), resp.content)
+        self.handle_response(function_name, resp, metadata)
 
         return resp
+
+    def handle_response(self, function_name: str, response, metadata: dict | None = None):
+        """Apply the result of a sync call the way its async callback would be applied."""
+        self._process_call_id(response, metadata)
+
+        from faas.services import handle_faas_callback
+        handle_faas_callback(function_name, response.headers.get("X-Call-Id", None), response.content)
     
     def _call_async_function(
             self,
@@ -107,11 +132,59 @@ class FaasService:
             request_kwargs['json'] = payload
         else:
             request_kwargs['data'] = payload
-        response = requests.post(url, headers=headers, **request_kwargs)
+        # Queueing a call twice would run it twice, so only connect failures are retried.
+        response = transport.post(url, function_name, False, headers=headers, **request_kwargs)
         response.raise_for_status()
         self._process_call_id(response, metadata)
         return response
     
+    async def acall_function(
+        self,
+        function_name: str,
+        payload: dict,
+        is_async: bool = False,
+        callback_hook: str | None = None,
+        metadata: dict | None = None,
+        **request_kwargs
+    ) -> httpx.Response:
+        """
+            Coroutine version of `call_function`, on the shared async client of the running event loop.
+
+            :param request_kwargs: Additional arguments to pass to the httpx post method (like content, timeout, etc.)
+
+            :return: Response from the FaaS function
+        """
+
+        headers = self.get_headers()
+        if is_async:
+
+            if self.fake_async:
+                response = await self._acall(self.sync_function_path, function_name, payload, headers, **request_kwargs)
+                await sync_to_async(self.handle_response)(function_name, response, metadata)
+                return response
+
+            if callback_hook:
+                headers = self.get_headers({'X-Callback-Url': callback_hook})
+
+            response = await self._acall(self.async_funtcion_path, function_name, payload, headers, **request_kwargs)
+            await sync_to_async(self._process_call_id)(response, metadata)
+            return response
+
+        else:
+            return await self._acall(self.sync_function_path, function_name, payload, headers, **request_kwargs)
+
+    async def _acall(self, path: str, function_name: str, payload: dict, headers: dict, **request_kwargs) -> httpx.Response:
+        url = self.base_url + path.format(function_name)
+        if isinstance(payload, dict):
+            request_kwargs['json'] = payload
+        else:
+            request_kwargs['content'] = payload
+        # Same retry rule as the sync calls: queueing an async call twice would run it twice.
+        idempotent = path == self.sync_function_path and function_name in self.idempotent_functions
+        response = await transport.apost(url, function_name, idempotent, headers=headers, **request_kwargs)
+        response.raise_for_status()
+        return response
+
     def _process_call_id(self, response: Response, metadata: dict | None):
         call_id = response.headers.get("X-Call-Id", None)
         set_metadata_in_cache(call_id, metadata)
@@ -0,0 +1,46 @@
+import os
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, close_old_connections
+from redis.exceptions import RedisError
+
+from faas import ingest
+
+
+class Command(BaseCommand):
+    help = "Apply queued FaaS callbacks to posts in batches (see faas/ingest.py)."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--consumer", default=f"{socket.gethostname()}-{os.getpid()}",
+            help="Consumer name within the group, unique per worker.",
+        )
+        parser.add_argument("--batch-size", type=int, default=None)
+        parser.add_argument("--window", type=float, default=None, help="Seconds to collect callbacks per batch.")
+        parser.add_argument("--once", action="store_true", help="Apply one batch and exit.")
+
+    def handle(self, *args, **options):
+        applied = 0
+        while True:
+            # Drop connections the database closed or that broke in the last round.
+            close_old_connections()
+            try:
+                count = ingest.consume(options["consumer"], options["batch_size"], options["window"])
+            except (RedisError, DatabaseError) as e:
+                # The batch isn't acknowledged, so it is read again once it has been idle long enough.
+                self.stderr.write(f"Could not apply callbacks: {e}")
+                if options["once"]:
+                    raise
+                time.sleep(1)
+                continue
+            except KeyboardInterrupt:
+                break
+            applied += count
+            if count and options["verbosity"] > 1:
+                self.stdout.write(f"Applied {count} callbacks")
+            if options["once"]:
+                break
+
+        self.stdout.write(self.style.SUCCESS(f"Applied {applied} callbacks."))
@@ -1,272 +1,233 @@
+"""
+Applying FaaS results to posts.
+
+Every result (async callbacks, fake-async and enrichment responses) is turned
+into the post it is about and the fields it sets by `parse_callback()`.
+`apply_post_updates()` merges the updates of many results per post and
+writes them with one bulk UPDATE per set of changed fields, so a post's
+enrichment costs a few statements instead of a read and a save per function.
+Text-to-speech results carry a file and are saved one by one.
+
+Callbacks received over HTTP are queued and applied in batches, see
+faas/ingest.py.
+"""
 import json
+import logging
+
+from django.db import InterfaceError, OperationalError, transaction
+from django.utils import timezone
+
 from faas.interface import FaasService, get_metadata_from_cache
 
+logger = logging.getLogger(__name__)
+
 
-def process_callback_data(request):
-    print("Received callback request with headers:", request.headers)
-    
+def callback_from_request(request) -> tuple[str, str, bytes] | None:
+    """(function name, call id, body) of a successful callback, or None for a failed one."""
     function_name = request.headers.get('X-Function-Name', 'Unknown')
-    print(f"Processing callback from function: {function_name}")
     status = request.headers.get('X-Function-Status', 'Unknown')
-    print(f"Function Status: {status}")
     call_id = request.headers.get('X-Call-Id', 'Unknown')
-    print(f"Function Call ID: {call_id}")
-    
+
     if status != '200':
-        error = request.body.decode('utf-8') or 'No error message provided'
-        print("Function execution failed or did not complete successfully:", error)
-        return
+        error = request.body[:500].decode('utf-8', errors='replace') or 'No error message provided'
+        logger.warning("FaaS function %s (call %s) failed with status %s: %s", function_name, call_id, status, error)
+        return None
+    return function_name, call_id, request.body
 
-    handle_faas_callback(function_name, call_id, request.body)
 
+def top_topic(topics: list[dict]) -> str | None:
+    # For simplicity, just store the top topic
+    if topics:
+        top_topic = max(topics, key=lambda x: x.get("score", 0))
+        if top_topic.get("score", 0) > 0.3:  # threshold
+            return top_topic.get("label", "")
+    return None
 
-def handle_faas_callback(function_name, call_id, res_data):
-    print("Handling callback for function:", function_name, "with call_id:", call_id)
 
-    if function_name != FaasService.function_text_to_speech:
-        try:
-            data = res_data.decode('utf-8')
-            data = json.loads(data) if data else {}
-            print("Callback Data:", str(data)[:100])
-        except Exception as e:
-            print("Error processing callback data:", str(e))
-            return
-    else:
-        data = res_data
+def sentiment_label(polarity: float) -> str:
+    # Polarity mapping
+    if polarity > 0.05:
+        return "positive"
+    elif polarity < -0.05:
+        return "negative"
+    return "neutral"
 
-    match function_name:
-        case FaasService.function_generate_report:
-            # No async call
-            pass
 
+def _offensive_fields(data: dict) -> dict:
+    # {"censored": "str", "found_words": ["str", "str", ...], "toxic": true, ...}
+    toxic = data.get("toxic", False)
+    offensive = bool(data.get("found_words", []))
+    return {"is_toxit": toxic, "is_offensive": offensive, "is_blocked_by_system": offensive and toxic}
+
+
+def _post_id_from_metadata(call_id: str):
+    # Functions taking a bare payload get their post id from the metadata cached for the call.
+    post_id = get_metadata_from_cache(call_id)
+    if post_id and isinstance(post_id, dict):
+        post_id = post_id.get("unique_id", post_id)
+    return post_id
+
+
+def post_fields(function_name: str, call_id: str, data) -> tuple[int | None, dict]:
+    """The post a result is about and the fields it sets (empty when there is nothing to set)."""
+    match function_name:
         case FaasService.function_offensive_word_detection:
-            # {"censored": "str", "found_words": ["str", "str", ...], "toxic": true, "unique_id": int}
-
-            post_id = data.get("unique_id")
-            censored = data.get("censored")
-            found_words = data.get("found_words", [])
-            toxic = data.get("toxic", False)
-            print(f"Post ID: {post_id}, Censored: {censored}, Found Words: {found_words}, Toxic: {toxic}")
-
-            if not post_id:
-                print("No unique_id provided in callback data.")
-                return
-
-            from posts.models import Post
-            try:
-                post = Post.objects.get(id=post_id)
-                post.is_toxit = toxic
-                post.is_offensive = bool(found_words)
-                post.is_blocked_by_system = post.is_offensive and post.is_toxit
-                post.save(update_fields=['is_toxit', 'is_offensive', 'is_blocked_by_system', 'updated_at'])
-                print(f"Post {post_id} offensiveness updated successfully.")
-            except Post.DoesNotExist:
-                print(f"Post with ID {post_id} does not exist.")
-            except Exception as e:
-                print(f"Error updating Post {post_id}: {str(e)}")
+            return data.get("unique_id"), _offensive_fields(data)
 
         case FaasService.function_extract_keywords:
             # {"keywords": ["str", "str", ...], "unique_id": int}
-            
-            post_id = data.get("unique_id")
-            keywords = data.get("keywords", [])
-            print(f"Post ID: {post_id}, Keywords: {keywords}")
-            if not post_id:
-                print("No unique_id provided in callback data.")
-                return
-            
-            from posts.models import Post
-            try:
-                post = Post.objects.get(id=post_id)
-                post.keywords = keywords
-                post.save(update_fields=['keywords', 'updated_at'])
-                print(f"Post {post_id} keywords updated successfully.")
-            except Post.DoesNotExist:
-                print(f"Post with ID {post_id} does not exist.")
-            except Exception as e:
-                print(f"Error updating Post {post_id}: {str(e)}")
-        
+            return data.get("unique_id"), {"keywords": data.get("keywords", [])}
+
         case FaasService.function_image_thumbnail | FaasService.function_video_thumbnail:
             # {"output_key": "str", "size": [w, h], "unique_id": int}
-            
-            post_id = data.get("unique_id")
-            keywords = data.get("keywords", [])
-            print(f"Post ID: {post_id}, Keywords: {keywords}")
-            if not post_id:
-                print("No unique_id provided in callback data.")
-                return
-            
-            from posts.models import Post
-            try:
-                post = Post.objects.get(id=post_id)
-                post.thumbnail.name = data.get("output_key", "")
-                post.save(update_fields=['thumbnail', 'updated_at'])
-                print(f"Post {post_id} thumbnail updated successfully.")
-            except Post.DoesNotExist:
-                print(f"Post with ID {post_id} does not exist.")
-            except Exception as e:
-                print(f"Error updating Post {post_id}: {str(e)}")
+            return data.get("unique_id"), {"thumbnail": data.get("output_key", "")}
 
         case FaasService.function_categorize_post_text:
             # {"topics": [{"lable": "str", "score": float}, ...], "unique_id": int}
-            
-            post_id = data.get("unique_id")
-            topics = data.get("topics", [])
-            print(f"Post ID: {post_id}, Topics: {topics}")
-            if not post_id:
-                print("No unique_id provided in callback data.")
-                return
-            
-            from posts.models import Post
-            try:
-                post = Post.objects.get(id=post_id)
-                # For simplicity, just store the top topic as sentiment
-                if topics:
-                    top_topic = max(topics, key=lambda x: x.get("score", 0))
-                    if top_topic.get("score", 0) > 0.3:  # threshold
-                        post.topic = top_topic.get("label", "")
-                        post.save(update_fields=['topic', 'updated_at'])
-                print(f"Post {post_id} topic updated successfully.")
-            except Post.DoesNotExist:
-                print(f"Post with ID {post_id} does not exist.")
-            except Exception as e:
-                print(f"Error updating Post {post_id}: {str(e)}")
-        
+            topic = top_topic(data.get("topics", []))
+            return data.get("unique_id"), {} if topic is None else {"topic": topic}
+
+        case FaasService.function_enrich_post:
+            # {"unique_id": int, "topics": [...], "keywords": [...], "offensive": {...}, "sentiment": {...}, "errors": {...}}
+            # Any step may be missing (listed in "errors"), the others are applied.
+            if data.get("errors"):
+                logger.warning("Enrichment steps failed for post %s: %s", data.get("unique_id"), data["errors"])
+            fields = {}
+            if "topics" in data and (topic := top_topic(data["topics"])) is not None:
+                fields["topic"] = topic
+            if "keywords" in data:
+                fields["keywords"] = data["keywords"]
+            if "offensive" in data:
+                fields.update(_offensive_fields(data["offensive"]))
+            if data.get("sentiment", {}).get("polarity") is not None:
+                fields["sentiment"] = sentiment_label(data["sentiment"]["polarity"])
+            return data.get("unique_id"), fields
+
         case FaasService.function_sentiment_analysis:
             # { "polarity": float(-1 - 1),  "subjectivity": float (0 - 1), "sentence_count": 1 }
-            
-            post_id = get_metadata_from_cache(call_id)
-            if post_id and isinstance(post_id, dict): post_id = post_id.get("unique_id", post_id)
             polarity = data.get("polarity", None)
-            print(f"Post ID: {post_id}, Polarity: {polarity}")
-
-            if not post_id:
-                print("No post_id found in cache for call-id", call_id)
-                return
-
             if polarity is None:
-                print("Coudln't get the polarity from response", data)
-                return
-            
-            # Polarity mapping
-            if polarity > 0.05:
-                sentiment = "positive"
-            elif polarity < -0.05:
-                sentiment = "negative"
-            else:
-                sentiment = "neutral"
-            
-            from posts.models import Post
-            try:
-                post = Post.objects.get(id=post_id)
-                post.sentiment = sentiment
-                post.save(update_fields=['sentiment', 'updated_at'])
-                print(f"Post {post_id} sentiment updated successfully to {sentiment}.")
-            except Post.DoesNotExist:
-                print(f"Post with ID {post_id} does not exist.")
-            except Exception as e:
-                print(f"Error updating Post {post_id}: {str(e)}")
-        
-        
+                logger.warning("No polarity in sentiment result of call %s", call_id)
+                return None, {}
+            return _post_id_from_metadata(call_id), {"sentiment": sentiment_label(polarity)}
+
         case FaasService.function_image_inception:
             # [ {"score": float, "name": "str"}, ...]
-
-            post_id = get_metadata_from_cache(call_id)
-            if post_id and isinstance(post_id, dict): post_id = post_id.get("unique_id", post_id)
-            tags: list[dict] = data
-            print(f"Post ID: {post_id}, tags: {tags}")
-
-            if not post_id:
-                print("No post_id found in cache for call-id", call_id)
-                return
-
+            tags = sorted(data or [], key=lambda x: x.get("score", 0), reverse=True)[:5]
+            tags = [tag.get("name", "") for tag in tags if tag.get("name", "")]
             if not tags:
-                print("Coudln't find any tags in data", data)
-                return
+                return None, {}
+            return _post_id_from_metadata(call_id), {"tags": tags}
 
-            tags = sorted(tags, key=lambda x: x.get("score", 0), reverse=True)[:5]
-            tags = [tag.get("name", "") for tag in tags if tag.get("name", "")]
-            print(f"Top tags: {tags}")
-            
-            from posts.models import Post
-            try:
-                post = Post.objects.get(id=post_id)
-                post.tags = tags
-                post.save(update_fields=['tags', 'updated_at'])
-                print(f"Post {post_id} tags updated successfully to {tags}.")
-            except Post.DoesNotExist:
-                print(f"Post with ID {post_id} does not exist.")
-            except Exception as e:
-                print(f"Error updating Post {post_id}: {str(e)}")
-            
-        
         case FaasService.function_nsfw_recognition:
             # { "sfw_score": float, "nsfw_score": float }
+            if not data:
+                return None, {}
+            return _post_id_from_metadata(call_id), {"is_nsfw": data['nsfw_score'] > 0.7}
 
-            post_id = get_metadata_from_cache(call_id)
-            if post_id and isinstance(post_id, dict): post_id = post_id.get("unique_id", post_id)
-            scores = data
-            print(f"Post ID: {post_id}, nsfw scores: {scores}")
-
-            if not post_id:
-                print("No post_id found in cache for call-id", call_id)
-                return
-
-            if not scores:
-                print("Coudln't find any scores in data", data)
-                return
-
-            if scores['nsfw_score'] > 0.7:
-                is_nsfw = True
-            else:
-                is_nsfw = False
-
-            from posts.models import Post
-            try:
-                post = Post.objects.get(id=post_id)
-                post.is_nsfw = is_nsfw
-                post.save(update_fields=['is_nsfw', 'updated_at'])
-                print(f"Post {post_id} is_nsfw updated successfully to {is_nsfw}.")
-            except Post.DoesNotExist:
-                print(f"Post with ID {post_id} does not exist.")
-            except Exception as e:
-                print(f"Error updating Post {post_id}: {str(e)}")
-        
-        case FaasService.function_text_to_speech:
-            # Bytes of an audio file (e.g., MP3 or WAV)
-            
-            post_id = get_metadata_from_cache(call_id)
-            if post_id and isinstance(post_id, dict): post_id = post_id.get("unique_id", post_id)
-            audio_bytes = data
-            print(f"Post ID: {post_id}, body bytes: {len(data)}")
-
-            if not post_id:
-                print("No post_id found in cache for call-id", call_id)
-                return
-            
-            if not audio_bytes:
-                print("No audio bytes found in callback data")
-                return
-            
-            from posts.models import Post
-            from django.core.files.base import ContentFile
-            try:
-                post = Post.objects.get(id=post_id)
-                audio_file = ContentFile(audio_bytes, name=f"tts_post_{post_id}.mp3")
-                post.text_to_speech_file.save(f"tts_post_{post_id}.mp3", audio_file)
-                post.save(update_fields=['text_to_speech_file', 'updated_at'])
-                print(f"Post {post_id} text_to_speech_file updated successfully.")
-            except Post.DoesNotExist:
-                print(f"Post with ID {post_id} does not exist.")
-            except Exception as e:
-                print(f"Error updating Post {post_id}: {str(e)}")
-        
-        case FaasService.function_text_to_qrcode:
+        case FaasService.function_generate_report | FaasService.function_text_to_qrcode:
             # No async call
-            pass
-        
+            return None, {}
+
         case _:
-            print("Invalid function name:", function_name)
-            return
-        
-        
\ No newline at end of file
+            logger.warning("Invalid function name in FaaS result: %s", function_name)
+            return None, {}
+
+
+def parse_callback(function_name: str, call_id: str, res_data: bytes) -> tuple[int, dict] | None:
+    """(post id, fields) of a JSON result, or None when it doesn't update a post."""
+    try:
+        data = res_data.decode('utf-8')
+        data = json.loads(data) if data else {}
+        post_id, fields = post_fields(function_name, call_id, data)
+        if not post_id or not fields:
+            return None
+        return int(post_id), fields
+    except Exception as e:
+        logger.warning("Could not process %s result of call %s: %s", function_name, call_id, e)
+        return None
+
+
+def _update_post(post_id: int, fields: dict, now) -> bool:
+    """Apply one update on its own; one that can't be written is logged and dropped."""
+    from posts.models import Post
+
+    try:
+        with transaction.atomic():
+            return bool(Post.objects.filter(id=post_id).update(updated_at=now, **fields))
+    except (OperationalError, InterfaceError):
+        # The database is unavailable, not the update bad: let the caller retry it.
+        raise
+    except Exception:
+        logger.exception("Could not update %s of post %s", ", ".join(sorted(fields)), post_id)
+        return False
+
+
+def apply_post_updates(updates) -> int:
+    """
+    Write (post id, fields) updates, merging those of the same post (later
+    ones win) and updating posts that set the same fields in one statement.
+
+    When such a statement fails (e.g. a value too long for its column), its
+    posts are updated one at a time, so only those that fail on their own
+    are lost.
+
+    :return: Number of posts updated
+    """
+    from posts.models import Post
+
+    merged: dict[int, dict] = {}
+    for post_id, fields in updates:
+        merged.setdefault(post_id, {}).update(fields)
+    if not merged:
+        return 0
+
+    now = timezone.now()
+    groups: dict[tuple, list[int]] = {}
+    for post_id in sorted(merged):  # same lock order in every worker
+        groups.setdefault(tuple(sorted(merged[post_id])), []).append(post_id)
+
+    updated = 0
+    for names, post_ids in groups.items():
+        try:
+            with transaction.atomic():
+                posts = [Post(id=post_id, updated_at=now, **merged[post_id]) for post_id in post_ids]
+                updated += Post.objects.bulk_update(posts, [*names, 'updated_at'])
+        except (OperationalError, InterfaceError):
+            raise
+        except Exception as e:
+            logger.warning("Could not update %s of %d posts at once, updating them one by one: %s",
+                           ", ".join(names), len(post_ids), e)
+            updated += sum(_update_post(post_id, merged[post_id], now) for post_id in post_ids)
+    return updated
+
+
+def save_text_to_speech(call_id: str, audio_bytes: bytes):
+    # Bytes of an audio file (e.g., MP3 or WAV)
+    from django.core.files.base import ContentFile
+    from posts.models import Post
+
+    post_id = _post_id_from_metadata(call_id)
+    if not post_id:
+        logger.warning("No post id found in cache for call %s", call_id)
+        return
+    if not audio_bytes:
+        logger.warning("No audio in text-to-speech result of call %s", call_id)
+        return
+    try:
+        post = Post.objects.get(id=post_id)
+        audio_file = ContentFile(audio_bytes, name=f"tts_post_{post_id}.mp3")
+        post.text_to_speech_file.save(f"tts_post_{post_id}.mp3", audio_file, save=False)
+        post.save(update_fields=['text_to_speech_file', 'updated_at'])
+    except Post.DoesNotExist:
+        logger.info("Post %s of text-to-speech call %s no longer exists", post_id, call_id)
+
+
+def handle_faas_callback(function_name, call_id, res_data):
+    """Apply one FaaS result right away."""
+    if function_name == FaasService.function_text_to_speech:
+        save_text_to_speech(call_id, res_data)
+        return
+    update = parse_callback(function_name, call_id, res_data)
+    if update is not None and not apply_post_updates([update]):
+        logger.info("Post %s of %s call %s no longer exists", update[0], function_name, call_id)
@@ -0,0 +1,24 @@
+"""
+Queues for background FaaS calls.
+
+Cheap text functions and heavy media functions run on separate Celery queues
+(FAAS_TEXT_QUEUE, FAAS_MEDIA_QUEUE), so a backlog of thumbnails never delays
+the text analysis of new posts. `posts.tasks.enrich_post` is queued once per
+queue with the functions `queue_for()` puts on it. Run a worker per queue
+with `celery -A socialnet_mono worker -Q <queue>`.
+"""
+from django.conf import settings
+
+from faas.interface import FaasService
+
+MEDIA_FUNCTIONS = frozenset({
+    FaasService.function_image_thumbnail,
+    FaasService.function_video_thumbnail,
+    FaasService.function_image_inception,
+    FaasService.function_nsfw_recognition,
+    FaasService.function_text_to_speech,
+})
+
+
+def queue_for(function_name: str) -> str:
+    return settings.FAAS_MEDIA_QUEUE if function_name in MEDIA_FUNCTIONS else settings.FAAS_TEXT_QUEUE
@@ -0,0 +1,148 @@
+import json
+from unittest import mock
+
+import pytest
+from django.db import DataError, connection
+from django.db.models import QuerySet
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework.test import APIClient
+
+from faas import ingest, services
+from faas.interface import FaasService
+from posts.models import Post
+from users.models import User
+
+
+@pytest.fixture
+def posts():
+    author = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    return [Post.objects.create(author=author, content=f"post {i}") for i in range(2)]
+
+
+def _callback(function_name, data, status="200"):
+    return APIClient().post(
+        reverse("faas-callback"),
+        data=json.dumps(data),
+        content_type="application/json",
+        HTTP_X_FUNCTION_NAME=function_name,
+        HTTP_X_FUNCTION_STATUS=status,
+        HTTP_X_CALL_ID="call-1",
+    )
+
+
+def _updates(ctx):
+    return [q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+
+
+@pytest.mark.django_db
+def test_callbacks_are_queued_and_applied_in_one_update_per_field_set(posts):
+    first, second = posts
+    _callback(FaasService.function_extract_keywords, {"keywords": ["a"], "unique_id": first.id})
+    _callback(FaasService.function_extract_keywords, {"keywords": ["b"], "unique_id": second.id})
+    _callback(FaasService.function_categorize_post_text, {"topics": [{"label": "music", "score": 0.9}], "unique_id": first.id})
+    resp = _callback(FaasService.function_categorize_post_text, {"topics": [{"label": "sports", "score": 0.9}], "unique_id": second.id})
+    assert resp.status_code == 200
+    first.refresh_from_db()
+    assert first.keywords == []
+
+    with CaptureQueriesContext(connection) as ctx:
+        assert ingest.consume("test", window=0) == 4
+    assert len(_updates(ctx)) == 1
+
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert (first.keywords, first.topic) == (["a"], "music")
+    assert (second.keywords, second.topic) == (["b"], "sports")
+    assert get_redis_connection("default").xlen("faas:callbacks") == 0
+    assert ingest.consume("test", window=0) == 0
+
+
+@pytest.mark.django_db
+def test_failed_callbacks_are_not_queued(posts):
+    _callback(FaasService.function_extract_keywords, "boom", status="500")
+    assert get_redis_connection("default").xlen("faas:callbacks") == 0
+
+
+@pytest.mark.django_db
+def test_callback_is_applied_in_the_request_without_redis(posts):
+    with mock.patch.object(ingest, "_redis", side_effect=RedisError("down")):
+        _callback(FaasService.function_extract_keywords, {"keywords": ["a"], "unique_id": posts[0].id})
+    posts[0].refresh_from_db()
+    assert posts[0].keywords == ["a"]
+
+
+@pytest.mark.django_db
+def test_abandoned_callbacks_are_claimed_by_another_consumer(posts, settings):
+    _callback(FaasService.function_extract_keywords, {"keywords": ["a"], "unique_id": posts[0].id})
+    conn = get_redis_connection("default")
+    ingest.ensure_group(conn)
+    assert len(ingest.read_batch(conn, "crashed", 10, 0.01)) == 1
+
+    settings.FAAS_CALLBACK_CLAIM_IDLE = 0
+    assert ingest.consume("other", window=0) == 1
+    posts[0].refresh_from_db()
+    assert posts[0].keywords == ["a"]
+
+
+def _pending():
+    return get_redis_connection("default").xpending("faas:callbacks", "faas-callbacks")["pending"]
+
+
+@pytest.mark.django_db
+def test_result_with_a_bad_post_id_does_not_hold_back_the_batch(posts):
+    _callback(FaasService.function_extract_keywords, {"keywords": ["a"], "unique_id": "x"})
+    _callback(FaasService.function_extract_keywords, {"keywords": ["b"], "unique_id": posts[0].id})
+
+    assert ingest.consume("test", window=0) == 2
+    posts[0].refresh_from_db()
+    assert posts[0].keywords == ["b"]
+    assert get_redis_connection("default").xlen("faas:callbacks") == 0
+    assert _pending() == 0
+
+
+@pytest.mark.django_db
+def test_failed_bulk_update_falls_back_to_one_update_at_a_time(posts):
+    first, second = posts
+    _callback(FaasService.function_extract_keywords, {"keywords": ["a"], "unique_id": first.id})
+    _callback(FaasService.function_image_thumbnail, {"output_key": "t" * 200, "unique_id": first.id})
+    _callback(FaasService.function_extract_keywords, {"keywords": ["b"], "unique_id": second.id})
+
+    update = QuerySet.update
+
+    def update_or_reject_thumbnail(self, **kwargs):
+        if len(kwargs.get("thumbnail", "")) > 100:
+            raise DataError("value too long for type character varying(100)")
+        return update(self, **kwargs)
+
+    with mock.patch.object(QuerySet, "bulk_update", side_effect=DataError("value too long")), \
+            mock.patch.object(QuerySet, "update", update_or_reject_thumbnail):
+        assert ingest.consume("test", window=0) == 3
+
+    # The merged update of the first post is rejected as a whole, the second still lands.
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert first.keywords == [] and not first.thumbnail
+    assert second.keywords == ["b"]
+    assert _pending() == 0
+
+
+@pytest.mark.django_db
+def test_malformed_entry_is_dropped(posts):
+    get_redis_connection("default").xadd("faas:callbacks", {"function": FaasService.function_extract_keywords})
+    _callback(FaasService.function_extract_keywords, {"keywords": ["a"], "unique_id": posts[0].id})
+
+    assert ingest.consume("test", window=0) == 2
+    posts[0].refresh_from_db()
+    assert posts[0].keywords == ["a"]
+    assert _pending() == 0
+
+
+@pytest.mark.django_db
+def test_updates_can_be_a_generator(posts):
+    updates = ((post.id, {"keywords": ["a"]}) for post in posts)
+    with mock.patch.object(QuerySet, "bulk_update", side_effect=DataError("value too long")):
+        assert services.apply_post_updates(updates) == 2
+    assert [post.keywords for post in Post.objects.order_by("id")] == [["a"], ["a"]]
@@ -0,0 +1,7 @@
+from faas import tasks
+from faas.interface import FaasService
+
+
+def test_media_functions_use_the_media_queue(settings):
+    assert tasks.queue_for(FaasService.function_video_thumbnail) == settings.FAAS_MEDIA_QUEUE
+    assert tasks.queue_for(FaasService.function_extract_keywords) == settings.FAAS_TEXT_QUEUE
@@ -0,0 +1,122 @@
+import asyncio
+from unittest import mock
+
+import httpx
+import pytest
+import requests
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from faas import transport
+from faas.interface import FaasService
+from users.models import User
+
+
+def _response(status):
+    response = requests.Response()
+    response.status_code = status
+    response._content = b'{}'
+    return response
+
+
+@pytest.fixture
+def session_post(settings):
+    settings.FAAS_RETRY_BACKOFF = 0
+    with mock.patch.object(transport.get_session(), "post") as post:
+        yield post
+
+
+def test_sync_call_posts_once_with_function_timeout(session_post, settings):
+    settings.FAAS_TIMEOUTS = {"default": (1, 5), FaasService.function_generate_report: (1, 60)}
+    session_post.return_value = _response(200)
+    FaasService().call_function(FaasService.function_generate_report, {"a": 1})
+    assert session_post.call_count == 1
+    assert session_post.call_args.kwargs["timeout"] == (1, 60)
+
+
+def test_idempotent_call_is_retried(session_post, settings):
+    settings.FAAS_MAX_RETRIES = 2
+    session_post.side_effect = [requests.ReadTimeout(), _response(503), _response(200)]
+    response = transport.post("http://faas/function/f", "f", True)
+    assert response.status_code == 200
+    assert session_post.call_count == 3
+
+
+def test_retries_are_bounded(session_post, settings):
+    settings.FAAS_MAX_RETRIES = 1
+    session_post.side_effect = requests.ConnectionError()
+    with pytest.raises(requests.ConnectionError):
+        transport.post("http://faas/function/f", "f", True)
+    assert session_post.call_count == 2
+
+
+def _refused():
+    try:
+        requests.post("http://127.0.0.1:1", timeout=1)
+    except requests.ConnectionError as e:
+        return e
+
+
+def test_non_idempotent_call_only_retries_connect_failures(session_post, settings):
+    settings.FAAS_MAX_RETRIES = 3
+    session_post.side_effect = [_refused(), requests.ConnectTimeout(), requests.ReadTimeout()]
+    with pytest.raises(requests.ReadTimeout):
+        transport.post("http://faas/async-function/f", "f", False)
+    assert session_post.call_count == 3
+
+    session_post.reset_mock(side_effect=True)
+    session_post.side_effect = requests.ConnectionError("Connection aborted.")
+    with pytest.raises(requests.ConnectionError):
+        transport.post("http://faas/async-function/f", "f", False)
+    assert session_post.call_count == 1
+
+    session_post.reset_mock(side_effect=True)
+    session_post.return_value = _response(503)
+    assert transport.post("http://faas/async-function/f", "f", False).status_code == 503
+    assert session_post.call_count == 1
+
+
+def _apost(statuses, idempotent):
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(statuses[len(calls) - 1])
+
+    async def call():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with mock.patch.object(transport, "get_async_client", return_value=client):
+            return await transport.apost("http://faas/function/f", "f", idempotent)
+
+    return asyncio.run(call()), len(calls)
+
+
+def test_async_post_retries_idempotent_calls_only(settings):
+    settings.FAAS_RETRY_BACKOFF = 0
+    response, attempts = _apost([503, 200], idempotent=True)
+    assert (response.status_code, attempts) == (200, 2)
+    response, attempts = _apost([503, 200], idempotent=False)
+    assert (response.status_code, attempts) == (503, 1)
+
+
+def test_run_uses_one_long_lived_loop():
+    async def loop_id():
+        return id(asyncio.get_running_loop())
+
+    assert transport.run(loop_id()) == transport.run(loop_id())
+
+
+def test_session_is_reused():
+    assert transport.get_session() is transport.get_session()
+
+
+@pytest.mark.django_db
+def test_pool_stats_is_admin_only():
+    client = APIClient()
+    client.force_authenticate(User.objects.create_user(username="ali", email="ali@x.com", password="pass1234"))
+    assert client.get(reverse("faas-pool-stats")).status_code == 403
+
+    client.force_authenticate(User.objects.create_superuser(username="root", email="root@x.com", password="pass1234"))
+    resp = client.get(reverse("faas-pool-stats"))
+    assert resp.status_code == 200
+    assert {"pid", "pools"} <= set(resp.data)
@@ -0,0 +1,203 @@
+"""
+HTTP transport for FaaS calls.
+
+Every call goes through one `requests.Session` per process, whose connection
+pool keeps connections to the gateway alive between calls. The session is
+created lazily and again after a fork, so gunicorn workers forked from a
+preloaded app never share sockets. Size the pool with FAAS_POOL_MAXSIZE: a
+gthread worker makes at most one call per thread at a time, so the pool
+should hold at least `threads` connections (see deployment/gunicorn.conf.py).
+
+Calls get connect/read timeouts per function (FAAS_TIMEOUTS). Failed calls
+are retried up to FAAS_MAX_RETRIES times with full-jitter exponential
+backoff: connect failures always (nothing reached the function), timeouts
+and 502/503/504 responses only for functions that are safe to run twice.
+
+`apost()` is the coroutine version on an `httpx.AsyncClient`, one per event
+loop. `run()` executes coroutines on a long-lived event loop of this process
+(in a daemon thread), so sync code such as Celery tasks can fan calls out
+concurrently while reusing that loop's connection pool between tasks.
+
+`pool_stats()` reports what the pool of this process is doing.
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+import weakref
+from collections import Counter
+
+import httpx
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = frozenset({502, 503, 504})
+
+_lock = threading.Lock()
+_session: tuple[int, requests.Session] | None = None
+_loop: tuple[int, asyncio.AbstractEventLoop] | None = None
+_async_clients: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+_counters = Counter()
+
+
+def get_session() -> requests.Session:
+    """The pooled session of this process."""
+    global _session
+    pid = os.getpid()
+    if _session is None or _session[0] != pid:
+        with _lock:
+            if _session is None or _session[0] != pid:
+                session = requests.Session()
+                adapter = HTTPAdapter(
+                    pool_connections=settings.FAAS_POOL_CONNECTIONS,
+                    pool_maxsize=settings.FAAS_POOL_MAXSIZE,
+                    pool_block=settings.FAAS_POOL_BLOCK,
+                )
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                _session = (pid, session)
+                _counters.clear()
+    return _session[1]
+
+
+def timeout_for(function_name: str) -> tuple[float, float]:
+    """(connect, read) timeout in seconds for a function."""
+    timeouts = settings.FAAS_TIMEOUTS
+    return tuple(timeouts.get(function_name, timeouts["default"]))
+
+
+def _backoff(attempt: int) -> float:
+    return random.uniform(0, min(settings.FAAS_RETRY_BACKOFF_MAX, settings.FAAS_RETRY_BACKOFF * 2 ** attempt))
+
+
+def _retry_delay(function_name: str, attempt: int, retryable: bool, failure) -> float | None:
+    """Count a failed attempt. The delay before retrying it, or None to give up."""
+    if not retryable or attempt >= settings.FAAS_MAX_RETRIES:
+        _counters["failures"] += 1
+        return None
+    delay = _backoff(attempt)
+    _counters["retries"] += 1
+    logger.warning("FaaS call to %s failed (%s), retry %s in %.2fs", function_name, failure, attempt + 1, delay)
+    return delay
+
+
+def _connect_failed(error: requests.ConnectionError) -> bool:
+    """Whether the connection was never established (refused, unresolvable, timed out)."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    # requests wraps urllib3's MaxRetryError, whose reason says why. NewConnectionError
+    # (refused, DNS failure) is a ConnectTimeoutError too.
+    reason = getattr(error.args[0], "reason", None) if error.args else None
+    return isinstance(reason, ConnectTimeoutError)
+
+
+def post(url: str, function_name: str, idempotent: bool, **request_kwargs) -> requests.Response:
+    """
+    POST to a function through the pooled session, retrying what is safe to
+    retry. Raises the last error, or returns the last response (which the
+    caller checks with `raise_for_status()`).
+    """
+    request_kwargs.setdefault("timeout", timeout_for(function_name))
+    session = get_session()
+    attempt = 0
+    while True:
+        _counters["requests"] += 1
+        try:
+            response = session.post(url, **request_kwargs)
+        except requests.ConnectionError as e:
+            # A request on an established connection may have reached the function.
+            retryable, error = idempotent or _connect_failed(e), e
+        except requests.Timeout as e:
+            retryable, error = idempotent, e
+        else:
+            if not (idempotent and response.status_code in RETRY_STATUSES):
+                return response
+            retryable, error = True, None
+
+        delay = _retry_delay(function_name, attempt, retryable, error or response.status_code)
+        if delay is None:
+            if error is not None:
+                raise error
+            return response
+        attempt += 1
+        time.sleep(delay)
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """The pooled async client of the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None:
+        connections = settings.FAAS_ASYNC_MAX_CONNECTIONS
+        client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=connections, max_keepalive_connections=connections),
+        )
+        _async_clients[loop] = client
+    return client
+
+
+async def apost(url: str, function_name: str, idempotent: bool, **request_kwargs) -> httpx.Response:
+    """Coroutine version of `post()`."""
+    connect, read = timeout_for(function_name)
+    request_kwargs.setdefault("timeout", httpx.Timeout(read, connect=connect))
+    client = get_async_client()
+    attempt = 0
+    while True:
+        _counters["requests"] += 1
+        try:
+            response = await client.post(url, **request_kwargs)
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            retryable, error = True, e
+        except httpx.TransportError as e:
+            retryable, error = idempotent, e
+        else:
+            if not (idempotent and response.status_code in RETRY_STATUSES):
+                return response
+            retryable, error = True, None
+
+        delay = _retry_delay(function_name, attempt, retryable, error or response.status_code)
+        if delay is None:
+            if error is not None:
+                raise error
+            return response
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+def run(coro, timeout: float | None = None):
+    """Run a coroutine on this process's FaaS event loop and wait for its result."""
+    global _loop
+    pid = os.getpid()
+    if _loop is None or _loop[0] != pid:
+        with _lock:
+            if _loop is None or _loop[0] != pid:
+                loop = asyncio.new_event_loop()
+                threading.Thread(target=loop.run_forever, name="faas-event-loop", daemon=True).start()
+                _loop = (pid, loop)
+    return asyncio.run_coroutine_threadsafe(coro, _loop[1]).result(timeout)
+
+
+def pool_stats() -> dict:
+    """Connection pool usage of this process, per gateway host."""
+    session = get_session()
+    pools = {}
+    adapter = session.get_adapter("http://")
+    for key in adapter.poolmanager.pools.keys():
+        pool = adapter.poolmanager.pools[key]
+        if pool.pool is None:
+            continue
+        pools[f"{pool.scheme}://{pool.host}:{pool.port}"] = {
+            "maxsize": pool.pool.maxsize,
+            # The queue holds idle connections plus None for each slot never used.
+            "in_use": pool.pool.maxsize - pool.pool.qsize(),
+            "idle": sum(1 for conn in list(pool.pool.queue) if conn is not None),
+            "connections_opened": pool.num_connections,
+            "requests": pool.num_requests,
+        }
+    return {"pid": os.getpid(), **_counters, "pools": pools}
@@ -1,7 +1,8 @@
 # add the faas callback view's url here
 from django.urls import path
-from faas.views import faas_callback_view
+from faas.views import faas_callback_view, faas_pool_stats_view
 
 urlpatterns = [
     path('callback/', faas_callback_view, name='faas-callback'),
+    path('pool-stats/', faas_pool_stats_view, name='faas-pool-stats'),
 ]
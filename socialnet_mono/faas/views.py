@@ -1,16 +1,21 @@
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from faas.services import process_callback_data
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from faas import ingest, transport
 
 @csrf_exempt
 def faas_callback_view(request):
-    print("FaaS Callback Received")
-    print("Method:", request.method)
-    print("Headers:", request.headers)
-    print("GET Params:", request.GET)
-    print("POST Data:", request.POST)
-    print("Body:", request.body)
-
-    process_callback_data(request)
+    # Queued and applied in batches by the consume_faas_callbacks workers (see faas/ingest.py)
+    ingest.submit(request)
 
     return JsonResponse({"status": "Callback received"}, status=200)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def faas_pool_stats_view(request):
+    """Connection pool usage and retry counters of the worker process serving the request."""
+    return Response(transport.pool_stats())
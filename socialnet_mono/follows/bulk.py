@@ -0,0 +1,64 @@
+"""
+Follow many users at once, e.g. when importing contacts during onboarding.
+
+Targets are given as user ids or usernames and resolved with one query. Self
+follows and existing follows are filtered out with another, and the rest are
+inserted with `bulk_create(ignore_conflicts=True)`. `bulk_create()` sends no
+`post_save`, so the follow cache, the profile counters and the follower's
+timeline are updated here, once for the whole batch, after it commits.
+"""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+
+from follows import cache
+from follows.models import Follow
+from posts import timeline
+from users.counters import user_counters
+
+User = get_user_model()
+
+BULK_FOLLOW_MAX_TARGETS = 5000
+
+
+def _after_follow(user_id: int, target_ids: list[int]):
+    cache.followed(user_id, *target_ids)
+    user_counters.incr_many({
+        user_id: {'following_count': len(target_ids)},
+        **{target_id: {'followers_count': 1} for target_id in target_ids},
+    })
+    timeline.add_authors(user_id, target_ids)
+
+
+def follow_many(user, targets: list[int | str]) -> dict:
+    """
+    Follow the users given by id (int) or username (str).
+
+    :return: The ids newly followed (`followed`) and already followed
+        (`already_following`), and the targets that matched no user
+        (`not_found`). Following yourself is skipped.
+    """
+    ids = {target for target in targets if isinstance(target, int)}
+    usernames = {target for target in targets if isinstance(target, str)}
+    found = list(User.objects.filter(Q(id__in=ids) | Q(username__in=usernames)).values_list('id', 'username'))
+    found_ids = {user_id for user_id, _ in found}
+    found_names = {username for _, username in found}
+    target_ids = found_ids - {user.id}
+
+    with transaction.atomic():
+        existing = set(Follow.objects.filter(user=user, target_id__in=target_ids).values_list('target_id', flat=True))
+        to_follow = sorted(target_ids - existing)
+        if to_follow:
+            Follow.objects.bulk_create(
+                [Follow(user=user, target_id=target_id) for target_id in to_follow],
+                ignore_conflicts=True,
+            )
+            transaction.on_commit(lambda: _after_follow(user.id, to_follow), robust=True)
+
+    return {
+        'followed': to_follow,
+        'already_following': sorted(existing),
+        'not_found': [
+            target for target in dict.fromkeys(targets) if target not in found_ids and target not in found_names
+        ],
+    }
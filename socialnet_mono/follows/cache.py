@@ -0,0 +1,172 @@
+"""
+Follow graph cache.
+
+Each user's following ids are kept in Redis as a set under
+`follows:following:<user id>`, so the feed, timelines and reports don't
+query `follows_follow` on every call. Follower counts are not cached here:
+`get_follower_count()` serves the buffered `User.followers_count` counter
+(see users/counters.py), so there is one follower count per user.
+
+Like timelines, these keys are a cache. A missing key is read from the
+`Follow` index and written back; warm following sets always hold the
+`_WARM` member so a user following nobody isn't mistaken for a cold one.
+Follows and unfollows update keys that are already warm once their
+transaction commits (see follows/signals.py), and every key expires
+FOLLOW_CACHE_TTL seconds after it was loaded. If Redis is unavailable, the
+helpers read the database.
+
+A follow committing while a miss is being read from the database finds the
+set cold, so it can't update it, and the ids read may not include it. Every
+update therefore also bumps the user's `follows:following-version:<user id>`
+counter, and a miss only writes what it read if the version is still the one
+it saw before reading.
+"""
+import logging
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from follows.models import Follow
+from users.counters import user_counters
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+_WARM = "w"
+
+# KEYS: follower's following set, its version. ARGV: +1 or -1, version TTL, then the target ids.
+# Applies follows or unfollows if the set is warm, and bumps the version either way.
+_UPDATE_SCRIPT = """
+local delta = tonumber(ARGV[1])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    for i = 3, #ARGV do
+        if delta > 0 then
+            redis.call('SADD', KEYS[1], ARGV[i])
+        else
+            redis.call('SREM', KEYS[1], ARGV[i])
+        end
+    end
+end
+redis.call('INCR', KEYS[2])
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+return 1
+"""
+
+# KEYS: following set, its version. ARGV: version seen before reading ('' for none), TTL, warm member, then the ids.
+# Writes the set unless it was updated (or filled) since.
+_FILL_SCRIPT = """
+local version = redis.call('GET', KEYS[2]) or ''
+if version ~= ARGV[1] or redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+redis.call('SADD', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+def following_key(user_id: int) -> str:
+    return f"follows:following:{user_id}"
+
+
+def version_key(user_id: int) -> str:
+    return f"follows:following-version:{user_id}"
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def _write_following(pipe, user_id: int, target_ids):
+    key = following_key(user_id)
+    pipe.delete(key)
+    pipe.sadd(key, _WARM, *target_ids)
+    pipe.expire(key, settings.FOLLOW_CACHE_TTL)
+
+
+def get_following_ids(user_id: int) -> list[int]:
+    """Ids of the users `user_id` follows."""
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        pipe.smembers(following_key(user_id))
+        pipe.get(version_key(user_id))
+        members, version = pipe.execute()
+    except RedisError as e:
+        logger.warning("Follow cache unavailable for user %s: %s", user_id, e)
+        return list(Follow.objects.filter(user_id=user_id).values_list('target_id', flat=True))
+    if members:
+        return [int(member) for member in members if member.decode() != _WARM]
+
+    target_ids = list(Follow.objects.filter(user_id=user_id).values_list('target_id', flat=True))
+    try:
+        _redis().register_script(_FILL_SCRIPT)(
+            keys=[following_key(user_id), version_key(user_id)],
+            args=[version or b'', settings.FOLLOW_CACHE_TTL, _WARM, *target_ids],
+        )
+    except RedisError as e:
+        logger.warning("Could not cache following ids of user %s: %s", user_id, e)
+    return target_ids
+
+
+def get_follower_count(user_id: int) -> int:
+    """How many users follow `user_id`: their counter plus the follows not flushed to it yet."""
+    count = User.objects.filter(id=user_id).values_list('followers_count', flat=True).first() or 0
+    delta = user_counters.pending([user_id]).get(user_id, {}).get('followers_count', 0)
+    return max(count + delta, 0)
+
+
+def _update(user_id: int, target_ids: list[int], delta: int):
+    if not target_ids:
+        return
+    try:
+        _redis().register_script(_UPDATE_SCRIPT)(
+            keys=[following_key(user_id), version_key(user_id)],
+            args=[delta, settings.FOLLOW_CACHE_TTL, *target_ids],
+        )
+    except RedisError as e:
+        logger.warning("Could not update follow cache for %s -> %s: %s", user_id, target_ids, e)
+        forget(user_id, *target_ids)
+
+
+def followed(user_id: int, *target_ids: int):
+    _update(user_id, list(target_ids), 1)
+
+
+def unfollowed(user_id: int, *target_ids: int):
+    _update(user_id, list(target_ids), -1)
+
+
+def forget(*user_ids: int):
+    """Drop the cached keys of users that may have missed an update."""
+    try:
+        pipe = _redis().pipeline(transaction=True)
+        pipe.delete(*[following_key(user_id) for user_id in user_ids])
+        for user_id in user_ids:
+            # Also stops misses already reading the database from writing back what they read.
+            pipe.incr(version_key(user_id))
+            pipe.expire(version_key(user_id), settings.FOLLOW_CACHE_TTL)
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def warm(user_ids) -> int:
+    """
+    Load the following sets of `user_ids` with one query, replacing what is
+    cached.
+
+    :return: Number of users warmed
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    following = {user_id: [] for user_id in user_ids}
+    for user_id, target_id in Follow.objects.filter(user_id__in=user_ids).values_list('user_id', 'target_id'):
+        following[user_id].append(target_id)
+
+    pipe = _redis().pipeline(transaction=False)
+    for user_id in user_ids:
+        _write_following(pipe, user_id, following[user_id])
+    pipe.execute()
+    return len(user_ids)
@@ -0,0 +1,170 @@
+"""
+The follow graph as compact CSR arrays, for batch jobs that walk all of it.
+
+Users are indexed by their id. The ids user `u` follows are
+`targets[offsets[u]:offsets[u + 1]]` and the ids following `u` are
+`sources[reverse_offsets[u]:reverse_offsets[u + 1]]`, both sorted, so
+neighbours and degrees are slices and intersections are merges of sorted
+arrays. Ids are stored as int32, offsets as int64.
+
+`FollowGraph.build()` streams `follows_follow` through a server-side cursor
+straight into NumPy arrays, without building model instances. `save()`
+writes a snapshot as `.npy` files into a new directory next to the previous
+ones and atomically points the `current` symlink at it. `load()` memory-maps
+the files read-only, so every worker process on the host shares the same
+pages of the OS page cache instead of holding its own copy. `current_graph()`
+keeps one mapped snapshot per process and remaps it when a newer one is
+published.
+"""
+import os
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from follows.models import Follow
+
+ARRAYS = ('offsets', 'targets', 'reverse_offsets', 'sources')
+CURRENT = 'current'
+KEEP_SNAPSHOTS = 2
+
+_ID_DTYPE = np.int32
+_OFFSET_DTYPE = np.int64
+
+
+def _csr(keys: np.ndarray, values: np.ndarray, size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Offsets and values of the CSR rows keyed by `keys`, each row sorted."""
+    order = np.lexsort((values, keys))
+    offsets = np.zeros(size + 1, dtype=_OFFSET_DTYPE)
+    np.cumsum(np.bincount(keys, minlength=size), out=offsets[1:])
+    return offsets, np.ascontiguousarray(values[order])
+
+
+class FollowGraph:
+    def __init__(self, offsets: np.ndarray, targets: np.ndarray, reverse_offsets: np.ndarray, sources: np.ndarray):
+        self.offsets = offsets
+        self.targets = targets
+        self.reverse_offsets = reverse_offsets
+        self.sources = sources
+
+    @classmethod
+    def build(cls, chunk_size: int = 100000) -> 'FollowGraph':
+        table = connection.ops.quote_name(Follow._meta.db_table)
+        chunks = []
+        with connection.chunked_cursor() as cursor:
+            cursor.execute(f"SELECT user_id, target_id FROM {table}")
+            while rows := cursor.fetchmany(chunk_size):
+                chunks.append(np.array(rows, dtype=np.int64))
+        edges = np.concatenate(chunks) if chunks else np.empty((0, 2), dtype=np.int64)
+        if len(edges) and edges.max() > np.iinfo(_ID_DTYPE).max:
+            raise OverflowError("User ids don't fit the int32 follow graph snapshot.")
+
+        users, targets = edges[:, 0].astype(_ID_DTYPE), edges[:, 1].astype(_ID_DTYPE)
+        del edges
+        size = int(max(users.max(), targets.max())) + 1 if len(users) else 0
+        offsets, targets_sorted = _csr(users, targets, size)
+        reverse_offsets, sources = _csr(targets, users, size)
+        return cls(offsets, targets_sorted, reverse_offsets, sources)
+
+    def save(self, directory: str | os.PathLike | None = None) -> Path:
+        """
+        Write the snapshot into a new directory under `directory` and make it
+        the current one. Older snapshots beyond the last KEEP_SNAPSHOTS are
+        removed; processes that still have them mapped keep reading them.
+
+        :return: The new snapshot's directory
+        """
+        root = Path(directory or settings.FOLLOW_GRAPH_SNAPSHOT_DIR)
+        root.mkdir(parents=True, exist_ok=True)
+        path = Path(tempfile.mkdtemp(prefix=f"snapshot-{time.time_ns()}-", dir=root))
+        path.chmod(0o755)  # readable by workers running as other users
+        for name in ARRAYS:
+            np.save(path / f"{name}.npy", getattr(self, name))
+
+        link = root / f".{CURRENT}-{path.name}"
+        link.symlink_to(path.name)
+        os.replace(link, root / CURRENT)
+
+        for old in sorted(root.glob("snapshot-*"))[:-KEEP_SNAPSHOTS]:
+            shutil.rmtree(old, ignore_errors=True)
+        return path
+
+    @classmethod
+    def load(cls, directory: str | os.PathLike | None = None) -> 'FollowGraph':
+        """Memory-map the current snapshot (or the snapshot at `directory`) read-only."""
+        path = Path(directory or settings.FOLLOW_GRAPH_SNAPSHOT_DIR)
+        if (path / CURRENT).exists():
+            path = (path / CURRENT).resolve()
+        return cls(*(np.load(path / f"{name}.npy", mmap_mode='r') for name in ARRAYS))
+
+    @property
+    def size(self) -> int:
+        """One more than the highest user id in the graph."""
+        return len(self.offsets) - 1
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def _row(self, offsets: np.ndarray, values: np.ndarray, user_id: int) -> np.ndarray:
+        if not 0 <= user_id < self.size:
+            return values[:0]
+        return values[offsets[user_id]:offsets[user_id + 1]]
+
+    def following(self, user_id: int) -> np.ndarray:
+        """Sorted ids of the users `user_id` follows."""
+        return self._row(self.offsets, self.targets, user_id)
+
+    def followers(self, user_id: int) -> np.ndarray:
+        """Sorted ids of the users following `user_id`."""
+        return self._row(self.reverse_offsets, self.sources, user_id)
+
+    def following_count(self, user_id: int) -> int:
+        return len(self.following(user_id))
+
+    def follower_count(self, user_id: int) -> int:
+        return len(self.followers(user_id))
+
+    def common_following(self, user_id: int, other_id: int) -> np.ndarray:
+        """Users both `user_id` and `other_id` follow."""
+        return np.intersect1d(self.following(user_id), self.following(other_id), assume_unique=True)
+
+    def common_followers(self, user_id: int, other_id: int) -> np.ndarray:
+        """Users following both `user_id` and `other_id`."""
+        return np.intersect1d(self.followers(user_id), self.followers(other_id), assume_unique=True)
+
+    def following_of(self, user_ids: np.ndarray) -> np.ndarray:
+        """Everyone followed by any of `user_ids`, concatenated (with repeats)."""
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        starts = self.offsets[user_ids]
+        lengths = self.offsets[user_ids + 1] - starts
+        # Position k of the output belongs to segment j and reads starts[j] + (k - segment j's start).
+        shift = starts - (np.cumsum(lengths) - lengths)
+        return self.targets[np.arange(lengths.sum()) + np.repeat(shift, lengths)]
+
+    def users(self) -> np.ndarray:
+        """Ids of the users following anyone."""
+        return np.flatnonzero(np.diff(self.offsets))
+
+
+_current: tuple[Path, FollowGraph] | None = None
+
+
+def current_graph() -> FollowGraph | None:
+    """
+    The current snapshot, mapped once per process and remapped after a newer
+    one is published. None when no snapshot has been exported yet.
+    """
+    global _current
+    link = Path(settings.FOLLOW_GRAPH_SNAPSHOT_DIR) / CURRENT
+    try:
+        path = link.resolve(strict=True)
+    except FileNotFoundError:
+        return None
+    if _current is None or _current[0] != path:
+        _current = (path, FollowGraph.load(path))
+    return _current[1]
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from follows.graph import FollowGraph
+
+
+class Command(BaseCommand):
+    help = "Export the follow graph into a memory-mapped CSR snapshot shared by batch jobs."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--directory", default=None, help="Snapshot directory (default FOLLOW_GRAPH_SNAPSHOT_DIR).")
+        parser.add_argument("--chunk-size", type=int, default=100000, help="Rows fetched per cursor round trip.")
+
+    def handle(self, *args, **options):
+        graph = FollowGraph.build(chunk_size=options["chunk_size"])
+        path = graph.save(options["directory"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Exported {graph.edge_count} follows of {graph.size} user ids to {path}."
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from follows import suggestions
+from follows.graph import current_graph
+
+
+class Command(BaseCommand):
+    help = "Recompute who-to-follow suggestions from friends of friends and store them in Redis."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Users written per Redis pipeline.")
+        parser.add_argument(
+            "--current-snapshot", action="store_true",
+            help="Score from the current follow graph snapshot instead of exporting a new one.",
+        )
+
+    def handle(self, *args, **options):
+        graph = None
+        if options["current_snapshot"]:
+            graph = current_graph()
+            if graph is None:
+                raise CommandError("No follow graph snapshot yet, run export_follow_graph first.")
+        count = suggestions.rebuild(graph, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt follow suggestions of {count} users."))
@@ -0,0 +1,42 @@
+from datetime import timedelta
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from follows import cache
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Load following ids into the follow graph cache in Redis."
+
+    def add_arguments(self, parser):
+        parser.add_argument("user_ids", nargs="*", type=int, help="Warm only these users.")
+        parser.add_argument("--all", action="store_true", help="Warm every active user.")
+        parser.add_argument(
+            "--active-days", type=int, default=None,
+            help="Only warm users who logged in within the last N days.",
+        )
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        if options["user_ids"]:
+            user_ids = iter(options["user_ids"])
+        elif options["all"] or options["active_days"] is not None:
+            users = User.objects.filter(is_active=True)
+            if options["active_days"] is not None:
+                users = users.filter(last_login__gte=timezone.now() - timedelta(days=options["active_days"]))
+            user_ids = users.order_by("id").values_list("id", flat=True).iterator(chunk_size=options["batch_size"])
+        else:
+            raise CommandError("Pass user ids, --all or --active-days.")
+
+        warmed = 0
+        while batch := list(islice(user_ids, options["batch_size"])):
+            warmed += cache.warm(batch)
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Up to user {batch[-1]}")
+
+        self.stdout.write(self.style.SUCCESS(f"Warmed the follow cache of {warmed} users."))
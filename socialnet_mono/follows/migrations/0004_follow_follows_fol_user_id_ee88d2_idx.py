@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('follows', '0003_follow_follows_fol_target__2218f6_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['user', 'created_at'], name='follows_fol_user_id_ee88d2_idx'),
+        ),
+    ]
@@ -14,6 +14,7 @@ class Follow(models.Model):
             models.Index(fields=["user"]),
             models.Index(fields=["target"]),
             models.Index(fields=["target", "created_at"]),
+            models.Index(fields=["user", "created_at"]),
         ]
         constraints = [
             models.CheckConstraint(check=~models.Q(user=models.F("target")), name="no_self_follow")
@@ -1,12 +1,15 @@
 from rest_framework import serializers
+from .bulk import BULK_FOLLOW_MAX_TARGETS
 from .models import Follow
 from users.models import User
+from socialnet_mono.fieldsets import SparseFieldsetMixin
 
 
-class UserPublicSerializer(serializers.ModelSerializer):
+class UserPublicSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['id', 'username', 'bio', 'avatar']
+        fields = ['id', 'username', 'bio', 'avatar', 'followers_count', 'following_count', 'posts_count']
+        read_only_fields = ['followers_count', 'following_count', 'posts_count']
 
 
 class FollowSerializer(serializers.ModelSerializer):
@@ -15,3 +18,20 @@ class FollowSerializer(serializers.ModelSerializer):
     class Meta:
         model = Follow
         fields = ['target']
+
+
+class FollowTargetField(serializers.Field):
+    """A user id (integer) or username (string)."""
+    default_error_messages = {'invalid': 'Expected a user id or a username.'}
+
+    def to_internal_value(self, data):
+        if isinstance(data, bool) or not isinstance(data, (int, str)) or data == '':
+            self.fail('invalid')
+        return data
+
+    def to_representation(self, value):
+        return value
+
+
+class BulkFollowSerializer(serializers.Serializer):
+    targets = serializers.ListField(child=FollowTargetField(), allow_empty=False, max_length=BULK_FOLLOW_MAX_TARGETS)
@@ -0,0 +1,48 @@
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from follows import cache
+from follows.models import Follow
+from posts import timeline
+from users.counters import user_counters
+
+
+@receiver(post_save, sender=Follow)
+def merge_followed_posts_into_timeline(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: timeline.add_author(instance.user_id, instance.target_id), robust=True)
+
+
+@receiver(post_delete, sender=Follow)
+def drop_unfollowed_posts_from_timeline(sender, instance, **kwargs):
+    transaction.on_commit(lambda: timeline.remove_author(instance.user_id, instance.target_id), robust=True)
+
+
+@receiver(post_save, sender=Follow)
+def add_follow_to_cache(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: cache.followed(instance.user_id, instance.target_id), robust=True)
+
+
+@receiver(post_delete, sender=Follow)
+def remove_follow_from_cache(sender, instance, **kwargs):
+    transaction.on_commit(lambda: cache.unfollowed(instance.user_id, instance.target_id), robust=True)
+
+
+def _count_follow(follow: Follow, delta: int):
+    user_counters.incr_many({
+        follow.user_id: {'following_count': delta},
+        follow.target_id: {'followers_count': delta},
+    })
+
+
+@receiver(post_save, sender=Follow)
+def count_follow(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: _count_follow(instance, 1), robust=True)
+
+
+@receiver(post_delete, sender=Follow)
+def count_unfollow(sender, instance, **kwargs):
+    transaction.on_commit(lambda: _count_follow(instance, -1), robust=True)
@@ -0,0 +1,9 @@
+from celery import shared_task
+
+from follows import suggestions
+
+
+@shared_task(ignore_result=True)
+def rebuild_follow_suggestions():
+    """Recompute everyone's who-to-follow suggestions from a fresh follow graph snapshot."""
+    return suggestions.rebuild()
@@ -0,0 +1,55 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from users.counters import user_counters
+from follows import cache
+from follows.bulk import BULK_FOLLOW_MAX_TARGETS
+from follows.models import Follow
+from posts import timeline
+from posts.models import Post
+
+
+@pytest.mark.django_db
+def test_bulk_follow_resolves_ids_and_usernames(django_capture_on_commit_callbacks):
+    me = User.objects.create_user(username="me", password="pass", email="me@x.com")
+    users = [User.objects.create_user(username=f"user{i}", password="pass", email=f"user{i}@x.com") for i in range(4)]
+    Follow.objects.create(user=me, target=users[0])
+    post = Post.objects.create(author=users[2], content="hello")
+    cache.warm([me.id, users[1].id])
+    timeline.rebuild(me.id)
+    client = APIClient()
+    client.force_authenticate(me)
+
+    targets = [users[0].id, users[1].id, "user2", "user2", me.id, 10**6, "nobody"]
+    with django_capture_on_commit_callbacks(execute=True), CaptureQueriesContext(connection) as ctx:
+        resp = client.post(reverse("follow_bulk"), {"targets": targets}, format="json")
+    assert resp.status_code == 200
+    assert resp.data == {
+        "followed": [users[1].id, users[2].id],
+        "already_following": [users[0].id],
+        "not_found": [10**6, "nobody"],
+    }
+    assert len([q for q in ctx.captured_queries if "follows_follow" in q["sql"]]) == 2
+    assert set(Follow.objects.filter(user=me).values_list("target_id", flat=True)) == {u.id for u in users[:3]}
+
+    assert sorted(cache.get_following_ids(me.id)) == [u.id for u in users[:3]]
+    assert cache.get_follower_count(users[1].id) == 1
+    assert user_counters.pending([me.id, users[2].id]) == {
+        me.id: {"following_count": 2},
+        users[2].id: {"followers_count": 1},
+    }
+    entries, _ = timeline.read(me.id, 20)
+    assert [event_id for _, _, event_id in entries] == [post.id]
+
+
+@pytest.mark.django_db
+def test_bulk_follow_validates_targets():
+    me = User.objects.create_user(username="me", password="pass", email="me@x.com")
+    client = APIClient()
+    client.force_authenticate(me)
+    for targets in ([], [True], [1.5], [""], list(range(1, BULK_FOLLOW_MAX_TARGETS + 2))):
+        resp = client.post(reverse("follow_bulk"), {"targets": targets}, format="json")
+        assert resp.status_code == 400
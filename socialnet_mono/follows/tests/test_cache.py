@@ -0,0 +1,111 @@
+import pytest
+from unittest.mock import patch
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django_redis import get_redis_connection
+from redis.exceptions import ConnectionError
+from rest_framework.test import APIClient
+from users.models import User
+from follows import cache
+from follows.models import Follow
+
+
+@pytest.fixture
+def users():
+    return [User.objects.create_user(username=f"user{i}", password="pass", email=f"user{i}@x.com") for i in range(3)]
+
+
+@pytest.mark.django_db
+def test_misses_are_read_from_the_database_and_cached(users):
+    a, b, c = users
+    Follow.objects.create(user=a, target=b)
+    Follow.objects.create(user=c, target=b)
+
+    assert cache.get_following_ids(a.id) == [b.id]
+    assert cache.get_following_ids(b.id) == []
+    with CaptureQueriesContext(connection) as ctx:
+        assert cache.get_following_ids(a.id) == [b.id]
+        assert cache.get_following_ids(b.id) == []
+    assert len(ctx.captured_queries) == 0
+
+
+@pytest.mark.django_db
+def test_follow_views_update_warm_keys_on_commit(users, django_capture_on_commit_callbacks):
+    a, b, _ = users
+    client = APIClient()
+    client.force_authenticate(a)
+    cache.warm([a.id, b.id])
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert client.post(reverse("follow_user", args=[b.id])).status_code == 201
+    assert cache.get_following_ids(a.id) == [b.id]
+    assert cache.get_follower_count(b.id) == 1
+
+    with django_capture_on_commit_callbacks(execute=True):
+        assert client.delete(reverse("unfollow_user", args=[b.id])).status_code == 200
+    assert cache.get_following_ids(a.id) == []
+    assert cache.get_follower_count(b.id) == 0
+
+
+@pytest.mark.django_db
+def test_cold_keys_are_left_alone(users, django_capture_on_commit_callbacks):
+    a, b, _ = users
+    with django_capture_on_commit_callbacks(execute=True):
+        Follow.objects.create(user=a, target=b)
+    assert not get_redis_connection("default").exists(cache.following_key(a.id))
+
+
+@pytest.mark.django_db
+def test_warm_follow_cache_command(users):
+    a, b, c = users
+    Follow.objects.create(user=a, target=b)
+    Follow.objects.create(user=a, target=c)
+    call_command("warm_follow_cache", "--all", "--batch-size", "2")
+    with CaptureQueriesContext(connection) as ctx:
+        assert sorted(cache.get_following_ids(a.id)) == [b.id, c.id]
+        assert cache.get_following_ids(b.id) == []
+    assert len(ctx.captured_queries) == 0
+
+
+@pytest.mark.django_db
+def test_falls_back_to_the_database_without_redis(users):
+    a, b, _ = users
+    Follow.objects.create(user=a, target=b)
+    with patch("follows.cache._redis", side_effect=ConnectionError("down")):
+        assert cache.get_following_ids(a.id) == [b.id]
+
+
+@pytest.mark.django_db
+def test_follower_count_is_the_user_counter(users, django_capture_on_commit_callbacks):
+    a, b, c = users
+    User.objects.filter(id=b.id).update(followers_count=5)
+    assert cache.get_follower_count(b.id) == 5
+
+    # Follows not flushed to the column yet are included.
+    with django_capture_on_commit_callbacks(execute=True):
+        Follow.objects.create(user=a, target=b)
+        Follow.objects.create(user=c, target=b)
+    assert cache.get_follower_count(b.id) == 7
+    assert cache.get_follower_count(b.id + 1000) == 0
+
+
+@pytest.mark.django_db
+def test_miss_does_not_overwrite_a_follow_committed_while_reading(users):
+    a, b, _ = users
+    values_list = Follow.objects.filter(user_id=a.id).values_list
+
+    def read_then_follow(*args, **kwargs):
+        # The miss has read a's (empty) following ids when a's follow of b commits.
+        stale = list(values_list(*args, **kwargs))
+        Follow.objects.create(user=a, target=b)
+        cache.followed(a.id, b.id)
+        return stale
+
+    with patch("follows.cache.Follow.objects.filter") as filter_follows:
+        filter_follows.return_value.values_list.side_effect = read_then_follow
+        assert cache.get_following_ids(a.id) == []
+    assert not get_redis_connection("default").exists(cache.following_key(a.id))
+    assert cache.get_following_ids(a.id) == [b.id]
+    assert cache.get_following_ids(a.id) == [b.id]
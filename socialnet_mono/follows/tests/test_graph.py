@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+from django.core.management import call_command
+from users.models import User
+from follows import graph as follow_graph
+from follows.graph import FollowGraph
+from follows.models import Follow
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(settings, tmp_path):
+    settings.FOLLOW_GRAPH_SNAPSHOT_DIR = str(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def users():
+    users = [User.objects.create_user(username=f"user{i}", password="pass", email=f"user{i}@x.com") for i in range(4)]
+    a, b, c, d = users
+    for user, target in [(a, b), (a, c), (b, c), (d, c), (d, a)]:
+        Follow.objects.create(user=user, target=target)
+    return users
+
+
+@pytest.mark.django_db
+def test_snapshot_has_forward_and_reverse_rows(users):
+    a, b, c, d = users
+    graph = FollowGraph.build(chunk_size=2)
+    assert graph.targets.dtype.name == graph.sources.dtype.name == "int32"
+    assert graph.edge_count == 5
+    assert graph.following(a.id).tolist() == sorted([b.id, c.id])
+    assert graph.followers(c.id).tolist() == sorted([a.id, b.id, d.id])
+    assert (graph.following_count(d.id), graph.follower_count(d.id)) == (2, 0)
+    assert graph.common_following(a.id, d.id).tolist() == [c.id]
+    assert graph.common_followers(b.id, c.id).tolist() == [a.id]
+    assert graph.followers(10**6).tolist() == []
+
+
+@pytest.mark.django_db
+def test_snapshots_are_memory_mapped_and_swapped(users, snapshot_dir):
+    a, b, c, d = users
+    call_command("export_follow_graph")
+    first = follow_graph.current_graph()
+    assert isinstance(first.targets, np.memmap)
+    assert first.following(a.id).tolist() == sorted([b.id, c.id])
+    assert follow_graph.current_graph() is first
+
+    Follow.objects.create(user=c, target=d)
+    for _ in range(3):
+        FollowGraph.build().save()
+    second = follow_graph.current_graph()
+    assert second is not first
+    assert second.following(c.id).tolist() == [d.id]
+    # The old mapping stays readable after its files are pruned.
+    assert len(list(snapshot_dir.glob("snapshot-*"))) == 2
+    assert first.following(c.id).tolist() == []
@@ -0,0 +1,61 @@
+import base64
+import json
+
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from follows.models import Follow
+
+
+@pytest.mark.django_db
+def test_followers_cursor_pagination_and_offset_opt_out():
+    client = APIClient()
+    target = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    followers = [
+        User.objects.create_user(username=f"user{i}", password="pass", email=f"user{i}@x.com")
+        for i in range(5)
+    ]
+    for follower in followers:
+        Follow.objects.create(user=follower, target=target)
+    client.force_authenticate(followers[0])
+    url = reverse("followers_list", args=[target.id])
+
+    seen = []
+    resp = client.get(url, {"limit": 2})
+    while True:
+        assert resp.status_code == 200
+        assert "count" not in resp.data
+        seen += [u["id"] for u in resp.data["results"]]
+        if not resp.data["next"]:
+            break
+        resp = client.get(resp.data["next"])
+    # Newest follows first, every follower exactly once.
+    assert seen == [u.id for u in reversed(followers)]
+
+    resp = client.get(url, {"pagination": "offset", "limit": 2, "offset": 4})
+    assert resp.data["count"] == 5
+    assert [u["id"] for u in resp.data["results"]] == [followers[0].id]
+
+    resp = client.get(url, {"cursor": "not-a-cursor"})
+    assert resp.status_code == 404
+
+
+def _cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("values", [
+    [1],
+    ["2024-01-01T00:00:00+00:00", 1, 2],
+    [5, 6],
+    ["2024-01-01T00:00:00+00:00", "2024-01-01T00:00:00+00:00"],
+    {"id": 1},
+])
+def test_well_formed_but_wrong_cursor_is_not_found(values):
+    user = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    client = APIClient()
+    client.force_authenticate(user)
+    resp = client.get(reverse("followers_list", args=[user.id]), {"cursor": _cursor(values)})
+    assert resp.status_code == 404
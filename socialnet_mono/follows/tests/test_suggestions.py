@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from follows import suggestions
+from follows.graph import FollowGraph
+from follows.models import Follow
+
+
+@pytest.fixture(autouse=True)
+def snapshot_dir(settings, tmp_path):
+    settings.FOLLOW_GRAPH_SNAPSHOT_DIR = str(tmp_path)
+
+
+@pytest.fixture
+def graph_users():
+    users = [User.objects.create_user(username=f"user{i}", password="pass", email=f"user{i}@x.com") for i in range(6)]
+    me, a, b, c, d, e = users
+    for user, target in [(me, a), (me, b), (a, c), (b, c), (a, d), (b, me), (c, e)]:
+        Follow.objects.create(user=user, target=target)
+    return users
+
+
+@pytest.mark.django_db
+def test_graph_is_built_as_csr(graph_users):
+    me, a, b, c, d, e = graph_users
+    graph = FollowGraph.build(chunk_size=2)
+    assert graph.following(me.id).tolist() == sorted([a.id, b.id])
+    assert graph.following(d.id).tolist() == []
+    assert graph.following(10**6).tolist() == []
+    assert sorted(graph.following_of(np.array([a.id, b.id])).tolist()) == sorted([c.id, d.id, c.id, me.id])
+    assert graph.users().tolist() == sorted([me.id, a.id, b.id, c.id])
+
+
+@pytest.mark.django_db
+def test_candidates_are_ranked_by_mutual_count(graph_users):
+    me, a, b, c, d, e = graph_users
+    graph = FollowGraph.build()
+    assert suggestions.top_candidates(graph, me.id, size=10, max_following=10) == [(c.id, 2), (d.id, 1)]
+    assert suggestions.top_candidates(graph, me.id, size=1, max_following=10) == [(c.id, 2)]
+
+
+@pytest.mark.django_db
+def test_suggestions_endpoint_serves_stored_candidates(graph_users, django_capture_on_commit_callbacks):
+    me, a, b, c, d, e = graph_users
+    call_command("rebuild_follow_suggestions")
+    client = APIClient()
+    client.force_authenticate(me)
+
+    resp = client.get(reverse("follow_suggestions"), {"fields": "id,username"})
+    assert resp.status_code == 200
+    assert resp.data["results"] == [
+        {"id": c.id, "username": "user3", "mutual_count": 2},
+        {"id": d.id, "username": "user4", "mutual_count": 1},
+    ]
+
+    # Accounts followed since the last rebuild are left out.
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(reverse("follow_user", args=[c.id]))
+    resp = client.get(reverse("follow_suggestions"))
+    assert [user["id"] for user in resp.data["results"]] == [d.id]
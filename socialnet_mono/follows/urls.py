@@ -1,9 +1,11 @@
 from django.urls import path
-from .views import FollowUserView, UnfollowUserView, FollowersListView, FollowingsListView
+from .views import BulkFollowView, FollowUserView, UnfollowUserView, FollowersListView, FollowingsListView, FollowSuggestionsView
 
 urlpatterns = [
     path('follow/<int:target_id>/', FollowUserView.as_view(), name='follow_user'),
+    path('follow/bulk/', BulkFollowView.as_view(), name='follow_bulk'),
     path('unfollow/<int:target_id>/', UnfollowUserView.as_view(), name='unfollow_user'),
     path('<int:target_id>/followers/', FollowersListView.as_view(), name='followers_list'),
     path('<int:target_id>/followings/', FollowingsListView.as_view(), name='followings_list'),
+    path('suggestions/', FollowSuggestionsView.as_view(), name='follow_suggestions'),
 ]
@@ -2,8 +2,12 @@ from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from django.shortcuts import get_object_or_404
 from django.contrib.auth import get_user_model
+from django.db.models import F
 from .models import Follow
-from .serializers import FollowSerializer, UserPublicSerializer
+from .serializers import BulkFollowSerializer, FollowSerializer, UserPublicSerializer
+from . import bulk, suggestions
+from users.counters import user_counters
+from socialnet_mono.pagination import KeysetPagination
 
 User = get_user_model()
 
@@ -29,6 +33,16 @@ class FollowUserView(generics.CreateAPIView):
         return Response({"status": "already following"}, status=status.HTTP_200_OK)
 
 
+class BulkFollowView(generics.GenericAPIView):
+    """Follow up to BULK_FOLLOW_MAX_TARGETS users by id or username, e.g. from a contact import."""
+    serializer_class = BulkFollowSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(bulk.follow_many(request.user, serializer.validated_data['targets']))
+
+
 class UnfollowUserView(generics.DestroyAPIView):
     queryset = Follow.objects.all()
 
@@ -47,8 +61,18 @@ class UnfollowUserView(generics.DestroyAPIView):
         return Response({"status": "not following"}, status=status.HTTP_404_NOT_FOUND)
 
 
-class FollowersListView(generics.ListAPIView):
+class UserPageMixin:
+    """Adds the profile counter deltas still buffered in Redis to each page of users."""
+
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        return None if page is None else user_counters.merge(page)
+
+
+class FollowersListView(UserPageMixin, generics.ListAPIView):
     serializer_class = UserPublicSerializer
+    pagination_class = KeysetPagination
+    cursor_fields = ("followed_at", "follow_id")
 
     def get_queryset(self):
         target_id = self.kwargs.get("target_id")
@@ -59,11 +83,16 @@ class FollowersListView(generics.ListAPIView):
         except (TypeError, ValueError):
             return User.objects.none()
         target_user = get_object_or_404(User, pk=target_id_int)
-        return User.objects.filter(following_set__target=target_user)
+        return User.objects.filter(following_set__target=target_user).annotate(
+            followed_at=F("following_set__created_at"),
+            follow_id=F("following_set__id"),
+        ).only(*UserPublicSerializer.only_columns(self.request))
 
 
-class FollowingsListView(generics.ListAPIView):
+class FollowingsListView(UserPageMixin, generics.ListAPIView):
     serializer_class = UserPublicSerializer
+    pagination_class = KeysetPagination
+    cursor_fields = ("followed_at", "follow_id")
 
     def get_queryset(self):
         target_id = self.kwargs.get("target_id")
@@ -74,4 +103,26 @@ class FollowingsListView(generics.ListAPIView):
         except (TypeError, ValueError):
             return User.objects.none()
         target_user = get_object_or_404(User, pk=target_id_int)
-        return User.objects.filter(followers_set__user=target_user)
+        return User.objects.filter(followers_set__user=target_user).annotate(
+            followed_at=F("followers_set__created_at"),
+            follow_id=F("followers_set__id"),
+        ).only(*UserPublicSerializer.only_columns(self.request))
+
+
+class FollowSuggestionsView(generics.GenericAPIView):
+    """Who to follow: accounts followed by the people the user follows, with how many of them do."""
+    serializer_class = UserPublicSerializer
+
+    def get(self, request, *args, **kwargs):
+        candidates = suggestions.get_suggestions(request.user.id)
+        users = {
+            user.id: user
+            for user in User.objects.filter(id__in=[user_id for user_id, _ in candidates])
+            .only(*UserPublicSerializer.only_columns(request))
+        }
+        user_counters.merge(users.values())
+        results = []
+        for user_id, mutual in candidates:
+            if user_id in users:
+                results.append({**self.get_serializer(users[user_id]).data, 'mutual_count': mutual})
+        return Response({'results': results})
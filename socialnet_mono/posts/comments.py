@@ -0,0 +1,152 @@
+"""
+Bounded comment previews.
+
+A serialized post embeds at most COMMENT_PREVIEW_SIZE of its newest comments,
+each with its own preview of replies, down to COMMENT_PREVIEW_MAX_DEPTH
+levels. Anything beyond that is paged through the thread endpoint
+(`CommentThreadView`), which the preview links to with a cursor.
+
+Previews for a whole page are loaded level by level, with one windowed query
+per level that keeps the newest `size + 1` comments of every parent.
+
+Comments also store a materialized path: the ids of their ancestors, each
+zero-padded to PATH_WIDTH digits. A whole subtree is then a single prefix
+range scan on `path`, and sorting it on `path + own id` gives the thread in
+depth-first order (`subtree()`). Paths are digits only so that the ordering
+doesn't depend on the database collation.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db.models import CharField, F, Value, Window
+from django.db.models.functions import Cast, Concat, LPad, RowNumber
+from django.urls import reverse
+from rest_framework.utils.urls import replace_query_param
+
+from posts.models import Post
+from socialnet_mono.pagination import KeysetPagination
+
+CURSOR_FIELDS = ('created_at', 'id')
+
+PATH_WIDTH = 10
+MAX_DEPTH = Post._meta.get_field('path').max_length // PATH_WIDTH
+
+
+@dataclass
+class CommentPreview:
+    comments: list = field(default_factory=list)  # posts, or rows when loaded with `fields`
+    has_more: bool = False
+
+
+def top_comments(parent_ids, size: int, fields=None) -> list:
+    """
+    The newest `size` comments of each parent, in one query. With `fields`
+    the comments are returned as `.values()` rows of those fields.
+    """
+    if not parent_ids:
+        return []
+    qs = Post.objects.filter(parent_id__in=parent_ids).annotate(
+        row=Window(
+            RowNumber(),
+            partition_by=[F('parent_id')],
+            order_by=[F('created_at').desc(), F('id').desc()],
+        ),
+    ).filter(row__lte=size).order_by('parent_id', 'row')
+    return list(qs.select_related('author') if fields is None else qs.values(*fields))
+
+
+def _set_preview(post: Post, preview: CommentPreview | None):
+    post.comment_preview = preview
+
+
+def _set_row_preview(row: dict, preview: CommentPreview | None):
+    row['comment_preview'] = preview
+
+
+def load_previews(posts, size: int | None = None, max_depth: int | None = None, fields=None) -> list:
+    """
+    Attach a `comment_preview` to each post and to the comments in it, down
+    to `max_depth` levels. Posts on the last level get `comment_preview = None`,
+    their replies are only reachable through the thread endpoint.
+
+    With `fields`, `posts` are `.values()` rows (which must include `id`),
+    comments are loaded as rows of `fields` too and previews are stored under
+    the rows' `comment_preview` key.
+
+    :return: Every comment loaded, across all levels
+    """
+    size = settings.COMMENT_PREVIEW_SIZE if size is None else size
+    max_depth = settings.COMMENT_PREVIEW_MAX_DEPTH if max_depth is None else max_depth
+    get, attach = (getattr, _set_preview) if fields is None else (dict.__getitem__, _set_row_preview)
+
+    loaded, level = [], list(posts)
+    for _ in range(max_depth):
+        if not level:
+            break
+        by_parent = defaultdict(list)
+        for comment in top_comments([get(post, 'id') for post in level], size + 1, fields):
+            by_parent[get(comment, 'parent_id')].append(comment)
+
+        next_level = []
+        for post in level:
+            comments = by_parent.get(get(post, 'id'), [])
+            attach(post, CommentPreview(comments[:size], len(comments) > size))
+            next_level += comments[:size]
+        loaded += next_level
+        level = next_level
+
+    for post in level:
+        attach(post, None)
+    return loaded
+
+
+def thread_link(request, post_id: int, after: list | None = None) -> str:
+    """
+    Link to the thread endpoint of a post, continuing after the comment at
+    cursor position `after` (e.g. the last one of a preview).
+    """
+    url = reverse('post_comments', args=[post_id])
+    if request is not None:
+        url = request.build_absolute_uri(url)
+    if not after:
+        return url
+    paginator = KeysetPagination()
+    return replace_query_param(url, paginator.cursor_query_param, paginator.encode_cursor(after))
+
+
+def path_segment(post_id: int) -> str:
+    return str(post_id).zfill(PATH_WIDTH)
+
+
+def child_path(parent: Post) -> str:
+    """The `path` of a comment on `parent`."""
+    return parent.path + path_segment(parent.id)
+
+
+def thread_key(post_ids) -> str:
+    """Depth-first sort key of the post reached through `post_ids` (ancestors first)."""
+    return ''.join(path_segment(post_id) for post_id in post_ids)
+
+
+def key_ids(post: Post) -> list[int]:
+    """The ancestor ids of `post` followed by its own, inverse of `thread_key()`."""
+    ids = [int(post.path[i:i + PATH_WIDTH]) for i in range(0, len(post.path), PATH_WIDTH)]
+    return ids + [post.id]
+
+
+def subtree(post: Post, after: str = ''):
+    """
+    Every comment below `post` in depth-first order, siblings oldest first.
+
+    :param after: Only comments that sort after this `thread_key()`
+    """
+    key = Concat(
+        'path',
+        LPad(Cast('id', output_field=CharField()), PATH_WIDTH, Value('0')),
+        output_field=CharField(),
+    )
+    qs = Post.objects.filter(path__startswith=child_path(post)).annotate(thread_key=key)
+    if after:
+        qs = qs.filter(thread_key__gt=after)
+    return qs.select_related('author').order_by('thread_key')
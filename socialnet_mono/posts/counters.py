@@ -0,0 +1,18 @@
+"""
+Buffered engagement counters of posts (see socialnet_mono/counters.py).
+
+Likes, comments, reposts and shares are counted in Redis and flushed to
+`Post` by the `posts.tasks.flush_post_counters` periodic task. The rank score
+moves with the counters in the same UPDATE.
+"""
+from posts import ranking
+from posts.models import Post
+from socialnet_mono.counters import BufferedCounters
+
+
+class PostCounters(BufferedCounters):
+    def extra_assignments(self, table: str, values: str) -> list[str]:
+        return [f"rank_score = {ranking.score_update_sql(table, values)}"]
+
+
+post_counters = PostCounters(Post, ranking.COUNTER_FIELDS, name="post")
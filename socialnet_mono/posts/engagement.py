@@ -0,0 +1,127 @@
+"""
+Apply many engagement actions (likes, bookmarks, reposts) of one user at once.
+
+Clients replaying actions made offline send them as one batch. Post ids are
+checked in one query. For each post, the last like/unlike and the last
+bookmark/unbookmark win. The resulting rows are inserted with one
+`INSERT ... ON CONFLICT DO NOTHING` and removed with one DELETE per table,
+both `RETURNING` the posts they actually changed. Only those count: a row
+another request inserted or deleted first isn't counted twice. The net
+counter deltas go to the buffered counters in a single call, and the user's
+cached engagement sets are updated once the batch commits.
+"""
+from collections import defaultdict
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from posts import memberships, timeline
+from posts.counters import post_counters
+from posts.models import Bookmark, Like, Post, Repost
+
+LIKE, UNLIKE, BOOKMARK, UNBOOKMARK, REPOST = 'like', 'unlike', 'bookmark', 'unbookmark', 'repost'
+ACTIONS = (LIKE, UNLIKE, BOOKMARK, UNBOOKMARK, REPOST)
+BULK_ENGAGEMENT_MAX_ACTIONS = 200
+
+# model, action adding a row, action removing it, counter field, result keys for added and removed rows
+# (the added key is also the kind of the engagement set)
+_RELATIONS = (
+    (Like, LIKE, UNLIKE, 'likes_count', memberships.LIKED, 'unliked'),
+    (Bookmark, BOOKMARK, UNBOOKMARK, None, memberships.BOOKMARKED, 'unbookmarked'),
+    (Repost, REPOST, None, 'reposts_count', memberships.REPOSTED, None),
+)
+
+
+def _insert(model, user_id: int, post_ids: list[int]) -> list[int]:
+    """Insert the user's rows for `post_ids`, skipping existing ones. The post ids actually inserted."""
+    opts = model._meta
+    qn = connection.ops.quote_name
+    user_column, post_column, created_column = (
+        qn(opts.get_field(name).column) for name in ('user', 'post', 'created_at')
+    )
+    created_at = opts.get_field('created_at').get_db_prep_value(timezone.now(), connection)
+    params = []
+    for post_id in post_ids:
+        params += [user_id, post_id, created_at]
+    sql = (
+        f"INSERT INTO {qn(opts.db_table)} ({user_column}, {post_column}, {created_column}) "
+        f"VALUES {', '.join(['(%s, %s, %s)'] * len(post_ids))} "
+        f"ON CONFLICT DO NOTHING RETURNING {post_column}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return sorted(post_id for post_id, in cursor.fetchall())
+
+
+def _delete(model, user_id: int, post_ids: list[int]) -> list[int]:
+    """Delete the user's rows for `post_ids`. The post ids actually deleted."""
+    opts = model._meta
+    qn = connection.ops.quote_name
+    user_column, post_column = (qn(opts.get_field(name).column) for name in ('user', 'post'))
+    sql = (
+        f"DELETE FROM {qn(opts.db_table)} "
+        f"WHERE {user_column} = %s AND {post_column} IN ({', '.join(['%s'] * len(post_ids))}) "
+        f"RETURNING {post_column}"
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, *post_ids])
+        return sorted(post_id for post_id, in cursor.fetchall())
+
+
+def apply_actions(user, actions: list[dict]) -> dict:
+    """
+    Apply `{'action': ..., 'post_id': ...}` items in order.
+
+    :return: The post ids each action changed (e.g. `liked`), plus the ids of
+        posts that don't exist as `missing`
+    """
+    post_ids = {item['post_id'] for item in actions}
+    existing = set(Post.objects.filter(id__in=post_ids).values_list('id', flat=True))
+
+    wanted = {}  # (action that adds a row, post id) -> whether the row should exist
+    for item in actions:
+        if item['post_id'] not in existing:
+            continue
+        for _, add, remove, *_ in _RELATIONS:
+            if item['action'] in (add, remove):
+                wanted[add, item['post_id']] = item['action'] == add
+
+    result = {'liked': [], 'unliked': [], 'bookmarked': [], 'unbookmarked': [], 'reposted': []}
+    deltas = defaultdict(dict)
+    created_reposts = []
+    with transaction.atomic():
+        for model, add, _, counter, added_key, removed_key in _RELATIONS:
+            targets = {post_id: keep for (action, post_id), keep in wanted.items() if action == add}
+            if not targets:
+                continue
+            add_ids = sorted(post_id for post_id, keep in targets.items() if keep)
+            remove_ids = sorted(post_id for post_id, keep in targets.items() if not keep)
+            to_add = _insert(model, user.id, add_ids) if add_ids else []
+            to_remove = _delete(model, user.id, remove_ids) if remove_ids else []
+
+            result[added_key] = to_add
+            if removed_key:
+                result[removed_key] = to_remove
+            if counter:
+                for post_id in to_add:
+                    deltas[post_id][counter] = 1
+                for post_id in to_remove:
+                    deltas[post_id][counter] = -1
+            if model is Repost:
+                created_reposts = to_add
+            transaction.on_commit(
+                lambda kind=added_key, to_add=to_add, to_remove=to_remove: (
+                    memberships.add(user.id, kind, to_add),
+                    memberships.remove(user.id, kind, to_remove),
+                ),
+                robust=True,
+            )
+
+        # The raw INSERT sends no post_save, so fan the new reposts out here.
+        if created_reposts:
+            reposts = list(Repost.objects.filter(user=user, post_id__in=created_reposts))
+            transaction.on_commit(lambda: [timeline.fan_out_repost(repost) for repost in reposts], robust=True)
+        transaction.on_commit(lambda: post_counters.incr_many(deltas))
+
+    result['missing'] = sorted(post_ids - existing)
+    return result
@@ -0,0 +1,126 @@
+"""
+Post enrichment: the FaaS functions run on every new post (topic, keywords,
+sentiment, offensive words, thumbnails).
+
+With POST_ENRICHMENT_COMPOSITE the four text functions are one call to the
+composite enrich-post function, whose merged result updates all of them at
+once.
+
+`post_save` queues one `posts.tasks.enrich_post` task per FaaS queue (see
+faas/tasks.py), each naming the functions that belong on it. The task makes
+all of its calls concurrently on the process's shared async client and
+waits at most POST_ENRICHMENT_DEADLINE seconds for them, so a post costs a
+worker the time of its slowest call rather than the sum of all of them.
+Whatever finished in time is applied to the post the same way an async
+callback would be; failed and timed-out calls, and results that can't be
+applied, are logged and skipped.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+
+from django.conf import settings
+
+from faas import transport
+from faas.interface import FaasService
+from faas.tasks import queue_for
+from posts.models import Post
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SIZE = [150, 150]
+
+
+@dataclass(frozen=True)
+class Call:
+    function_name: str
+    payload: dict | str
+    metadata: dict | None = None
+
+
+def calls_for(post: Post) -> list[Call]:
+    """The enrichment calls that apply to a post."""
+    if settings.POST_ENRICHMENT_COMPOSITE:
+        calls = [Call(FaasService.function_enrich_post, {"text": post.content, "unique_id": post.id})]
+    else:
+        calls = [
+            Call(FaasService.function_categorize_post_text, {"text": post.content, "unique_id": post.id}),
+            Call(FaasService.function_extract_keywords, {"text": post.content, "unique_id": post.id}),
+            Call(FaasService.function_sentiment_analysis, post.content or "", {"unique_id": post.id}),
+            # TODO: MAKE SYNC TO STOP BAD POST FROM BEING SAVED
+            Call(FaasService.function_offensive_word_detection, {"text": post.content, "unique_id": post.id}),
+        ]
+    if post.image:
+        key = post.image.name
+        calls.append(Call(FaasService.function_image_thumbnail, {
+            "bucket": post.image.storage.bucket_name,
+            "key": key,
+            "output_key": f"thumbnails/{key}",
+            "size": THUMBNAIL_SIZE,
+            "unique_id": post.id,
+        }))
+    if post.video:
+        key = post.video.name
+        calls.append(Call(FaasService.function_video_thumbnail, {
+            "bucket": post.video.storage.bucket_name,
+            "key": key,
+            # output_key name is the same as video name, but with .jpeg
+            "output_key": f"thumbnails/{'.'.join(key.split('.')[:-1])}.jpeg",
+            "size": THUMBNAIL_SIZE,
+            "unique_id": post.id,
+        }))
+    return calls
+
+
+def by_queue(post: Post) -> dict[str, list[str]]:
+    """The post's enrichment function names, grouped by the queue they run on."""
+    queues = {}
+    for call in calls_for(post):
+        queues.setdefault(queue_for(call.function_name), []).append(call.function_name)
+    return queues
+
+
+async def dispatch(calls: list[Call], deadline: float) -> list:
+    """
+    Make all calls concurrently.
+
+    :return: The response of each call, or the exception it failed with
+        (`TimeoutError` for calls still running at the deadline)
+    """
+    faas = FaasService()
+    return await asyncio.gather(
+        *(asyncio.wait_for(faas.acall_function(call.function_name, call.payload), deadline) for call in calls),
+        return_exceptions=True,
+    )
+
+
+def enrich(post_id: int, function_names: list[str] | None = None) -> dict:
+    """
+    Run a post's enrichment calls (or those of them in `function_names`) and
+    apply what finished before the deadline.
+
+    :return: {"applied": [function names], "failed": [function names]}
+    """
+    post = Post.objects.filter(id=post_id).first()
+    if post is None:
+        return {"applied": [], "failed": []}
+    calls = [call for call in calls_for(post) if function_names is None or call.function_name in function_names]
+    deadline = settings.POST_ENRICHMENT_DEADLINE
+    results = transport.run(dispatch(calls, deadline), timeout=deadline + 5)
+
+    faas = FaasService()
+    applied, failed = [], []
+    for call, result in zip(calls, results):
+        if isinstance(result, BaseException):
+            logger.warning("Enrichment %s of post %s failed: %r", call.function_name, post_id, result)
+            failed.append(call.function_name)
+            continue
+        try:
+            faas.handle_response(call.function_name, result, call.metadata)
+        except Exception:
+            # One result that can't be applied must not cost the post the others.
+            logger.exception("Could not apply enrichment %s of post %s", call.function_name, post_id)
+            failed.append(call.function_name)
+            continue
+        applied.append(call.function_name)
+    return {"applied": applied, "failed": failed}
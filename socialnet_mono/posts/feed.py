@@ -0,0 +1,163 @@
+"""
+The home feed as one stream of events.
+
+A feed event is a `(timestamp, kind, id)` triple: a top-level post written by
+the viewer or someone they follow, or a repost made by one of them. Events are
+ordered newest first on the whole triple, which is also the feed's cursor.
+
+Pages are read from the materialized timeline (see posts/timeline.py) when it
+is warm. Otherwise a single UNION ALL query merges the two index-backed event
+sources, each seeking to the cursor and limited to one page on its own.
+Hydration loads every repost and post of a page in two queries.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection
+from django.db.models import IntegerField, Value
+from redis.exceptions import RedisError
+
+from follows import cache as follow_cache
+from posts.models import Post, Repost
+from posts import timeline
+from posts.timeline import POST, REPOST
+from socialnet_mono.pagination import keyset_filter
+
+logger = logging.getLogger(__name__)
+
+CURSOR_FIELDS = ('created_at', 'kind', 'id')
+ORDERING = [f'-{field}' for field in CURSOR_FIELDS]
+MAX_READS_PER_PAGE = 3
+
+
+@dataclass(frozen=True)
+class FeedItem:
+    post: Post | dict
+    repost: Repost | None = None
+
+
+def followed_author_ids(user_id: int) -> list[int]:
+    """Ids of the users whose activity shows up in `user_id`'s feed."""
+    author_ids = follow_cache.get_following_ids(user_id)
+    author_ids.append(user_id)
+    return author_ids
+
+
+def events_queryset(author_ids: list[int], before: tuple | None = None, limit: int | None = None):
+    """
+    `(created_at, kind, id)` rows for the posts and reposts of `author_ids`.
+
+    Reposts of posts written by `author_ids` are left out, the original is
+    already in the stream.
+    """
+    posts = Post.objects.filter(
+        author_id__in=author_ids,
+        parent=None,
+    ).annotate(kind=Value(POST, output_field=IntegerField()))
+    reposts = Repost.objects.filter(
+        user_id__in=author_ids,
+    ).exclude(
+        post__author_id__in=author_ids,
+    ).annotate(kind=Value(REPOST, output_field=IntegerField()))
+
+    if before is not None:
+        condition = keyset_filter(CURSOR_FIELDS, before)
+        posts, reposts = posts.filter(condition), reposts.filter(condition)
+
+    posts = posts.values_list(*CURSOR_FIELDS)
+    reposts = reposts.values_list(*CURSOR_FIELDS)
+    if limit is not None and connection.features.supports_slicing_ordering_in_compound:
+        posts = posts.order_by(*ORDERING)[:limit]
+        reposts = reposts.order_by(*ORDERING)[:limit]
+    return posts.union(reposts, all=True)
+
+
+def _read_events(user_id: int, author_ids: list[int], limit: int, before: tuple | None):
+    page = timeline.read(user_id, limit, before=before)
+    if page is not None:
+        entries, has_more = page
+        events = [
+            (datetime.fromtimestamp(score, tz=dt_timezone.utc), kind, event_id)
+            for score, kind, event_id in entries
+        ]
+        return events, has_more
+
+    rows = list(events_queryset(author_ids, before, limit + 1).order_by(*ORDERING)[:limit + 1])
+    if before is None:
+        _warm_timeline(user_id)
+    return rows[:limit], len(rows) > limit
+
+
+def read_page(user_id: int, author_ids: list[int], limit: int, before: tuple | None = None, fields=None):
+    """
+    Read one page of feed items. Events dropped while hydrating (duplicates,
+    deleted posts) are made up for by reading further, a few times at most.
+
+    :return: (items, cursor position of the next page or None)
+    """
+    items, seen = [], set()
+    for _ in range(MAX_READS_PER_PAGE):
+        events, has_more = _read_events(user_id, author_ids, limit - len(items), before)
+        items += hydrate(user_id, events, author_ids, seen, fields)
+        if events:
+            before = tuple(events[-1])
+        if not has_more:
+            return items, None
+        if len(items) >= limit:
+            break
+    return items, before
+
+
+def _warm_timeline(user_id: int):
+    try:
+        timeline.rebuild(user_id)
+    except RedisError as e:
+        logger.warning("Could not warm timeline for user %s: %s", user_id, e)
+
+
+def load_posts(post_ids, fields=None) -> dict:
+    """Posts by id, as `.values()` rows of `fields` when given."""
+    if fields is None:
+        return Post.objects.select_related('author').in_bulk(post_ids)
+    return {row['id']: row for row in Post.objects.filter(id__in=post_ids).values(*fields)}
+
+
+def hydrate(user_id: int, events, author_ids: list[int], seen: set | None = None, fields=None) -> list[FeedItem]:
+    """
+    Turn a page of events into feed items with two queries.
+
+    A post shows up once per page (`seen` holds the post ids already on it),
+    and reposts of posts by followed authors are dropped since the original
+    is in the feed already. Events whose post or repost is gone are dropped
+    from the timeline too. With `fields` the items hold `.values()` rows
+    instead of posts.
+    """
+    repost_ids = [event_id for _, kind, event_id in events if kind == REPOST]
+    reposts = Repost.objects.select_related('user').in_bulk(repost_ids) if repost_ids else {}
+    post_ids = [event_id for _, kind, event_id in events if kind == POST]
+    post_ids += [repost.post_id for repost in reposts.values()]
+    posts = load_posts(post_ids, fields)
+    get = getattr if fields is None else dict.__getitem__
+
+    authors = set(author_ids)
+    seen = set() if seen is None else seen
+    items, missing = [], []
+    for created_at, kind, event_id in events:
+        repost = None
+        if kind == REPOST:
+            repost = reposts.get(event_id)
+            post = posts.get(repost.post_id) if repost else None
+            if post is not None and get(post, 'author_id') in authors:
+                continue
+        else:
+            post = posts.get(event_id)
+
+        if post is None:
+            missing.append((created_at.timestamp(), kind, event_id))
+        elif get(post, 'id') not in seen:
+            seen.add(get(post, 'id'))
+            items.append(FeedItem(post, repost))
+
+    timeline.forget(user_id, missing)
+    return items
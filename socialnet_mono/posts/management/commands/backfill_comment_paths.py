@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from posts import comments
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = "Fill in the materialized path and depth of existing comments, one thread level at a time."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        depth, total = 1, 0
+        while True:
+            # The parents of this level were filled in by the previous pass.
+            if depth == 1:
+                level = Post.objects.filter(parent__isnull=False, parent__parent=None)
+            else:
+                level = Post.objects.filter(parent__isnull=False, parent__depth=depth - 1, parent__parent__isnull=False)
+            updated = self.fill_level(level, depth, batch_size)
+            if not updated:
+                break
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Depth {depth}: {updated} comments")
+            total += updated
+            depth += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled {total} comment paths."))
+
+    @staticmethod
+    def fill_level(level, depth, batch_size):
+        last_id, updated = 0, 0
+        while True:
+            rows = list(
+                level.filter(id__gt=last_id).order_by("id").values_list("id", "parent_id", "parent__path")[:batch_size]
+            )
+            if not rows:
+                return updated
+            posts = [
+                Post(id=post_id, path=parent_path + comments.path_segment(parent_id), depth=depth)
+                for post_id, parent_id, parent_path in rows
+            ]
+            Post.objects.bulk_update(posts, ["path", "depth"])
+            updated += len(posts)
+            last_id = rows[-1][0]
@@ -0,0 +1,58 @@
+import json
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.test import APIRequestFactory
+
+from posts import comments
+from posts.counters import post_counters
+from posts.models import Post
+from posts.row_serializers import PostRowSerializer
+from posts.serializers import PostSerializer
+from posts.viewer_state import ViewerState
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Compare PostSerializer with the PostRowSerializer fast path on a page of the newest posts."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=100, help="Posts per page.")
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--user", type=int, default=None, help="Serialize as this user id.")
+
+    def handle(self, *args, **options):
+        request = APIRequestFactory().get("/api/posts/feed/")
+        request.user = User.objects.get(pk=options["user"]) if options["user"] else AnonymousUser()
+        queryset = Post.objects.filter(parent=None).order_by("-created_at", "-id")[:options["items"]]
+
+        def model_page():
+            posts = list(queryset.select_related("author"))
+            previewed = comments.load_previews(posts)
+            post_counters.merge(posts + previewed)
+            context = {"request": request, "viewer_state": ViewerState.for_posts(request.user, posts + previewed)}
+            return PostSerializer(posts, many=True, context=context).data
+
+        def row_page():
+            serializer = PostRowSerializer({"request": request})
+            return serializer.serialize(queryset.values(*serializer.value_fields()))
+
+        expected, actual = model_page(), row_page()
+        if not expected:
+            raise CommandError("There are no posts to serialize.")
+        if json.dumps(expected) != json.dumps(actual):
+            raise CommandError("PostRowSerializer output differs from PostSerializer.")
+
+        timings = {}
+        for name, page in (("PostSerializer", model_page), ("PostRowSerializer", row_page)):
+            start = time.perf_counter()
+            for _ in range(options["repeat"]):
+                page()
+            timings[name] = (time.perf_counter() - start) / options["repeat"]
+            self.stdout.write(f"{name}: {timings[name] * 1000:.2f} ms per {len(expected)}-item page")
+
+        speedup = timings["PostSerializer"] / timings["PostRowSerializer"]
+        self.stdout.write(self.style.SUCCESS(f"Speedup: {speedup:.1f}x"))
@@ -0,0 +1,45 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from posts import timeline
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Rebuild materialized home timelines in Redis from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument("user_ids", nargs="*", type=int, help="Rebuild only these users.")
+        parser.add_argument("--all", action="store_true", help="Rebuild every active user.")
+        parser.add_argument(
+            "--active-days", type=int, default=None,
+            help="Only rebuild users who logged in within the last N days.",
+        )
+        parser.add_argument("--only-cold", action="store_true", help="Skip users whose timeline is already warm.")
+
+    def handle(self, *args, **options):
+        if options["user_ids"]:
+            user_ids = options["user_ids"]
+        elif options["all"] or options["active_days"] is not None:
+            users = User.objects.filter(is_active=True)
+            if options["active_days"] is not None:
+                users = users.filter(last_login__gte=timezone.now() - timedelta(days=options["active_days"]))
+            user_ids = users.order_by("id").values_list("id", flat=True).iterator(chunk_size=1000)
+        else:
+            raise CommandError("Pass user ids, --all or --active-days.")
+
+        rebuilt = skipped = 0
+        for user_id in user_ids:
+            if options["only_cold"] and timeline.is_warm(user_id):
+                skipped += 1
+                continue
+            count = timeline.rebuild(user_id)
+            rebuilt += 1
+            if options["verbosity"] > 1:
+                self.stdout.write(f"User {user_id}: {count} posts")
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} timelines, skipped {skipped} warm ones."))
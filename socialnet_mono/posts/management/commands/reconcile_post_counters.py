@@ -0,0 +1,8 @@
+from posts import reconciliation
+from socialnet_mono.counters import ReconcileCommand
+
+
+class Command(ReconcileCommand):
+    help = "Recount likes, reposts and comments of posts and fix the stored counters, in id ranges."
+    noun = "posts"
+    reconcile = staticmethod(reconciliation.reconcile)
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from posts import ranking
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = "Recompute the feed rank score of every post from its counters (e.g. after changing FEED_RANK_* settings)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        fields = ["id", "created_at", "rank_score", *ranking.COUNTER_FIELDS]
+        last_id, updated = 0, 0
+        while True:
+            posts = list(Post.objects.filter(id__gt=last_id).order_by("id").only(*fields)[:batch_size])
+            if not posts:
+                break
+            Post.objects.bulk_update(ranking.refresh_scores(posts), ["rank_score"])
+            updated += len(posts)
+            last_id = posts[-1].id
+            if options["verbosity"] > 1:
+                self.stdout.write(f"Up to post {last_id}")
+
+        self.stdout.write(self.style.SUCCESS(f"Refreshed {updated} rank scores."))
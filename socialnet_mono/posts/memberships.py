@@ -0,0 +1,135 @@
+"""
+Per-user sets of the post ids a user has liked, bookmarked and reposted.
+
+Each set lives in Redis under `engagement:<kind>:<user id>`, so checking a
+whole page of posts for all three kinds is one pipelined round trip of
+SMISMEMBER calls instead of a query per relation.
+
+Like timelines, the sets are a cache. A missing key means cold: the caller
+reads the database and calls `warm()`, which loads the user's full set.
+Warm sets always hold the `_WARM` member so an empty set isn't mistaken for
+a cold one. Users with more than ENGAGEMENT_SET_MAX_SIZE rows of a kind are
+not cached; their set only holds `_HEAVY` and they are always read from the
+database. Writes (the like, bookmark and repost views and bulk engagement)
+only touch sets that are already warm. Rows changed any other way (admin,
+cascades) are picked up when the set expires, ENGAGEMENT_SET_TTL seconds
+after it was warmed.
+"""
+import logging
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from posts.models import Bookmark, Like, Repost
+
+logger = logging.getLogger(__name__)
+
+LIKED, BOOKMARKED, REPOSTED = 'liked', 'bookmarked', 'reposted'
+MODELS = {LIKED: Like, BOOKMARKED: Bookmark, REPOSTED: Repost}
+
+_WARM = "w"
+_HEAVY = "h"
+
+# KEYS: set key, ARGV: post ids. Adds to warm sets of normal users only.
+_ADD_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 and redis.call('SISMEMBER', KEYS[1], 'h') == 0 then
+    redis.call('SADD', KEYS[1], unpack(ARGV))
+end
+return 1
+"""
+
+
+def set_key(kind: str, user_id: int) -> str:
+    return f"engagement:{kind}:{user_id}"
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def lookup(user_id: int, post_ids, kinds=tuple(MODELS)) -> tuple[dict[str, set[int]], list[str]]:
+    """
+    Which of `post_ids` are in each of the user's sets, in one round trip.
+
+    :return: ({kind: post ids in the set} for the cached kinds, the kinds
+        whose set is cold). Kinds in neither aren't cached (heavy users, or
+        Redis is unavailable) and must be read from the database.
+    """
+    post_ids = list(post_ids)
+    try:
+        pipe = _redis().pipeline(transaction=False)
+        for kind in kinds:
+            pipe.smismember(set_key(kind, user_id), [_WARM, _HEAVY, *post_ids])
+        results = pipe.execute()
+    except RedisError as e:
+        logger.warning("Engagement set lookup failed for user %s: %s", user_id, e)
+        return {}, []
+
+    found, cold = {}, []
+    for kind, (warm, heavy, *flags) in zip(kinds, results):
+        if warm:
+            found[kind] = {post_id for post_id, flag in zip(post_ids, flags) if flag}
+        elif not heavy:
+            cold.append(kind)
+    return found, cold
+
+
+def contains(user_id: int, kind: str, post_id: int) -> bool | None:
+    """Whether the post is in the user's set, or None when that isn't known."""
+    found, _ = lookup(user_id, [post_id], kinds=(kind,))
+    return post_id in found[kind] if kind in found else None
+
+
+def warm(user_id: int, kind: str) -> set[int] | None:
+    """
+    Load a user's set from the database.
+
+    :return: The post ids, or None when the user has too many to cache
+    """
+    limit = settings.ENGAGEMENT_SET_MAX_SIZE
+    post_ids = list(MODELS[kind].objects.filter(user_id=user_id).values_list('post_id', flat=True)[:limit + 1])
+    heavy = len(post_ids) > limit
+    key = set_key(kind, user_id)
+    try:
+        pipe = _redis().pipeline(transaction=True)
+        pipe.delete(key)
+        if heavy:
+            pipe.sadd(key, _HEAVY)
+        else:
+            pipe.sadd(key, _WARM, *post_ids)
+        pipe.expire(key, settings.ENGAGEMENT_SET_TTL)
+        pipe.execute()
+    except RedisError as e:
+        logger.warning("Could not warm %s set of user %s: %s", kind, user_id, e)
+    return None if heavy else set(post_ids)
+
+
+def add(user_id: int, kind: str, post_ids):
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    try:
+        _redis().register_script(_ADD_SCRIPT)(keys=[set_key(kind, user_id)], args=post_ids)
+    except RedisError as e:
+        logger.warning("Could not add to %s set of user %s: %s", kind, user_id, e)
+        forget(user_id, kind)
+
+
+def remove(user_id: int, kind: str, post_ids):
+    post_ids = list(post_ids)
+    if not post_ids:
+        return
+    try:
+        _redis().srem(set_key(kind, user_id), *post_ids)
+    except RedisError as e:
+        logger.warning("Could not remove from %s set of user %s: %s", kind, user_id, e)
+        forget(user_id, kind)
+
+
+def forget(user_id: int, kind: str):
+    """Drop a set that may have missed a write, it is rebuilt on the next read."""
+    try:
+        _redis().delete(set_key(kind, user_id))
+    except RedisError:
+        pass
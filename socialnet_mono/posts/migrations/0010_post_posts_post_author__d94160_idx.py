@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0009_post_text_to_speech_file'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'created_at'], name='posts_post_author__d94160_idx'),
+        ),
+    ]
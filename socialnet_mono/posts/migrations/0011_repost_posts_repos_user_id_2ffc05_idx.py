@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_post_posts_post_author__d94160_idx'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='repost',
+            index=models.Index(fields=['user', 'created_at'], name='posts_repos_user_id_2ffc05_idx'),
+        ),
+    ]
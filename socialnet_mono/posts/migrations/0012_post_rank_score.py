@@ -0,0 +1,18 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_repost_posts_repos_user_id_2ffc05_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='rank_score',
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0012_post_rank_score'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['parent', 'created_at'], name='posts_post_parent__4ba2ad_idx'),
+        ),
+    ]
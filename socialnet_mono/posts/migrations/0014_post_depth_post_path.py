@@ -0,0 +1,23 @@
+# Generated by Django 5.2.3 on 2026-10-18 11:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_posts_post_parent__4ba2ad_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='path',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=500),
+        ),
+    ]
@@ -22,11 +22,16 @@ class Post(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
 
     parent = models.ForeignKey('self', null=True, blank=True, related_name='comments', on_delete=models.CASCADE)
+    # Ids of the comment's ancestors from the top-level post down, zero-padded
+    # and concatenated (see posts/comments.py). Empty for top-level posts.
+    path = models.CharField(max_length=500, blank=True, default='', db_index=True)
+    depth = models.PositiveSmallIntegerField(default=0)
 
     likes_count = models.PositiveIntegerField(default=0)
     comments_count = models.PositiveIntegerField(default=0)
     reposts_count = models.PositiveIntegerField(default=0)
     shares_count = models.PositiveIntegerField(default=0)
+    rank_score = models.FloatField(default=0)  # see posts/ranking.py
 
     keywords = models.JSONField(default=list, blank=True)
     tags = models.JSONField(default=list, blank=True)
@@ -44,6 +49,10 @@ class Post(models.Model):
         return reverse("post_detail", kwargs={"pk": self.pk})
 
     class Meta:
+        indexes = [
+            models.Index(fields=['author', 'created_at']),
+            models.Index(fields=['parent', 'created_at']),
+        ]
         constraints = [
             models.CheckConstraint(
                 check=~(
@@ -71,6 +80,9 @@ class Repost(models.Model):
 
     class Meta:
         unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', 'created_at']),
+        ]
 
 
 class Bookmark(models.Model):
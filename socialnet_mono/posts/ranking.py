@@ -0,0 +1,138 @@
+"""
+Engagement ranking for the home feed (`?rank=score`).
+
+Every post carries a precomputed `rank_score`:
+
+    log(1 + weighted engagement) + created_at / FEED_RANK_DECAY_SECONDS
+
+The time term is fixed at creation, so a score only moves when one of the
+post's counters does, and it is moved in the same UPDATE that changes the
+counter (`score_update()`, or `score_update_sql()` when buffered counters are
+flushed). Comparing two posts at any moment is then the same as
+comparing their engagement decayed by age, without recomputing anything per
+request.
+
+Ranked reads take a bounded window of the newest candidate posts, add the
+viewer's affinity for each author, and sort the window in memory.
+"""
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Value
+from django.db.models.functions import Ln
+from django.utils import timezone
+
+from posts.models import Post, Like
+
+COUNTER_FIELDS = ('likes_count', 'comments_count', 'reposts_count', 'shares_count')
+
+
+def _weighted(counters: dict):
+    weights = settings.FEED_RANK_WEIGHTS
+    return sum(counters[field] * weights[field] for field in COUNTER_FIELDS)
+
+
+def engagement_score(post: Post) -> float:
+    """The full rank score of a post, from its counters and creation time."""
+    created_at = post.created_at or timezone.now()
+    engagement = _weighted({field: getattr(post, field) for field in COUNTER_FIELDS})
+    return math.log1p(max(engagement, 0)) + created_at.timestamp() / settings.FEED_RANK_DECAY_SECONDS
+
+
+def score_update(**deltas):
+    """
+    Expression for `rank_score` that follows counter deltas applied in the
+    same UPDATE, e.g.
+
+        Post.objects.filter(id=post_id).update(
+            likes_count=F('likes_count') + 1,
+            rank_score=ranking.score_update(likes_count=1),
+        )
+    """
+    old = _weighted({field: F(field) for field in COUNTER_FIELDS})
+    change = sum(delta * settings.FEED_RANK_WEIGHTS[field] for field, delta in deltas.items())
+    return F('rank_score') + Ln(Value(1) + old + Value(change)) - Ln(Value(1) + old)
+
+
+def score_update_sql(table: str, deltas: str) -> str:
+    """
+    SQL for the new `rank_score` of rows in `table` getting the counter
+    deltas in the columns of `deltas`, the raw SQL twin of `score_update()`.
+    """
+    weights = settings.FEED_RANK_WEIGHTS
+
+    def weighted(column):
+        return ' + '.join(f"{int(weights[field])} * {column(field)}" for field in COUNTER_FIELDS)
+
+    old = weighted(lambda field: f"{table}.{field}")
+    new = weighted(lambda field: f"({table}.{field} + {deltas}.{field})")
+    return (
+        f"{table}.rank_score"
+        f" + LN(1 + CASE WHEN {new} < 0 THEN 0 ELSE {new} END)"
+        f" - LN(1 + CASE WHEN {old} < 0 THEN 0 ELSE {old} END)"
+    )
+
+
+def refresh_scores(posts) -> list[Post]:
+    """Recompute `rank_score` for the given posts (not saved)."""
+    for post in posts:
+        post.rank_score = engagement_score(post)
+    return posts
+
+
+def ranked_cache_key(user_id: int) -> str:
+    return f"feed:ranked:{user_id}"
+
+
+def _author_affinity(user_id: int, author_ids: set[int]) -> dict[int, int]:
+    """How often the viewer recently liked or commented on each author's posts."""
+    if not author_ids:
+        return {}
+    since = timezone.now() - timedelta(days=settings.FEED_RANK_AFFINITY_DAYS)
+    affinity = {}
+    likes = Like.objects.filter(
+        user_id=user_id,
+        post__author_id__in=author_ids,
+        created_at__gte=since,
+    ).values_list('post__author_id').annotate(n=Count('id'))
+    comments = Post.objects.filter(
+        author_id=user_id,
+        parent__author_id__in=author_ids,
+        created_at__gte=since,
+    ).values_list('parent__author_id').annotate(n=Count('id'))
+    for author_id, n in [*likes, *comments]:
+        affinity[author_id] = affinity.get(author_id, 0) + n
+    return affinity
+
+
+def ranked_post_ids(user_id: int, author_ids: list[int]) -> list[int]:
+    """
+    Ids of the viewer's ranked feed, best first.
+
+    Only the newest FEED_RANK_WINDOW top-level posts are candidates, so a read
+    costs O(window) no matter how much the viewer follows. The result is
+    cached for a short while so paging through it stays stable.
+    """
+    key = ranked_cache_key(user_id)
+    post_ids = cache.get(key)
+    if post_ids is not None:
+        return post_ids
+
+    candidates = list(
+        Post.objects.filter(
+            author_id__in=author_ids,
+            parent=None,
+        ).order_by('-created_at').values_list('id', 'author_id', 'rank_score')[:settings.FEED_RANK_WINDOW]
+    )
+    affinity = _author_affinity(user_id, {author_id for _, author_id, _ in candidates} - {user_id})
+    weight = settings.FEED_RANK_AFFINITY_WEIGHT
+
+    def score(candidate):
+        _, author_id, rank_score = candidate
+        return rank_score + weight * math.log1p(affinity.get(author_id, 0))
+
+    post_ids = [post_id for post_id, _, _ in sorted(candidates, key=score, reverse=True)]
+    cache.set(key, post_ids, settings.FEED_RANK_CACHE_TTL)
+    return post_ids
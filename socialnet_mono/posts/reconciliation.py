@@ -0,0 +1,50 @@
+"""
+Recount the engagement counters of posts from the rows they count.
+
+Counters drift (a lost flush, deletes that never decremented, writes made
+outside the views), so this walks the posts table in primary key ranges and,
+for each range, counts likes, reposts and comments with one `GROUP BY` query
+per table. Rows whose stored counter (plus any delta still buffered in
+Redis) disagrees are corrected with `bulk_update`, and their rank score is
+recomputed. Only one range is held in memory at a time.
+
+The ranges are walked and checkpointed by
+`socialnet_mono.counters.reconcile_ranges()`.
+"""
+from posts import ranking
+from posts.counters import post_counters
+from posts.models import Like, Post, Repost
+from socialnet_mono.counters import correct, count_by, reconcile_ranges
+
+CHECKPOINT_KEY = "counters:post:reconcile-checkpoint"
+
+# counter field -> (rows counted, column pointing at the post)
+SOURCES = {
+    'likes_count': (Like.objects.all(), 'post_id'),
+    'reposts_count': (Repost.objects.all(), 'post_id'),
+    'comments_count': (Post.objects.all(), 'parent_id'),
+}
+
+
+def reconcile_range(start: int, end: int) -> int:
+    """
+    Correct the counters of posts with `start <= id < end`.
+
+    :return: Number of posts corrected
+    """
+    counts = {field: count_by(queryset, column, start, end) for field, (queryset, column) in SOURCES.items()}
+    posts = list(
+        Post.objects.filter(id__gte=start, id__lt=end)
+        .order_by('id')
+        .only('id', 'created_at', 'rank_score', *ranking.COUNTER_FIELDS)
+    )
+    corrected = correct(posts, counts, post_counters.pending(post.id for post in posts))
+    if corrected:
+        ranking.refresh_scores(corrected)
+        Post.objects.bulk_update(corrected, [*SOURCES, 'rank_score'], batch_size=500)
+    return len(corrected)
+
+
+def reconcile(**options) -> dict:
+    """Reconcile ranges of posts, see `reconcile_ranges()` for the options."""
+    return reconcile_ranges(Post, reconcile_range, CHECKPOINT_KEY, **options)
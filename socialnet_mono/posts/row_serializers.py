@@ -0,0 +1,146 @@
+"""
+Read-only fast path for serializing lists of posts.
+
+`PostRowSerializer` renders `.values()` rows (with `author__username` joined
+in) to exactly the same output as `PostSerializer`, without building model
+instances or walking serializer fields for every object. The mapping from
+columns to output keys is compiled once from `PostSerializer`'s fields, so
+fields added there show up here too, and unsupported ones fail loudly when
+the plan is compiled instead of drifting apart silently. Sparse fieldsets
+(`?fields=`/`?omit=`) narrow both the plan and the selected columns.
+
+List views opt in by setting `row_serializer_class` (see PostPageMixin).
+"""
+from rest_framework import serializers
+
+from socialnet_mono.fieldsets import is_selected, requested_fieldset
+
+from posts.comments import CURSOR_FIELDS as COMMENT_CURSOR_FIELDS, load_previews, thread_link
+from posts.counters import post_counters
+from posts.models import Post
+from posts.serializers import PostSerializer, PREVIEW_FIELDS, VIEWER_STATE_FIELDS
+from posts.viewer_state import ViewerState
+
+# Serializer fields whose to_representation() returns the column value as is.
+_PASSTHROUGH_FIELDS = (
+    serializers.IntegerField, serializers.BooleanField, serializers.CharField, serializers.ReadOnlyField,
+)
+
+
+class PostRowSerializer:
+    serializer_class = PostSerializer
+    # Always selected: what pagination, previews and feed hydration key on.
+    base_columns = ('id', 'author_id', 'parent_id', 'created_at')
+
+    _plan = None
+
+    def __init__(self, context: dict):
+        self.context = context
+        self.request = context.get('request')
+        if 'viewer_state' not in context:
+            context['viewer_state'] = ViewerState(self.request.user)
+        self.viewer_state = context['viewer_state']
+        fieldset = requested_fieldset(self.request)
+        self.plan = [entry for entry in self.compiled_plan() if is_selected(entry[0], fieldset)]
+        self.selected = {key for key, *_ in self.plan}
+
+    @classmethod
+    def _column(cls, name, field) -> tuple[str, object]:
+        """The `.values()` column behind a serializer field, and how to convert it."""
+        if isinstance(field, serializers.PrimaryKeyRelatedField):
+            return f'{field.source}_id', None
+        if '.' in field.source:
+            return field.source.replace('.', '__'), None
+        column = cls.serializer_class.property_columns.get(field.source, field.source)
+        model_field = Post._meta.get_field(column)
+        if isinstance(field, serializers.FileField):
+            return column, (cls._file_url, model_field.storage)
+        if isinstance(field, _PASSTHROUGH_FIELDS) or (isinstance(field, serializers.JSONField) and not field.binary):
+            return column, None
+        return column, field.to_representation
+
+    @classmethod
+    def compiled_plan(cls) -> list[tuple]:
+        """
+        One `(key, column, convert, method)` entry per output field, in the
+        serializer's order. Method fields are served by the `get_<name>`
+        method of this class.
+        """
+        if cls._plan is None:
+            plan = []
+            for name, field in cls.serializer_class().fields.items():
+                if isinstance(field, serializers.SerializerMethodField):
+                    plan.append((name, None, None, getattr(cls, field.method_name)))
+                else:
+                    plan.append((name, *cls._column(name, field), None))
+            cls._plan = plan
+        return cls._plan
+
+    def value_fields(self) -> list[str]:
+        """The columns to select with `.values()` for the requested fields."""
+        columns = list(self.base_columns)
+        for key, column, _, method in self.plan:
+            columns += [column] if method is None else self.serializer_class.method_field_columns.get(key, [])
+        return list(dict.fromkeys(columns))
+
+    def _file_url(self, name: str, storage):
+        # Same as FileField.to_representation() with UPLOADED_FILES_USE_URL.
+        if not name:
+            return None
+        url = storage.url(name)
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    def to_representation(self, row: dict) -> dict:
+        data = {}
+        for key, column, convert, method in self.plan:
+            if method is not None:
+                data[key] = method(self, row)
+                continue
+            value = row[column]
+            if value is None or convert is None:
+                data[key] = value
+            elif type(convert) is tuple:
+                data[key] = convert[0](self, value, *convert[1:])
+            else:
+                data[key] = convert(value)
+        return data
+
+    def serialize(self, rows) -> list[dict]:
+        """Serialize a page of rows, with their comment previews, pending counts and viewer state loaded in bulk."""
+        rows = list(rows)
+        previewed = []
+        if self.selected & PREVIEW_FIELDS:
+            previewed = load_previews(rows, fields=self.value_fields())
+        post_counters.merge(rows + previewed)
+        if self.selected & VIEWER_STATE_FIELDS:
+            self.viewer_state.load(row['id'] for row in rows + previewed)
+        return [self.to_representation(row) for row in rows]
+
+    def get_is_liked(self, row):
+        return self.viewer_state.is_liked(row['id'])
+
+    def get_is_bookmarked(self, row):
+        return self.viewer_state.is_bookmarked(row['id'])
+
+    def get_is_reposted(self, row):
+        return self.viewer_state.is_reposted(row['id'])
+
+    def get_comments(self, row):
+        preview = row['comment_preview']
+        if preview is None:
+            return []
+        return [self.to_representation(comment) for comment in preview.comments]
+
+    def get_comments_has_more(self, row):
+        preview = row['comment_preview']
+        return row['comments_count'] > 0 if preview is None else preview.has_more
+
+    def get_comments_next(self, row):
+        if not self.get_comments_has_more(row):
+            return None
+        preview = row['comment_preview']
+        last = preview.comments[-1] if preview and preview.comments else None
+        after = [last[name] for name in COMMENT_CURSOR_FIELDS] if last else None
+        return thread_link(self.request, row['id'], after)
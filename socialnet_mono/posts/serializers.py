@@ -1,13 +1,22 @@
 from rest_framework import serializers
+from socialnet_mono.fieldsets import SparseFieldsetMixin
 from .models import Post, Like, Repost, Bookmark
+from .viewer_state import ViewerState
+from .engagement import ACTIONS, BULK_ENGAGEMENT_MAX_ACTIONS
+from .comments import CommentPreview, load_previews, thread_link, CURSOR_FIELDS as COMMENT_CURSOR_FIELDS
 
+VIEWER_STATE_FIELDS = {'is_liked', 'is_bookmarked', 'is_reposted'}
+PREVIEW_FIELDS = {'comments', 'comments_has_more', 'comments_next'}
 
-class PostSerializer(serializers.ModelSerializer):
+
+class PostSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     author_username = serializers.ReadOnlyField(source='author.username')
     is_liked = serializers.SerializerMethodField()
     is_bookmarked = serializers.SerializerMethodField()
     is_reposted = serializers.SerializerMethodField()
     comments = serializers.SerializerMethodField()
+    comments_has_more = serializers.SerializerMethodField()
+    comments_next = serializers.SerializerMethodField()
 
     class Meta:
         model = Post
@@ -15,25 +24,70 @@ class PostSerializer(serializers.ModelSerializer):
             'id', 'author', 'author_username', 'content', 'parent',
             'created_at', 'updated_at', 'likes_count', 'comments_count', 'image', 'video', 'thumbnail',
             'reposts_count', 'shares_count', 'is_liked', 'is_bookmarked', 'is_reposted', 'comments',
+            'comments_has_more', 'comments_next',
             'keywords', 'tags', 'topic', 'sentiment', 'is_nsfw', 'text_to_speech_file',
             'is_toxic', 'is_offensive', 'is_blocked_by_system',
         ]
 
+    property_columns = {'is_toxic': 'is_toxit'}
+    method_field_columns = {
+        'comments': ['comments_count'],
+        'comments_has_more': ['comments_count'],
+        'comments_next': ['comments_count'],
+    }
+
+    def get_viewer_state(self) -> ViewerState:
+        # Views resolve their page up front (see PostPageMixin). Anything
+        # else gets a state that resolves posts as they are serialized.
+        if 'viewer_state' not in self.context:
+            self.context['viewer_state'] = ViewerState(self.context['request'].user)
+        return self.context['viewer_state']
+
     def get_is_liked(self, obj):
-        user = self.context.get('request').user
-        return user.is_authenticated and obj.likes.filter(user=user).exists()
+        return self.get_viewer_state().is_liked(obj.id)
 
     def get_is_bookmarked(self, obj):
-        user = self.context.get('request').user
-        return user.is_authenticated and obj.bookmarks.filter(user=user).exists()
+        return self.get_viewer_state().is_bookmarked(obj.id)
 
     def get_is_reposted(self, obj):
-        user = self.context.get('request').user
-        return user.is_authenticated and obj.reposts.filter(user=user).exists()
+        return self.get_viewer_state().is_reposted(obj.id)
+
+    def get_comment_preview(self, obj) -> CommentPreview | None:
+        # Views load previews for the whole page (see PostPageMixin), this
+        # only runs for posts serialized on their own.
+        if not hasattr(obj, 'comment_preview'):
+            load_previews([obj])
+        return obj.comment_preview
 
     def get_comments(self, obj):
-        qs = obj.comments.all().order_by('-created_at')
-        return PostSerializer(qs, many=True, context=self.context).data
+        preview = self.get_comment_preview(obj)
+        if preview is None:
+            return []
+        self.get_viewer_state().load(comment.id for comment in preview.comments)
+        return PostSerializer(preview.comments, many=True, context=self.context).data
+
+    def get_comments_has_more(self, obj):
+        preview = self.get_comment_preview(obj)
+        return obj.comments_count > 0 if preview is None else preview.has_more
+
+    def get_comments_next(self, obj):
+        """Link to the rest of the thread, starting after the previewed comments."""
+        if not self.get_comments_has_more(obj):
+            return None
+        preview = self.get_comment_preview(obj)
+        last = preview.comments[-1] if preview and preview.comments else None
+        after = [getattr(last, name) for name in COMMENT_CURSOR_FIELDS] if last else None
+        return thread_link(self.context.get('request'), obj.id, after)
+
+
+class ThreadCommentSerializer(PostSerializer):
+    """A comment in a flattened thread, its replies follow it in the list."""
+
+    class Meta(PostSerializer.Meta):
+        fields = [
+            field for field in PostSerializer.Meta.fields
+            if field not in PREVIEW_FIELDS
+        ] + ['depth']
 
 
 class PostCreateSerializer(serializers.ModelSerializer):
@@ -66,6 +120,23 @@ class RepostSerializer(serializers.ModelSerializer):
         fields = ['post']
 
 
+class RepostInfoSerializer(serializers.ModelSerializer):
+    username = serializers.ReadOnlyField(source='user.username')
+
+    class Meta:
+        model = Repost
+        fields = ['id', 'user', 'username', 'created_at']
+
+
+class EngagementActionSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=ACTIONS)
+    post_id = serializers.IntegerField(min_value=1)
+
+
+class BulkEngagementSerializer(serializers.Serializer):
+    actions = EngagementActionSerializer(many=True, allow_empty=False, max_length=BULK_ENGAGEMENT_MAX_ACTIONS)
+
+
 class BookmarkSerializer(serializers.ModelSerializer):
     class Meta:
         model = Bookmark
@@ -1,73 +1,56 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.dispatch import receiver
 from django.conf import settings
 from django.db import transaction
 
-from posts.models import Post
-from faas.interface import FaasService
+from posts.models import Post, Repost
+from posts import enrichment, ranking, timeline
+from posts.tasks import enrich_post
+from users.counters import user_counters
 
 
 FAAS_URL = settings.FAAS_URL
 
+@receiver(pre_save, sender=Post)
+def set_initial_rank_score(sender, instance, **kwargs):
+    if instance._state.adding and not instance.rank_score:
+        instance.rank_score = ranking.engagement_score(instance)
+
+
+@receiver(post_save, sender=Post)
+def push_post_to_timelines(sender, instance, created, **kwargs):
+    if created and instance.parent_id is None:
+        transaction.on_commit(lambda: timeline.fan_out_post(instance), robust=True)
+
+
+@receiver(post_save, sender=Post)
+def count_author_post(sender, instance, created, **kwargs):
+    if created and instance.parent_id is None:
+        transaction.on_commit(lambda: user_counters.incr(instance.author_id, posts_count=1), robust=True)
+
+
+@receiver(post_delete, sender=Post)
+def uncount_author_post(sender, instance, **kwargs):
+    if instance.parent_id is None:
+        transaction.on_commit(lambda: user_counters.incr(instance.author_id, posts_count=-1), robust=True)
+
+
+@receiver(post_save, sender=Repost)
+def push_repost_to_timelines(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: timeline.fan_out_repost(instance), robust=True)
+
+
 @receiver(post_save, sender=Post)
 def call_faas_upon_post_creation(sender, instance, created, **kwargs):
     print("Post created signal received. Created:", created, "Post ID:", instance.id)
-    # Call the FAAS functions only after the transaction is committed, to ensure the Post is saved
-    transaction.on_commit(lambda: _call_faas_for_post(instance, created))
+    # Queue the FAAS functions only after the transaction is committed, to ensure the Post is saved
+    if created:
+        transaction.on_commit(lambda: _call_faas_for_post(instance, created), robust=True)
 
 
 def _call_faas_for_post(instance: Post, created: bool):
+    # The calls run on Celery workers, concurrently per queue (see posts/enrichment.py), this only queues them.
     if created:
-        faas = FaasService()
-        callback = settings.FAAS_CALLBACK_URL
-        
-        faas.call_function(
-            faas.function_categorize_post_text,
-            payload={"text": instance.content, "unique_id": instance.id},
-            is_async=True,
-            callback_hook=callback,
-        )
-        faas.call_function(
-            faas.function_extract_keywords,
-            payload={"text": instance.content, "unique_id": instance.id},
-            is_async=True,
-            callback_hook=callback,
-        )
-        faas.call_function(
-            faas.function_sentiment_analysis,
-            payload=instance.content or "",
-            is_async=True,
-            metadata={"unique_id": instance.id},
-            callback_hook=callback,
-        )
-        if instance.image:
-            bucket = instance.image.storage.bucket_name
-            key = instance.image.name
-            output_key = f"thumbnails/{key}"
-            w, h = 150, 150
-            faas.call_function(
-                faas.function_image_thumbnail,
-                payload={"bucket": bucket, "key": key, "output_key": output_key, "size": [w, h], "unique_id": instance.id},
-                is_async=True,
-            callback_hook=callback,
-            )
-        if instance.video:
-            bucket = instance.image.storage.bucket_name
-            key = instance.video.name
-            # output_key name is the same as video name, but with .jpeg
-            output_key = f"thumbnails/{'.'.join(key.split('.')[:-1])}.jpeg"
-            w, h = 150, 150
-            faas.call_function(
-                faas.function_video_thumbnail,
-                payload={"bucket": bucket, "key": key, "output_key": output_key, "size": [w, h], "unique_id": instance.id},
-                is_async=True,
-                callback_hook=callback,
-            )
-
-        # TODO: MAKE SYNC TO STOP BAD POST FROM BEING SAVED
-        faas.call_function(
-            faas.function_offensive_word_detection,
-            payload={"text": instance.content, "unique_id": instance.id},
-            is_async=True,
-            callback_hook=callback,
-        )
+        for queue, function_names in enrichment.by_queue(instance).items():
+            enrich_post.apply_async((instance.id, function_names), queue=queue)
@@ -0,0 +1,23 @@
+from celery import shared_task
+from django.conf import settings
+
+from posts import enrichment, reconciliation
+from posts.counters import post_counters
+
+
+@shared_task(ignore_result=True)
+def flush_post_counters():
+    """Write the engagement counter deltas buffered in Redis to the posts table."""
+    return post_counters.flush()
+
+
+@shared_task(ignore_result=True)
+def reconcile_post_counters():
+    """Recount a few id ranges of post counters, continuing from the last run."""
+    return reconciliation.reconcile(max_ranges=settings.COUNTER_RECONCILE_RANGES_PER_RUN)
+
+
+@shared_task(ignore_result=True, acks_late=True)
+def enrich_post(post_id: int, function_names: list[str]):
+    """Run the named enrichment functions of a post concurrently and apply their results."""
+    return enrichment.enrich(post_id, function_names)
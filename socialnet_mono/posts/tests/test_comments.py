@@ -0,0 +1,96 @@
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from posts.models import Post
+
+
+def _comment(author, parent, content):
+    comment = Post.objects.create(author=author, parent=parent, content=content)
+    Post.objects.filter(id=parent.id).update(comments_count=parent.comments.count())
+    return comment
+
+
+@pytest.mark.django_db
+def test_comment_previews_are_bounded(settings):
+    settings.COMMENT_PREVIEW_SIZE = 2
+    settings.COMMENT_PREVIEW_MAX_DEPTH = 2
+    client = APIClient()
+    user = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    client.force_authenticate(user)
+    post = Post.objects.create(author=user, content="thread")
+    comments = [_comment(user, post, f"comment {i}") for i in range(5)]
+    replies = [_comment(user, comments[-1], f"reply {i}") for i in range(3)]
+    deep = _comment(user, replies[-1], "deep")
+
+    resp = client.get(reverse("post_detail", args=[post.id]))
+    data = resp.data
+    assert [c["id"] for c in data["comments"]] == [comments[4].id, comments[3].id]
+    assert data["comments_has_more"]
+    newest = data["comments"][0]
+    assert [c["id"] for c in newest["comments"]] == [replies[2].id, replies[1].id]
+    # Replies are past the preview depth, they only link to their thread.
+    assert newest["comments"][0]["comments"] == []
+    assert newest["comments"][0]["comments_has_more"]
+    assert data["comments"][1]["comments_next"] is None
+
+    # The rest of the thread continues where the preview stopped.
+    resp = client.get(data["comments_next"])
+    assert [c["id"] for c in resp.data["results"]] == [c.id for c in reversed(comments[:3])]
+    resp = client.get(newest["comments"][0]["comments_next"])
+    assert [c["id"] for c in resp.data["results"]] == [deep.id]
+
+
+@pytest.mark.django_db
+def test_comment_previews_are_loaded_per_page():
+    client = APIClient()
+    user = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    client.force_authenticate(user)
+
+    def queries():
+        with CaptureQueriesContext(connection) as ctx:
+            client.get(reverse("my_posts"))
+        return len(ctx.captured_queries)
+
+    post = Post.objects.create(author=user, content="first")
+    _comment(user, post, "comment")
+    queries()  # warms the viewer's engagement sets
+    few = queries()
+    for i in range(5):
+        post = Post.objects.create(author=user, content=f"post {i}")
+        _comment(user, _comment(user, post, "comment"), "reply")
+    assert queries() == few
+
+
+@pytest.mark.django_db
+def test_thread_is_read_depth_first_from_paths():
+    client = APIClient()
+    user = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    client.force_authenticate(user)
+    post = Post.objects.create(author=user, content="thread")
+
+    def reply(parent, content):
+        resp = client.post(reverse("post_comment"), {"content": content, "parent": parent}, format="json")
+        return resp.data["id"]
+
+    a = reply(post.id, "a")
+    b = reply(post.id, "b")
+    a1 = reply(a, "a1")
+    a1x = reply(a1, "a1x")
+    a2 = reply(a, "a2")
+    assert Post.objects.get(id=a1x).depth == 3
+
+    resp = client.get(reverse("post_thread", args=[post.id]), {"limit": 3})
+    assert [(c["id"], c["depth"]) for c in resp.data["results"]] == [(a, 1), (a1, 2), (a1x, 3)]
+    resp = client.get(resp.data["next"])
+    assert [c["id"] for c in resp.data["results"]] == [a2, b]
+    assert resp.data["next"] is None
+
+    # The backfill rebuilds the same paths.
+    Post.objects.exclude(parent=None).update(path="", depth=0)
+    call_command("backfill_comment_paths", batch_size=2)
+    resp = client.get(reverse("post_thread", args=[a]))
+    assert [(c["id"], c["depth"]) for c in resp.data["results"]] == [(a1, 2), (a1x, 3), (a2, 2)]
@@ -0,0 +1,96 @@
+import pytest
+from unittest.mock import patch
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from redis.exceptions import RedisError
+from rest_framework.test import APIClient
+from users.models import User
+from posts.models import Post, Like, Repost
+from posts import ranking, reconciliation
+from posts.counters import post_counters
+
+
+@pytest.mark.django_db
+def test_increments_are_buffered_and_flushed():
+    author = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    fans = [User.objects.create_user(username=f"fan{i}", password="pass", email=f"fan{i}@x.com") for i in range(3)]
+    post = Post.objects.create(author=author, content="hello")
+    other = Post.objects.create(author=author, content="other")
+    client = APIClient()
+    for fan in fans:
+        client.force_authenticate(fan)
+        client.post(reverse("post_like"), {"post": post.id})
+    client.delete(reverse("post_unlike", args=[post.id]))
+    client.post(reverse("post_comment"), {"content": "nice", "parent": post.id}, format="json")
+
+    # Nothing is written to the row yet, but reads include the pending deltas.
+    assert Post.objects.filter(likes_count=0, comments_count=0).count() == 3
+    resp = client.get(reverse("post_detail", args=[post.id]))
+    assert (resp.data["likes_count"], resp.data["comments_count"]) == (2, 1)
+    resp = client.get(reverse("profile_posts", args=[author.id]))
+    assert [(p["id"], p["likes_count"]) for p in resp.data["results"]] == [(other.id, 0), (post.id, 2)]
+
+    assert post_counters.flush() == 1
+    post.refresh_from_db()
+    assert (post.likes_count, post.comments_count) == (2, 1)
+    assert post.rank_score == pytest.approx(ranking.engagement_score(post))
+    assert post_counters.pending([post.id]) == {}
+    assert post_counters.flush() == 0
+
+
+@pytest.mark.django_db
+def test_flush_batches_and_clamps_at_zero():
+    author = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    posts = [Post.objects.create(author=author, content=f"post {i}") for i in range(5)]
+    for post in posts:
+        post_counters.incr(post.id, likes_count=2, shares_count=1)
+    post_counters.incr(posts[0].id, reposts_count=-1)
+    # A like and unlike that cancel out still leave the row dirty.
+    post_counters.incr(posts[1].id, comments_count=1)
+    post_counters.incr(posts[1].id, comments_count=-1)
+
+    assert post_counters.flush(batch_size=2) == 5
+    assert list(Post.objects.order_by("id").values_list("likes_count", "reposts_count", "shares_count")) == [(2, 0, 1)] * 5
+
+
+@pytest.mark.django_db
+def test_increments_go_to_the_database_without_redis():
+    author = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    post = Post.objects.create(author=author, content="hello")
+    with patch.object(post_counters, "_redis", side_effect=RedisError("down")):
+        post_counters.incr(post.id, likes_count=1)
+    post.refresh_from_db()
+    assert post.likes_count == 1
+
+
+@pytest.mark.django_db
+def test_reconcile_command_fixes_drifted_counters():
+    cache.delete(reconciliation.CHECKPOINT_KEY)
+    author = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    fan = User.objects.create_user(username="fan", password="pass", email="fan@x.com")
+    posts = [Post.objects.create(author=author, content=f"post {i}") for i in range(4)]
+    Like.objects.create(user=fan, post=posts[0])
+    Repost.objects.create(user=fan, post=posts[1])
+    Post.objects.create(author=fan, parent=posts[2], content="comment")
+    Post.objects.filter(id=posts[3].id).update(likes_count=7)
+    # A buffered like counts as already applied.
+    Like.objects.create(user=author, post=posts[0])
+    post_counters.incr(posts[0].id, likes_count=1)
+
+    call_command("reconcile_post_counters", range_size=2, max_ranges=1)
+    assert cache.get(reconciliation.CHECKPOINT_KEY) == 2
+    call_command("reconcile_post_counters", range_size=2)
+
+    counters = {
+        post.id: (post.likes_count, post.reposts_count, post.comments_count)
+        for post in Post.objects.filter(id__in=[p.id for p in posts])
+    }
+    assert counters == {
+        posts[0].id: (1, 0, 0),
+        posts[1].id: (0, 1, 0),
+        posts[2].id: (0, 0, 1),
+        posts[3].id: (0, 0, 0),
+    }
+    post_counters.flush()
+    assert Post.objects.get(id=posts[0].id).likes_count == 2
@@ -0,0 +1,74 @@
+import pytest
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from posts.models import Post, Like, Bookmark, Repost
+from posts import engagement
+from posts.counters import post_counters
+
+
+@pytest.mark.django_db
+def test_bulk_actions(django_capture_on_commit_callbacks):
+    client = APIClient()
+    user = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    author = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    a, b, c = [Post.objects.create(author=author, content=name) for name in "abc"]
+    Like.objects.create(user=user, post=c)
+    client.force_authenticate(user)
+
+    actions = [
+        {"action": "like", "post_id": a.id},
+        {"action": "like", "post_id": b.id},
+        {"action": "unlike", "post_id": b.id},  # the last action on a post wins
+        {"action": "unlike", "post_id": c.id},
+        {"action": "bookmark", "post_id": a.id},
+        {"action": "repost", "post_id": b.id},
+        {"action": "like", "post_id": 999999},
+    ]
+    with django_capture_on_commit_callbacks(execute=True):
+        resp = client.post(reverse("post_actions"), {"actions": actions}, format="json")
+    assert resp.status_code == 200
+    assert resp.data == {
+        "liked": [a.id], "unliked": [c.id], "bookmarked": [a.id], "unbookmarked": [],
+        "reposted": [b.id], "missing": [999999],
+    }
+    assert set(Like.objects.filter(user=user).values_list("post_id", flat=True)) == {a.id}
+    assert Bookmark.objects.filter(user=user, post=a).exists()
+    assert Repost.objects.filter(user=user, post=b).exists()
+
+    assert post_counters.pending([a.id, b.id, c.id]) == {
+        a.id: {"likes_count": 1}, b.id: {"reposts_count": 1}, c.id: {"likes_count": -1},
+    }
+
+    # Replaying the same batch changes nothing.
+    with django_capture_on_commit_callbacks(execute=True):
+        resp = client.post(reverse("post_actions"), {"actions": actions}, format="json")
+    assert resp.data["liked"] == [] and resp.data["reposted"] == []
+
+
+@pytest.mark.django_db
+def test_rows_changed_by_another_request_are_not_counted(django_capture_on_commit_callbacks):
+    user = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    author = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    a, b = [Post.objects.create(author=author, content=name) for name in "ab"]
+    # Another request liked a first; b was never liked (or was already unliked).
+    Like.objects.create(user=user, post=a)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        result = engagement.apply_actions(user, [
+            {"action": "like", "post_id": a.id},
+            {"action": "unlike", "post_id": b.id},
+            {"action": "repost", "post_id": b.id},
+        ])
+    assert (result["liked"], result["unliked"], result["reposted"]) == ([], [], [b.id])
+    assert post_counters.pending([a.id, b.id]) == {b.id: {"reposts_count": 1}}
+    assert Like.objects.filter(user=user).count() == 1
+
+
+@pytest.mark.django_db
+def test_bulk_actions_validation():
+    client = APIClient()
+    user = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    client.force_authenticate(user)
+    resp = client.post(reverse("post_actions"), {"actions": [{"action": "share", "post_id": 1}]}, format="json")
+    assert resp.status_code == 400
@@ -0,0 +1,125 @@
+import asyncio
+import time
+from unittest import mock
+
+import httpx
+import pytest
+
+from faas.interface import FaasService
+from posts import enrichment
+from posts.models import Post
+from posts.tasks import enrich_post
+from users.models import User
+
+
+@pytest.fixture
+def post():
+    author = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    return Post.objects.create(author=author, content="hello world")
+
+
+@pytest.mark.faas
+@pytest.mark.django_db
+def test_post_creation_queues_one_task_per_queue(django_capture_on_commit_callbacks, settings):
+    author = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    with mock.patch.object(enrich_post, "apply_async") as apply_async:
+        with django_capture_on_commit_callbacks(execute=True):
+            post = Post.objects.create(author=author, content="hello")
+            assert not apply_async.called
+        apply_async.assert_called_once_with(
+            (post.id, [FaasService.function_enrich_post]),
+            queue=settings.FAAS_TEXT_QUEUE,
+        )
+
+        apply_async.reset_mock()
+        with django_capture_on_commit_callbacks(execute=True):
+            post.content = "edited"
+            post.save()
+        assert not apply_async.called
+
+
+@pytest.mark.django_db
+def test_enrich_runs_calls_concurrently_and_applies_partial_results(post, settings):
+    settings.POST_ENRICHMENT_COMPOSITE = False
+    settings.POST_ENRICHMENT_DEADLINE = 0.5
+
+    async def acall_function(self, function_name, payload, **kwargs):
+        match function_name:
+            case FaasService.function_extract_keywords:
+                await asyncio.sleep(0.3)
+                return httpx.Response(200, json={"keywords": ["hello"], "unique_id": post.id})
+            case FaasService.function_offensive_word_detection:
+                await asyncio.sleep(0.3)
+                return httpx.Response(200, json={"censored": "", "found_words": [], "toxic": False, "unique_id": post.id})
+            case FaasService.function_categorize_post_text:
+                raise httpx.ConnectError("gateway down")
+            case _:
+                await asyncio.sleep(5)
+
+    started = time.monotonic()
+    with mock.patch.object(FaasService, "acall_function", acall_function):
+        summary = enrichment.enrich(post.id)
+    assert time.monotonic() - started < 2
+
+    assert summary == {
+        "applied": [FaasService.function_extract_keywords, FaasService.function_offensive_word_detection],
+        "failed": [FaasService.function_categorize_post_text, FaasService.function_sentiment_analysis],
+    }
+    post.refresh_from_db()
+    assert post.keywords == ["hello"]
+
+
+@pytest.mark.django_db
+def test_composite_enrichment_updates_all_text_fields_at_once(post):
+    async def acall_function(self, function_name, payload, **kwargs):
+        assert function_name == FaasService.function_enrich_post
+        return httpx.Response(200, json={
+            "unique_id": payload["unique_id"],
+            "topics": [{"label": "music", "score": 0.9}],
+            "keywords": ["hello"],
+            "offensive": {"toxic": True, "found_words": ["damn"], "censored": "****"},
+            "errors": {"sentiment": "corpora missing"},
+        })
+
+    with mock.patch.object(FaasService, "acall_function", acall_function):
+        summary = enrichment.enrich(post.id)
+    assert summary == {"applied": [FaasService.function_enrich_post], "failed": []}
+    post.refresh_from_db()
+    assert (post.topic, post.keywords, post.sentiment) == ("music", ["hello"], None)
+    assert post.is_toxit and post.is_offensive and post.is_blocked_by_system
+
+
+@pytest.mark.django_db
+def test_result_that_fails_to_apply_does_not_stop_the_others(post, settings):
+    settings.POST_ENRICHMENT_COMPOSITE = False
+
+    async def acall_function(self, function_name, payload, **kwargs):
+        return httpx.Response(200, json={"keywords": ["hello"], "unique_id": post.id})
+
+    handle_response = FaasService.handle_response
+
+    def failing_handle_response(self, function_name, response, metadata=None):
+        if function_name == FaasService.function_categorize_post_text:
+            raise ValueError("bad result")
+        return handle_response(self, function_name, response, metadata)
+
+    names = [FaasService.function_categorize_post_text, FaasService.function_extract_keywords]
+    with mock.patch.object(FaasService, "acall_function", acall_function), \
+            mock.patch.object(FaasService, "handle_response", failing_handle_response):
+        summary = enrichment.enrich(post.id, names)
+    assert summary == {"applied": [FaasService.function_extract_keywords], "failed": [FaasService.function_categorize_post_text]}
+    post.refresh_from_db()
+    assert post.keywords == ["hello"]
+
+
+@pytest.mark.django_db
+def test_enrich_only_runs_the_named_functions(post, settings):
+    settings.POST_ENRICHMENT_COMPOSITE = False
+
+    async def acall_function(self, function_name, payload, **kwargs):
+        return httpx.Response(200, json={"keywords": ["hello"], "unique_id": post.id})
+
+    with mock.patch.object(FaasService, "acall_function", acall_function):
+        summary = enrichment.enrich(post.id, [FaasService.function_extract_keywords])
+    assert summary == {"applied": [FaasService.function_extract_keywords], "failed": []}
+    assert enrichment.enrich(post.id + 1000) == {"applied": [], "failed": []}
@@ -0,0 +1,88 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from posts import memberships
+from posts.models import Post, Like, Bookmark
+from posts.viewer_state import ViewerState
+
+
+@pytest.fixture
+def users():
+    user = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    author = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    return user, author
+
+
+def _state(user, post_ids):
+    with CaptureQueriesContext(connection) as ctx:
+        state = ViewerState(user).load(post_ids)
+    return state, len(ctx.captured_queries)
+
+
+@pytest.mark.django_db
+def test_sets_are_warmed_once_then_read_from_redis(users):
+    user, author = users
+    liked = Post.objects.create(author=author, content="liked")
+    other = Post.objects.create(author=author, content="other")
+    Like.objects.create(user=user, post=liked)
+
+    state, cold_queries = _state(user, [liked.id, other.id])
+    assert state.liked == {liked.id} and not state.bookmarked and not state.reposted
+    assert cold_queries == 3
+
+    state, warm_queries = _state(user, [liked.id, other.id])
+    assert state.liked == {liked.id}
+    assert warm_queries == 0
+
+
+@pytest.mark.django_db
+def test_views_keep_warm_sets_in_sync(users, django_capture_on_commit_callbacks):
+    user, author = users
+    post = Post.objects.create(author=author, content="post")
+    client = APIClient()
+    client.force_authenticate(user)
+    memberships.warm(user.id, memberships.LIKED)
+    memberships.warm(user.id, memberships.BOOKMARKED)
+
+    assert client.post(reverse("post_like"), {"post": post.id}).status_code == 201
+    assert client.post(reverse("post_bookmark"), {"post": post.id}).status_code == 201
+    assert memberships.contains(user.id, memberships.LIKED, post.id)
+    assert memberships.contains(user.id, memberships.BOOKMARKED, post.id)
+
+    # The duplicate is answered from the set.
+    with CaptureQueriesContext(connection) as ctx:
+        resp = client.post(reverse("post_like"), {"post": post.id})
+    assert resp.data == {"status": "already liked"}
+    assert not [q for q in ctx.captured_queries if "posts_" in q["sql"]]
+
+    client.delete(reverse("post_unlike", args=[post.id]))
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(reverse("post_actions"), {"actions": [{"action": "unbookmark", "post_id": post.id}]}, format="json")
+    assert memberships.contains(user.id, memberships.LIKED, post.id) is False
+    assert memberships.contains(user.id, memberships.BOOKMARKED, post.id) is False
+    assert not Bookmark.objects.filter(user=user).exists()
+
+
+@pytest.mark.django_db
+def test_cold_sets_are_not_written_to(users):
+    user, author = users
+    post = Post.objects.create(author=author, content="post")
+    memberships.add(user.id, memberships.LIKED, [post.id])
+    assert memberships.contains(user.id, memberships.LIKED, post.id) is None
+
+
+@pytest.mark.django_db
+def test_heavy_users_are_read_from_the_database(users, settings):
+    settings.ENGAGEMENT_SET_MAX_SIZE = 1
+    user, author = users
+    posts = [Post.objects.create(author=author, content=f"post {i}") for i in range(3)]
+    Like.objects.create(user=user, post=posts[0])
+    Like.objects.create(user=user, post=posts[1])
+
+    assert memberships.warm(user.id, memberships.LIKED) is None
+    assert memberships.contains(user.id, memberships.LIKED, posts[0].id) is None
+    state, _ = _state(user, [post.id for post in posts])
+    assert state.liked == {posts[0].id, posts[1].id}
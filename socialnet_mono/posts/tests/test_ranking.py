@@ -0,0 +1,59 @@
+import pytest
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from follows.models import Follow
+from posts.models import Post
+from posts import ranking
+from posts.counters import post_counters
+
+
+@pytest.mark.django_db
+def test_score_follows_counter_updates():
+    author = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    fans = [User.objects.create_user(username=f"fan{i}", password="pass", email=f"fan{i}@x.com") for i in range(3)]
+    post = Post.objects.create(author=author, content="hello")
+    client = APIClient()
+    for fan in fans:
+        client.force_authenticate(fan)
+        client.post(reverse("post_like"), {"post": post.id})
+    client.post(reverse("post_repost"), {"post": post.id})
+
+    post_counters.flush()
+    post.refresh_from_db()
+    assert (post.likes_count, post.reposts_count) == (3, 1)
+    assert post.rank_score == pytest.approx(ranking.engagement_score(post))
+
+    Post.objects.filter(id=post.id).update(rank_score=0)
+    call_command("refresh_rank_scores")
+    post.refresh_from_db()
+    assert post.rank_score == pytest.approx(ranking.engagement_score(post))
+
+
+@pytest.mark.django_db
+def test_ranked_feed_orders_by_engagement_and_affinity(settings):
+    cache.clear()
+    user = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    friend = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    other = User.objects.create_user(username="reza", password="pass", email="reza@x.com")
+    Follow.objects.create(user=user, target=friend)
+    Follow.objects.create(user=user, target=other)
+    popular = Post.objects.create(author=other, content="popular")
+    Post.objects.filter(id=popular.id).update(likes_count=50, rank_score=ranking.score_update(likes_count=50))
+    quiet = Post.objects.create(author=friend, content="quiet")
+    newest = Post.objects.create(author=other, content="newest")
+    client = APIClient()
+    client.force_authenticate(user)
+
+    resp = client.get(reverse("feed"), {"rank": "score"})
+    assert [p["id"] for p in resp.data["results"]] == [popular.id, newest.id, quiet.id]
+
+    # Liking the friend's posts makes them rank higher for this viewer.
+    settings.FEED_RANK_AFFINITY_WEIGHT = 10.0
+    cache.clear()
+    client.post(reverse("post_like"), {"post": quiet.id})
+    resp = client.get(reverse("feed"), {"rank": "score", "limit": 1})
+    assert [p["id"] for p in resp.data["results"]] == [quiet.id]
+    assert resp.data["next"] is not None
@@ -0,0 +1,78 @@
+import pytest
+from unittest.mock import patch
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from follows.models import Follow
+from posts.models import Post, Like, Bookmark
+from posts.row_serializers import PostRowSerializer
+from posts.views import FeedView, ProfilePostsView
+
+
+@pytest.fixture
+def thread(settings):
+    settings.COMMENT_PREVIEW_SIZE = 1
+    user = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    author = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    Follow.objects.create(user=user, target=author)
+    image = Post.objects.create(author=author, content="image", keywords=["a"], tags=["b"], topic="news")
+    Post.objects.filter(id=image.id).update(image="post_images/cat.png", is_toxit=True)
+    plain = Post.objects.create(author=author, content="plain")
+    for i in range(2):
+        comment = Post.objects.create(author=user, parent=plain, content=f"comment {i}")
+        Post.objects.create(author=author, parent=comment, content="reply")
+    Post.objects.filter(id=plain.id).update(comments_count=2)
+    Like.objects.create(user=user, post=plain)
+    Bookmark.objects.create(user=user, post=comment)
+    return user, author
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("url_name, view", [("feed", FeedView), ("profile_posts", ProfilePostsView)])
+def test_row_serializer_output_matches_post_serializer(thread, url_name, view):
+    user, author = thread
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse(url_name, args=[author.id] if url_name == "profile_posts" else [])
+
+    fast = client.get(url)
+    with patch.object(view, "row_serializer_class", None):
+        slow = client.get(url)
+    assert fast.content == slow.content
+    assert any(c["is_bookmarked"] for p in fast.data["results"] for c in p["comments"])
+
+
+@pytest.mark.django_db
+def test_benchmark_command_runs(thread):
+    call_command("benchmark_post_serialization", items=100, repeat=1)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("row_serializer", [True, False])
+def test_sparse_fieldsets_skip_unselected_fields(thread, row_serializer):
+    user, author = thread
+    client = APIClient()
+    client.force_authenticate(user)
+    url = reverse("profile_posts", args=[author.id])
+
+    with patch.object(ProfilePostsView, "row_serializer_class", PostRowSerializer if row_serializer else None), \
+            patch("posts.comments.top_comments") as top_comments, \
+            patch("posts.viewer_state.ViewerState.load") as load_viewer_state:
+        resp = client.get(url, {"fields": "id,content,likes_count,thumbnail,author_username"})
+        assert set(resp.data["results"][0]) == {"id", "content", "likes_count", "thumbnail", "author_username"}
+        resp = client.get(url, {"omit": "comments,comments_has_more,comments_next,is_liked,is_bookmarked,is_reposted"})
+        assert "comments" not in resp.data["results"][0] and "keywords" in resp.data["results"][0]
+    top_comments.assert_not_called()
+    load_viewer_state.assert_not_called()
+
+
+@pytest.mark.django_db
+def test_sparse_fieldsets_on_user_serializers(thread):
+    user, author = thread
+    client = APIClient()
+    client.force_authenticate(user)
+    resp = client.get(reverse("followers_list", args=[author.id]), {"fields": "id,username"})
+    assert resp.data["results"] == [{"id": user.id, "username": "ali"}]
+    resp = client.get(reverse("profile"), {"omit": "email,avatar"})
+    assert set(resp.data) == {"id", "username", "bio", "followers_count", "following_count", "posts_count"}
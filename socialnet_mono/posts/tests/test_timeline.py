@@ -0,0 +1,142 @@
+import pytest
+from unittest.mock import patch
+from django.core.management import call_command
+from django.urls import reverse
+from django_redis import get_redis_connection
+from rest_framework.test import APIClient
+from users.models import User
+from follows.models import Follow
+from posts.models import Post, Repost
+from posts import timeline
+
+
+@pytest.mark.django_db
+def test_fan_out_only_touches_warm_timelines(django_capture_on_commit_callbacks):
+    author = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    warm = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    cold = User.objects.create_user(username="reza", password="pass", email="reza@x.com")
+    Follow.objects.create(user=warm, target=author)
+    Follow.objects.create(user=cold, target=author)
+    old = Post.objects.create(author=author, content="old")
+    timeline.rebuild(warm.id)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        new = Post.objects.create(author=author, content="new")
+
+    entries, has_more = timeline.read(warm.id, 20)
+    assert [event_id for _, _, event_id in entries] == [new.id, old.id]
+    assert not has_more
+    assert timeline.read(cold.id, 20) is None
+
+
+@pytest.mark.django_db
+def test_feed_is_served_from_timeline():
+    client = APIClient()
+    user = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    author = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    Follow.objects.create(user=user, target=author)
+    posts = [Post.objects.create(author=author, content=f"post {i}") for i in range(3)]
+    client.force_authenticate(user)
+
+    # The first read misses and warms the timeline.
+    resp = client.get(reverse("feed"))
+    assert [p["id"] for p in resp.data["results"]] == [p.id for p in reversed(posts)]
+    assert timeline.is_warm(user.id)
+
+    resp = client.get(reverse("feed"), {"limit": 2})
+    assert [p["id"] for p in resp.data["results"]] == [posts[2].id, posts[1].id]
+    resp = client.get(resp.data["next"])
+    assert [p["id"] for p in resp.data["results"]] == [posts[0].id]
+    assert resp.data["next"] is None
+
+
+@pytest.mark.django_db
+def test_unfollow_drops_author_posts_and_rebuild_command(django_capture_on_commit_callbacks):
+    user = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    author = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    Follow.objects.create(user=user, target=author)
+    post = Post.objects.create(author=author, content="hello")
+    call_command("rebuild_timelines", user.id)
+    entries, _ = timeline.read(user.id, 20)
+    assert [event_id for _, _, event_id in entries] == [post.id]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Follow.objects.filter(user=user, target=author).delete()
+    assert timeline.read(user.id, 20) == ([], False)
+
+
+@pytest.mark.django_db
+def test_high_follower_authors_are_merged_at_read_time(settings, django_capture_on_commit_callbacks):
+    settings.TIMELINE_FANOUT_FOLLOWER_THRESHOLD = 1
+    celebrity = User.objects.create_user(username="celeb", password="pass", email="celeb@x.com")
+    friend = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    user = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    other = User.objects.create_user(username="reza", password="pass", email="reza@x.com")
+    with django_capture_on_commit_callbacks(execute=True):
+        for follower in (user, other):
+            Follow.objects.create(user=follower, target=celebrity)
+        Follow.objects.create(user=user, target=friend)
+    timeline.rebuild(user.id)
+    timeline.rebuild(other.id)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        first = Post.objects.create(author=friend, content="first")
+        second = Post.objects.create(author=celebrity, content="second")
+        third = Post.objects.create(author=friend, content="third")
+
+    # The celebrity's post was never written to the followers' timelines...
+    assert timeline.is_pull_author(celebrity.id)
+    conn = get_redis_connection("default")
+    assert conn.zscore(timeline.timeline_key(other.id), second.id) is None
+
+    # ...but shows up in order when they are read.
+    entries, has_more = timeline.read(user.id, 20)
+    assert [event_id for _, _, event_id in entries] == [third.id, second.id, first.id]
+    entries, _ = timeline.read(other.id, 20)
+    assert [event_id for _, _, event_id in entries] == [second.id]
+
+
+@pytest.mark.django_db
+def test_empty_outbox_of_pull_author_stays_warm():
+    celebrity = User.objects.create_user(username="celeb", password="pass", email="celeb@x.com")
+    user = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    Follow.objects.create(user=user, target=celebrity)
+    own = Post.objects.create(author=user, content="mine")
+    get_redis_connection("default").sadd(timeline.PULL_AUTHORS_KEY, celebrity.id)
+    timeline.rebuild(user.id)
+    assert timeline.rebuild_outbox(celebrity.id) == 0
+
+    with patch.object(timeline, "rebuild_outbox") as rebuild_outbox:
+        entries, has_more = timeline.read(user.id, 20)
+    assert not rebuild_outbox.called
+    assert [event_id for _, _, event_id in entries] == [own.id]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize("warm", [False, True])
+def test_feed_merges_reposts_and_dedupes(warm, django_capture_on_commit_callbacks):
+    client = APIClient()
+    user = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    friend = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    stranger = User.objects.create_user(username="reza", password="pass", email="reza@x.com")
+    Follow.objects.create(user=user, target=friend)
+    if warm:
+        timeline.rebuild(user.id)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        own = Post.objects.create(author=friend, content="own")
+        foreign = Post.objects.create(author=stranger, content="foreign")
+        Repost.objects.create(user=friend, post=foreign)
+        # Reposting a post that's already in the feed doesn't duplicate it.
+        Repost.objects.create(user=friend, post=own)
+    client.force_authenticate(user)
+
+    resp = client.get(reverse("feed"))
+    results = resp.data["results"]
+    assert [p["id"] for p in results] == [foreign.id, own.id]
+    assert results[0]["repost"]["username"] == "hassan"
+    assert results[1]["repost"] is None
+
+    resp = client.get(reverse("feed"), {"limit": 1})
+    resp = client.get(resp.data["next"])
+    assert [p["id"] for p in resp.data["results"]] == [own.id]
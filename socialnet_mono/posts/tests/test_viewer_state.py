@@ -0,0 +1,40 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from posts.models import Post, Like, Bookmark, Repost
+
+
+def _profile_queries(client, author):
+    with CaptureQueriesContext(connection) as ctx:
+        resp = client.get(reverse("profile_posts", args=[author.id]), {"pagination": "offset"})
+    assert resp.status_code == 200
+    return resp, len(ctx.captured_queries)
+
+
+@pytest.mark.django_db
+def test_viewer_state_is_resolved_per_page():
+    client = APIClient()
+    user = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    author = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    client.force_authenticate(user)
+    liked = Post.objects.create(author=author, content="liked")
+    other = Post.objects.create(author=author, content="other")
+    Like.objects.create(user=user, post=liked)
+    Bookmark.objects.create(user=user, post=other)
+    Repost.objects.create(user=user, post=other)
+
+    _profile_queries(client, author)  # warms the viewer's engagement sets
+    resp, few = _profile_queries(client, author)
+    state = {p["id"]: (p["is_liked"], p["is_bookmarked"], p["is_reposted"]) for p in resp.data["results"]}
+    assert state == {liked.id: (True, False, False), other.id: (False, True, True)}
+
+    for i in range(5):
+        Post.objects.create(author=author, content=f"post {i}")
+    _, many = _profile_queries(client, author)
+    assert many == few
+
+    resp = client.get(reverse("post_detail", args=[liked.id]))
+    assert resp.data["is_liked"] and not resp.data["is_bookmarked"]
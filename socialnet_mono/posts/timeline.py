@@ -0,0 +1,319 @@
+"""
+Materialized home timelines.
+
+Each user's home feed is kept in Redis as a sorted set of feed events, scored
+by the event's creation time. Posts are stored by id and reposts as
+`r<repost id>`. New top-level posts and reposts are pushed into the timelines
+of the actor's followers when they are created (fan-out on write), so reading
+a feed page is a single ZREVRANGE plus batched hydration.
+
+Authors with more than TIMELINE_FANOUT_FOLLOWER_THRESHOLD followers are not
+fanned out, since one post would mean hundreds of thousands of writes. Their
+events go to a per-author outbox instead, and are merged into the reader's
+timeline at read time (hybrid push/pull). Once an author has been switched to
+pull they stay there, so followers' timelines never miss their older posts.
+
+Timelines are a cache. A missing key means the timeline is cold and callers
+must fall back to the SQL feed query. Fan-out never creates a key, it only
+appends to timelines that are already warm, otherwise a cold user would end up
+with a timeline holding just the newest post.
+"""
+import heapq
+import logging
+
+from django.conf import settings
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+from follows import cache as follow_cache
+from follows.models import Follow
+from posts.models import Post, Repost
+
+logger = logging.getLogger(__name__)
+
+PULL_AUTHORS_KEY = "timeline:pull-authors"
+
+# Event kinds, also the tie-breaker between events with the same timestamp.
+POST, REPOST = 0, 1
+
+# Rebuilt timelines always hold this member, so a warm timeline with no posts
+# in it can be told apart from a cold one. It scores 0, so trimming drops it
+# first once the timeline is full.
+_SENTINEL = "0"
+
+# KEYS: sorted set keys, ARGV: max length, then score/member pairs.
+_PUSH_SCRIPT = """
+local max_len = tonumber(ARGV[1])
+for _, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        for i = 2, #ARGV, 2 do
+            redis.call('ZADD', key, ARGV[i], ARGV[i + 1])
+        end
+        redis.call('ZREMRANGEBYRANK', key, 0, -(max_len + 1))
+    end
+end
+return 1
+"""
+
+# A timeline entry is (score, kind, id), which sorts like the feed does.
+Entry = tuple[float, int, int]
+
+
+def timeline_key(user_id: int) -> str:
+    return f"timeline:home:{user_id}"
+
+
+def outbox_key(author_id: int) -> str:
+    return f"timeline:outbox:{author_id}"
+
+
+def _redis():
+    return get_redis_connection("default")
+
+
+def _member(kind: int, event_id: int) -> str:
+    return f"r{event_id}" if kind == REPOST else str(event_id)
+
+
+def _entry(member: bytes, score: float) -> Entry:
+    member = member.decode()
+    if member.startswith("r"):
+        return score, REPOST, int(member[1:])
+    return score, POST, int(member)
+
+
+def _push(keys, entries: list[Entry]):
+    """Append entries to the sorted sets in `keys` that exist."""
+    if not entries:
+        return
+    args = [settings.TIMELINE_MAX_LENGTH]
+    for score, kind, event_id in entries:
+        args.extend([score, _member(kind, event_id)])
+
+    conn = _redis()
+    script = conn.register_script(_PUSH_SCRIPT)
+    batch_size = settings.TIMELINE_FANOUT_BATCH_SIZE
+    keys = list(keys)
+    for start in range(0, len(keys), batch_size):
+        script(keys=keys[start:start + batch_size], args=args)
+
+
+def _actor_entries(actor_ids, limit: int) -> list[Entry]:
+    """The newest posts and reposts made by `actor_ids`."""
+    posts = Post.objects.filter(
+        author_id__in=actor_ids,
+        parent=None,
+    ).order_by('-created_at').values_list('created_at', 'id')[:limit]
+    reposts = Repost.objects.filter(
+        user_id__in=actor_ids,
+    ).order_by('-created_at').values_list('created_at', 'id')[:limit]
+    merged = heapq.merge(
+        [(created_at.timestamp(), POST, post_id) for created_at, post_id in posts],
+        [(created_at.timestamp(), REPOST, repost_id) for created_at, repost_id in reposts],
+        reverse=True,
+    )
+    return list(merged)[:limit]
+
+
+def _pull_authors(conn) -> set[int]:
+    return {int(author_id) for author_id in conn.smembers(PULL_AUTHORS_KEY)}
+
+
+def is_pull_author(author_id: int) -> bool:
+    return bool(_redis().sismember(PULL_AUTHORS_KEY, author_id))
+
+
+def _write(conn, key: str, entries: list[Entry], *extra):
+    pipe = conn.pipeline(transaction=True)
+    pipe.delete(key)
+    mapping = dict(extra)
+    mapping.update({_member(kind, event_id): score for score, kind, event_id in entries})
+    if mapping:
+        pipe.zadd(key, mapping)
+    return pipe
+
+
+def rebuild_outbox(author_id: int) -> int:
+    entries = _actor_entries([author_id], settings.TIMELINE_MAX_LENGTH)
+    # The sentinel keeps an author without any events from reading as cold.
+    _write(_redis(), outbox_key(author_id), entries, (_SENTINEL, 0)).execute()
+    return len(entries)
+
+
+def _fan_out(actor_id: int, entry: Entry):
+    follower_count = follow_cache.get_follower_count(actor_id)
+    if follower_count > settings.TIMELINE_FANOUT_FOLLOWER_THRESHOLD or is_pull_author(actor_id):
+        if _redis().sadd(PULL_AUTHORS_KEY, actor_id):
+            rebuild_outbox(actor_id)
+        else:
+            _push([outbox_key(actor_id)], [entry])
+        _push([timeline_key(actor_id)], [entry])
+        return
+
+    follower_ids = Follow.objects.filter(target_id=actor_id).values_list('user_id', flat=True)
+    recipients = [actor_id, *follower_ids.iterator(chunk_size=settings.TIMELINE_FANOUT_BATCH_SIZE)]
+    _push([timeline_key(user_id) for user_id in recipients], [entry])
+
+
+def fan_out_post(post: Post):
+    """Push a newly created top-level post into its audience's timelines."""
+    if post.parent_id is not None:
+        return
+    try:
+        _fan_out(post.author_id, (post.created_at.timestamp(), POST, post.id))
+    except RedisError as e:
+        logger.warning("Timeline fan-out failed for post %s: %s", post.id, e)
+
+
+def fan_out_repost(repost: Repost):
+    """Push a new repost into the timelines of the reposter's followers."""
+    try:
+        _fan_out(repost.user_id, (repost.created_at.timestamp(), REPOST, repost.id))
+    except RedisError as e:
+        logger.warning("Timeline fan-out failed for repost %s: %s", repost.id, e)
+
+
+def add_author(user_id: int, author_id: int):
+    """Merge the recent activity of a newly followed author into a warm timeline."""
+    add_authors(user_id, [author_id])
+
+
+def add_authors(user_id: int, author_ids):
+    """Merge the recent activity of several newly followed authors into a warm timeline at once."""
+    try:
+        author_ids = set(author_ids) - _pull_authors(_redis())  # pull authors are merged in at read time
+        if author_ids:
+            _push([timeline_key(user_id)], _actor_entries(author_ids, settings.TIMELINE_MAX_LENGTH))
+    except RedisError as e:
+        logger.warning("Timeline merge failed for user %s: %s", user_id, e)
+
+
+def remove_author(user_id: int, author_id: int):
+    """Drop an unfollowed author's posts and reposts from a timeline."""
+    members = [
+        _member(kind, event_id)
+        for _, kind, event_id in _actor_entries([author_id], settings.TIMELINE_MAX_LENGTH)
+    ]
+    if not members:
+        return
+    try:
+        _redis().zrem(timeline_key(user_id), *members)
+    except RedisError as e:
+        logger.warning("Timeline cleanup failed for user %s: %s", user_id, e)
+
+
+def forget(user_id: int, entries: list[Entry]):
+    """Remove entries whose post or repost no longer exists."""
+    if not entries:
+        return
+    try:
+        _redis().zrem(timeline_key(user_id), *[_member(kind, event_id) for _, kind, event_id in entries])
+    except RedisError:
+        pass
+
+
+def rebuild(user_id: int) -> int:
+    """
+    Rebuild a user's timeline from the database. Activity of pull authors is
+    left out, it is merged in from the outboxes when the timeline is read.
+
+    :return: Number of events written to the timeline
+    """
+    conn = _redis()
+    pull_authors = _pull_authors(conn) - {user_id}
+    actor_ids = [author_id for author_id in follow_cache.get_following_ids(user_id) if author_id not in pull_authors]
+    actor_ids.append(user_id)
+    entries = _actor_entries(actor_ids, settings.TIMELINE_MAX_LENGTH)
+
+    key = timeline_key(user_id)
+    pipe = _write(conn, key, entries, (_SENTINEL, 0))
+    pipe.expire(key, settings.TIMELINE_TTL)
+    pipe.execute()
+    return len(entries)
+
+
+def is_warm(user_id: int) -> bool:
+    return bool(_redis().exists(timeline_key(user_id)))
+
+
+def _queue_range(pipe, key: str, limit: int, before: tuple | None):
+    pipe.zcard(key)
+    if before is None:
+        pipe.zrevrange(key, 0, limit, withscores=True)
+    else:
+        max_score = before[0].timestamp()
+        # Events sharing the cursor's timestamp are ordered by (kind, id),
+        # the rest are strictly older than the cursor.
+        pipe.zrangebyscore(key, max_score, max_score, withscores=True)
+        pipe.zrevrangebyscore(key, f'({max_score}', '-inf', start=0, num=limit + 1, withscores=True)
+
+
+def _parse_range(results: list, before: tuple | None) -> tuple[int, list[Entry]]:
+    total, *ranges = results
+    entries = [_entry(member, score) for member, score in ranges[0] if member.decode() != _SENTINEL]
+    if before is not None:
+        entries = [entry for entry in entries if entry[1:] < tuple(before[1:])]
+        entries += [_entry(member, score) for member, score in ranges[1] if member.decode() != _SENTINEL]
+    entries.sort(reverse=True)
+    return total, entries
+
+
+def _followed_pull_authors(conn, user_id: int) -> list[int]:
+    pull_authors = _pull_authors(conn) - {user_id}
+    if not pull_authors:
+        return []
+    return [author_id for author_id in follow_cache.get_following_ids(user_id) if author_id in pull_authors]
+
+
+def read(user_id: int, limit: int, before: tuple | None = None) -> tuple[list[Entry], bool] | None:
+    """
+    Read a page of (score, kind, id) entries from a user's timeline, newest
+    first, starting strictly after the `(created_at, kind, id)` position
+    `before`. The outboxes of followed pull authors are k-way merged in.
+
+    A sorted set shorter than TIMELINE_MAX_LENGTH holds everything it covers.
+    A full one has been trimmed, so a page that reaches past its end can only
+    be served from SQL.
+
+    :return: (entries, has_more), or None when the page can't be served from
+        the timeline and the caller has to fall back to SQL
+    """
+    try:
+        conn = _redis()
+        author_ids = _followed_pull_authors(conn, user_id)
+        keys = [timeline_key(user_id)] + [outbox_key(author_id) for author_id in author_ids]
+        pipe = conn.pipeline(transaction=False)
+        for key in keys:
+            _queue_range(pipe, key, limit, before)
+        pipe.expire(keys[0], settings.TIMELINE_TTL)
+        results = pipe.execute()
+    except RedisError as e:
+        logger.warning("Timeline read failed for user %s: %s", user_id, e)
+        return None
+
+    step = 2 if before is None else 3
+    sources = [_parse_range(results[i:i + step], before) for i in range(0, step * len(keys), step)]
+    if not sources[0][0]:
+        return None
+
+    cold_outboxes = [author_id for author_id, (total, _) in zip(author_ids, sources[1:]) if not total]
+    if cold_outboxes:
+        # e.g. after a Redis restart. Build them for next time and serve this
+        # page from SQL.
+        try:
+            for author_id in cold_outboxes:
+                rebuild_outbox(author_id)
+        except RedisError:
+            pass
+        return None
+
+    merged = list(heapq.merge(*(entries for _, entries in sources), reverse=True))[:limit + 1]
+
+    # A trimmed source that ran out before the end of this page may be missing
+    # older events that belong on it.
+    for total, entries in sources:
+        if total >= settings.TIMELINE_MAX_LENGTH and len(entries) <= limit:
+            if not entries or len(merged) <= limit or merged[-1] < entries[-1]:
+                return None
+
+    return merged[:limit], len(merged) > limit
@@ -3,7 +3,7 @@ from .views import (
     PostCreateView, PostEditView, PostDeleteView, ProfilePostsView, PostDetailView,
     CommentCreateView, LikePostView, UnlikePostView, RepostView, MyPostsView,
     BookmarkView, UnbookmarkView, BookmarkedPostsView, FeedView, PostShareQRCodeView,
-    PostTextToSpeechView,
+    PostTextToSpeechView, CommentThreadView, CommentTreeView, BulkEngagementView,
 )
 
 
@@ -17,10 +17,13 @@ urlpatterns = [
     path('profile/<int:pk>/', ProfilePostsView.as_view(), name='profile_posts'),
     path('<int:pk>/', PostDetailView.as_view(), name='post_detail'),
     path('comment/', CommentCreateView.as_view(), name='post_comment'),
+    path('<int:pk>/comments/', CommentThreadView.as_view(), name='post_comments'),
+    path('<int:pk>/thread/', CommentTreeView.as_view(), name='post_thread'),
     path('like/', LikePostView.as_view(), name='post_like'),
     path('unlike/<int:post_id>/', UnlikePostView.as_view(), name='post_unlike'),
     path('repost/', RepostView.as_view(), name='post_repost'),
     path('bookmark/', BookmarkView.as_view(), name='post_bookmark'),
+    path('actions/', BulkEngagementView.as_view(), name='post_actions'),
     path('unbookmark/<int:post_id>/', UnbookmarkView.as_view(), name='post_unbookmark'),
     path('bookmarked/', BookmarkedPostsView.as_view(), name='bookmarked_posts'),
     path('feed/', FeedView.as_view(), name='feed'),
@@ -0,0 +1,60 @@
+"""
+What the requesting user has done to the posts on a page.
+
+`PostSerializer` reports `is_liked`, `is_bookmarked` and `is_reposted` for
+every post it renders. Asking the database per post costs three queries per
+item, so views resolve the whole page up front and pass the result to the
+serializer in its context as `viewer_state`. The page is checked against the
+user's cached engagement sets (posts/memberships.py) in one Redis round trip;
+a set that is cold is warmed from the database.
+"""
+from posts import memberships
+
+
+class ViewerState:
+    def __init__(self, user):
+        self.user = user
+        self.liked: set[int] = set()
+        self.bookmarked: set[int] = set()
+        self.reposted: set[int] = set()
+        self._resolved: set[int] = set()
+
+    @classmethod
+    def for_posts(cls, user, posts) -> 'ViewerState':
+        return cls(user).load(post.id for post in posts)
+
+    def load(self, post_ids) -> 'ViewerState':
+        """Resolve the given posts, skipping those already resolved."""
+        post_ids = set(post_ids) - self._resolved
+        if post_ids and self.user.is_authenticated:
+            found, cold = memberships.lookup(self.user.id, post_ids)
+            for kind, resolved in (
+                (memberships.LIKED, self.liked),
+                (memberships.BOOKMARKED, self.bookmarked),
+                (memberships.REPOSTED, self.reposted),
+            ):
+                if kind in found:
+                    resolved.update(found[kind])
+                elif kind in cold:
+                    resolved.update(self._warm(kind, post_ids))
+                else:
+                    resolved.update(self._query(kind, post_ids))
+        self._resolved |= post_ids
+        return self
+
+    def _query(self, kind: str, post_ids: set[int]) -> set[int]:
+        model = memberships.MODELS[kind]
+        return set(model.objects.filter(user=self.user, post_id__in=post_ids).values_list('post_id', flat=True))
+
+    def _warm(self, kind: str, post_ids: set[int]) -> set[int]:
+        members = memberships.warm(self.user.id, kind)
+        return self._query(kind, post_ids) if members is None else members & post_ids
+
+    def is_liked(self, post_id: int) -> bool:
+        return post_id in self.load([post_id]).liked
+
+    def is_bookmarked(self, post_id: int) -> bool:
+        return post_id in self.load([post_id]).bookmarked
+
+    def is_reposted(self, post_id: int) -> bool:
+        return post_id in self.load([post_id]).reposted
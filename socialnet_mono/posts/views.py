@@ -1,15 +1,73 @@
 import base64
 from django.contrib.auth import get_user_model
 from rest_framework import generics, permissions, status
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.generics import get_object_or_404
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.response import Response
 from .models import Post, Like, Repost, Bookmark
-from .serializers import PostSerializer, PostCreateSerializer, LikeSerializer, RepostSerializer, BookmarkSerializer
-from django.db.models import F
+from .serializers import (
+    PostSerializer, PostCreateSerializer, LikeSerializer, RepostSerializer, BookmarkSerializer, RepostInfoSerializer,
+    ThreadCommentSerializer, BulkEngagementSerializer, PREVIEW_FIELDS, VIEWER_STATE_FIELDS,
+)
+from socialnet_mono.fieldsets import is_selected, requested_fieldset
+from socialnet_mono.pagination import KeysetPagination
+from .viewer_state import ViewerState
+from .row_serializers import PostRowSerializer
+from .counters import post_counters
+from . import comments, engagement, feed, memberships, ranking
 
 User = get_user_model()
 
 
+class PostPageMixin:
+    """
+    Prepare the posts being serialized in one go: load their comment previews
+    and resolve the viewer's likes, bookmarks and reposts for all of them.
+    Only what the requested fieldset (`?fields=`/`?omit=`) shows is loaded.
+    """
+
+    comment_previews = True
+    # Set to a PostRowSerializer to serialize list pages from `.values()` rows.
+    row_serializer_class = None
+
+    def get_row_serializer(self):
+        return self.row_serializer_class(self.get_serializer_context())
+
+    def selects_any(self, names) -> bool:
+        fieldset = requested_fieldset(self.request)
+        return any(is_selected(name, fieldset) for name in names)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        columns = ['author', 'parent', 'created_at', *self.get_serializer_class().only_columns(self.request)]
+        if any('__' in column for column in columns):
+            queryset = queryset.select_related('author')
+        return queryset.only(*columns)
+
+    def list(self, request, *args, **kwargs):
+        if self.row_serializer_class is None:
+            return super().list(request, *args, **kwargs)
+        row_serializer = self.get_row_serializer()
+        queryset = self.filter_queryset(self.get_queryset()).values(*row_serializer.value_fields())
+        page = self.paginate_queryset(queryset)
+        if page is None:
+            return Response(row_serializer.serialize(queryset))
+        return self.get_paginated_response(row_serializer.serialize(page))
+
+    def get_serializer(self, *args, **kwargs):
+        if args and args[0] is not None:
+            posts = list(args[0]) if kwargs.get('many') else [args[0]]
+            previewed = []
+            if self.comment_previews and self.selects_any(PREVIEW_FIELDS):
+                previewed = comments.load_previews(posts)
+            post_counters.merge(posts + previewed)
+            kwargs.setdefault('context', self.get_serializer_context())
+            if self.selects_any(VIEWER_STATE_FIELDS):
+                kwargs['context']['viewer_state'] = ViewerState.for_posts(self.request.user, posts + previewed)
+        return super().get_serializer(*args, **kwargs)
+
+
 class PostCreateView(generics.CreateAPIView):
     queryset = Post.objects.all()
     serializer_class = PostCreateSerializer
@@ -32,22 +90,31 @@ class PostDeleteView(generics.DestroyAPIView):
     def get_queryset(self):
         return self.queryset.filter(author=self.request.user)
 
+    def perform_destroy(self, instance):
+        parent_id = instance.parent_id
+        super().perform_destroy(instance)
+        if parent_id:
+            post_counters.incr(parent_id, comments_count=-1)
+
 
-class ProfilePostsView(generics.ListAPIView):
+class ProfilePostsView(PostPageMixin, generics.ListAPIView):
+    pagination_class = KeysetPagination
     serializer_class = PostSerializer
+    row_serializer_class = PostRowSerializer
 
     def get_queryset(self):
         target = get_object_or_404(User.objects, pk=self.kwargs['pk'])
-        return Post.objects.filter(author=target)
+        return Post.objects.filter(author=target).select_related('author')
 
-class MyPostsView(generics.ListAPIView):
+class MyPostsView(PostPageMixin, generics.ListAPIView):
     serializer_class = PostSerializer
+    row_serializer_class = PostRowSerializer
 
     def get_queryset(self):
-        return Post.objects.filter(author=self.request.user)
+        return Post.objects.filter(author=self.request.user).select_related('author')
 
 
-class PostDetailView(generics.RetrieveAPIView):
+class PostDetailView(PostPageMixin, generics.RetrieveAPIView):
     queryset = Post.objects.all()
     serializer_class = PostSerializer
 
@@ -59,10 +126,15 @@ class CommentCreateView(generics.CreateAPIView):
     def perform_create(self, serializer):
         parent_id = self.request.data.get('parent')
         parent = get_object_or_404(Post.objects, pk=parent_id)
-        instance = serializer.save(author=self.request.user)
+        if parent.depth + 1 > comments.MAX_DEPTH:
+            raise ValidationError({'parent': 'This thread is nested too deeply to reply to.'})
+        instance = serializer.save(
+            author=self.request.user,
+            path=comments.child_path(parent),
+            depth=parent.depth + 1,
+        )
         if parent:
-            parent.comments_count = F('comments_count') + 1
-            parent.save(update_fields=['comments_count'])
+            post_counters.incr(parent.id, comments_count=1)
         return instance
 
 
@@ -72,10 +144,13 @@ class LikePostView(generics.CreateAPIView):
 
     def create(self, request, *args, **kwargs):
         post_id = request.data['post']
+        if memberships.contains(request.user.id, memberships.LIKED, post_id):
+            return Response({'status': 'already liked'}, status=status.HTTP_200_OK)
         post = get_object_or_404(Post.objects, pk=post_id)
         like, created = Like.objects.get_or_create(user=request.user, post=post)
         if created:
-            Post.objects.filter(id=post_id).update(likes_count=F('likes_count') + 1)
+            post_counters.incr(post.id, likes_count=1)
+            memberships.add(request.user.id, memberships.LIKED, [post.id])
             return Response({'status': 'liked'}, status=status.HTTP_201_CREATED)
         return Response({'status': 'already liked'}, status=status.HTTP_200_OK)
 
@@ -89,7 +164,8 @@ class UnlikePostView(generics.DestroyAPIView):
         like = Like.objects.filter(user=request.user, post=post).first()
         if like:
             like.delete()
-            Post.objects.filter(id=post_id).update(likes_count=F('likes_count') - 1)
+            post_counters.incr(post.id, likes_count=-1)
+            memberships.remove(request.user.id, memberships.LIKED, [post.id])
             return Response({'status': 'unliked'})
         return Response({'status': 'not liked'}, status=status.HTTP_404_NOT_FOUND)
 
@@ -100,23 +176,76 @@ class RepostView(generics.CreateAPIView):
 
     def create(self, request, *args, **kwargs):
         post_id = request.data['post']
+        if memberships.contains(request.user.id, memberships.REPOSTED, post_id):
+            return Response({'status': 'already reposted'}, status=status.HTTP_200_OK)
         post = get_object_or_404(Post.objects, pk=post_id)
         repost, created = Repost.objects.get_or_create(user=request.user, post=post)
         if created:
-            Post.objects.filter(id=post_id).update(reposts_count=F('reposts_count') + 1)
+            post_counters.incr(post.id, reposts_count=1)
+            memberships.add(request.user.id, memberships.REPOSTED, [post.id])
             return Response({'status': 'reposted'}, status=status.HTTP_201_CREATED)
         return Response({'status': 'already reposted'}, status=status.HTTP_200_OK)
 
 
+class CommentThreadView(PostPageMixin, generics.ListAPIView):
+    """Paginated comments of a post, newest first, each with a preview of its replies."""
+    pagination_class = KeysetPagination
+    serializer_class = PostSerializer
+    row_serializer_class = PostRowSerializer
+
+    def get_queryset(self):
+        parent = get_object_or_404(Post.objects, pk=self.kwargs['pk'])
+        return Post.objects.filter(parent=parent).select_related('author')
+
+
+class CommentTreeView(PostPageMixin, generics.ListAPIView):
+    """
+    A post's whole comment tree, flattened in depth-first order with each
+    comment's `depth`, read with one range scan on the materialized path.
+    """
+    pagination_class = KeysetPagination
+    serializer_class = ThreadCommentSerializer
+    comment_previews = False
+
+    def list(self, request, *args, **kwargs):
+        root = get_object_or_404(Post.objects, pk=self.kwargs['pk'])
+        paginator = self.paginator
+        page_size = paginator.get_page_size(request)
+        position = paginator.decode_cursor(request) or ()
+        if not all(isinstance(post_id, int) for post_id in position):
+            raise NotFound(paginator.invalid_cursor_message)
+        page = list(comments.subtree(root, after=comments.thread_key(position))[:page_size + 1])
+
+        next_position = None
+        if len(page) > page_size:
+            page = page[:page_size]
+            next_position = comments.key_ids(page[-1])
+        paginator.set_page(request, page_size, next_position)
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
+
+class BulkEngagementView(generics.GenericAPIView):
+    """Apply a batch of like/unlike/bookmark/unbookmark/repost actions, e.g. replayed from offline."""
+    serializer_class = BulkEngagementSerializer
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(engagement.apply_actions(request.user, serializer.validated_data['actions']))
+
+
 class BookmarkView(generics.CreateAPIView):
     queryset = Bookmark.objects.all()
     serializer_class = BookmarkSerializer
 
     def create(self, request, *args, **kwargs):
         post_id = request.data['post']
+        if memberships.contains(request.user.id, memberships.BOOKMARKED, post_id):
+            return Response({'status': 'already bookmarked'}, status=status.HTTP_200_OK)
         post = get_object_or_404(Post.objects, pk=post_id)
         bm, created = Bookmark.objects.get_or_create(user=request.user, post=post)
         if created:
+            memberships.add(request.user.id, memberships.BOOKMARKED, [post.id])
             return Response({'status': 'bookmarked'}, status=status.HTTP_201_CREATED)
         return Response({'status': 'already bookmarked'}, status=status.HTTP_200_OK)
 
@@ -130,27 +259,67 @@ class UnbookmarkView(generics.DestroyAPIView):
         bm = Bookmark.objects.filter(user=request.user, post=post).first()
         if bm:
             bm.delete()
+            memberships.remove(request.user.id, memberships.BOOKMARKED, [post.id])
             return Response({'status': 'unbookmarked'})
         return Response({'status': 'not bookmarked'}, status=status.HTTP_404_NOT_FOUND)
 
 
-class BookmarkedPostsView(generics.ListAPIView):
+class BookmarkedPostsView(PostPageMixin, generics.ListAPIView):
+    pagination_class = KeysetPagination
     serializer_class = PostSerializer
+    row_serializer_class = PostRowSerializer
 
     def get_queryset(self):
-        return Post.objects.filter(bookmarks__user=self.request.user).order_by('-created_at')
+        return Post.objects.filter(bookmarks__user=self.request.user).select_related('author').order_by('-created_at')
 
 
-class FeedView(generics.ListAPIView):
+class FeedView(PostPageMixin, generics.ListAPIView):
+    pagination_class = KeysetPagination
     serializer_class = PostSerializer
+    row_serializer_class = PostRowSerializer
+    cursor_fields = feed.CURSOR_FIELDS
 
     def get_queryset(self):
-        # TODO: also include reposts
-        following_ids = self.request.user.following_set.values_list('target_id', flat=True)
-        return Post.objects.filter(
-            author_id__in=list(following_ids) + [self.request.user.id],
-            parent=None,  # swap out comments
-        ).order_by('-created_at')
+        return feed.events_queryset(feed.followed_author_ids(self.request.user.id))
+
+    def list(self, request, *args, **kwargs):
+        # Cursor pages come from the materialized timeline when it's warm and
+        # from SQL otherwise. Offset pages are always served from SQL.
+        paginator = self.paginator
+        author_ids = feed.followed_author_ids(request.user.id)
+        fields = self.get_row_serializer().value_fields() if self.row_serializer_class else None
+        if request.query_params.get('rank') == 'score':
+            return self._list_ranked(request, author_ids, fields)
+        if paginator.uses_offset(request):
+            events = paginator.paginate_queryset(feed.events_queryset(author_ids), request, view=self)
+            items = feed.hydrate(request.user.id, events, author_ids, fields=fields)
+        else:
+            page_size = paginator.get_page_size(request)
+            position = paginator.decode_cursor(request, paginator.get_cursor_fields(self))
+            items, next_position = feed.read_page(request.user.id, author_ids, page_size, position, fields)
+            paginator.set_page(request, page_size, next_position)
+
+        return paginator.get_paginated_response(self._serialize(items))
+
+    def _list_ranked(self, request, author_ids, fields=None):
+        # Ranked pages are slices of a bounded, briefly cached candidate list,
+        # so plain limit/offset paging over it is cheap.
+        paginator = LimitOffsetPagination()
+        post_ids = paginator.paginate_queryset(ranking.ranked_post_ids(request.user.id, author_ids), request, view=self)
+        posts = feed.load_posts(post_ids, fields)
+        items = [feed.FeedItem(posts[post_id]) for post_id in post_ids if post_id in posts]
+        return paginator.get_paginated_response(self._serialize(items))
+
+    def _serialize(self, items):
+        posts = [item.post for item in items]
+        if self.row_serializer_class is not None:
+            data = self.get_row_serializer().serialize(posts)
+        else:
+            data = self.get_serializer(posts, many=True).data
+        return [
+            {**post_data, 'repost': RepostInfoSerializer(item.repost).data if item.repost else None}
+            for item, post_data in zip(items, data)
+        ]
 
 
 class PostShareQRCodeView(generics.RetrieveAPIView):
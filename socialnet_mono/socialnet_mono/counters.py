@@ -0,0 +1,313 @@
+"""
+Write-buffered counter columns.
+
+Incrementing a counter column (`UPDATE ... SET likes_count = likes_count + 1`)
+takes the row lock, so every writer on a hot row queues behind the others.
+`BufferedCounters` takes the increments in Redis instead, as one hash per row
+(`HINCRBY`), and a periodic task flushes the accumulated deltas to the
+database in batches of single `UPDATE ... FROM (VALUES ...)` statements.
+
+Reads add the deltas still pending in Redis (`merge()`), so counts look
+real-time. Deltas taken by a flush that is still running are briefly not
+visible anywhere, and a worker dying mid-flush loses them; the reconciliation
+job recounts drifted rows from the source tables.
+
+If Redis is unavailable, increments are written straight to the database.
+
+`reconcile_ranges()` drives those reconciliation jobs: it walks a table in
+primary key ranges, hands each range to the app's `reconcile_range`
+callback (which recounts it with `count_by()` and fixes drifted rows with
+`correct()`), and saves the next range in the cache after every range, so an
+interrupted run (or the periodic task, which checks a few ranges per run)
+picks up where the last one stopped and wraps around at the end of the table.
+`ReconcileCommand` is the management command around it.
+"""
+import logging
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+# KEYS: dirty set, ARGV: hash key prefix, batch size.
+# Pops up to `batch size` dirty rows and takes their pending deltas atomically,
+# so increments that arrive meanwhile go into a fresh hash.
+_TAKE_SCRIPT = """
+local ids = redis.call('SPOP', KEYS[1], tonumber(ARGV[2]))
+local result = {}
+for _, id in ipairs(ids) do
+    local key = ARGV[1] .. id
+    table.insert(result, id)
+    table.insert(result, redis.call('HGETALL', key))
+    redis.call('DEL', key)
+end
+return result
+"""
+
+
+class BufferedCounters:
+    """
+    Buffered increments for the integer `fields` of `model`, keyed by primary
+    key. Subclasses can override `extra_assignments()` to update derived
+    columns in the same statement.
+    """
+
+    def __init__(self, model, fields, name: str | None = None):
+        self.model = model
+        self.fields = tuple(fields)
+        self.name = name or model._meta.db_table
+        self.dirty_key = f"counters:{self.name}:dirty"
+        self.key_prefix = f"counters:{self.name}:"
+
+    def _redis(self):
+        return get_redis_connection("default")
+
+    def key(self, pk) -> str:
+        return f"{self.key_prefix}{pk}"
+
+    def incr(self, pk, **deltas):
+        """Add `deltas` (field=amount) to the row `pk`."""
+        self.incr_many({pk: deltas})
+
+    def incr_many(self, deltas: dict):
+        """Add {pk: {field: amount}} to many rows in one round trip."""
+        deltas = {
+            pk: {field: delta for field, delta in row_deltas.items() if delta}
+            for pk, row_deltas in deltas.items()
+        }
+        deltas = {pk: row_deltas for pk, row_deltas in deltas.items() if row_deltas}
+        unknown = {field for row_deltas in deltas.values() for field in row_deltas} - set(self.fields)
+        if unknown:
+            raise ValueError(f"Unknown counter fields: {', '.join(sorted(unknown))}")
+        if not deltas:
+            return
+        try:
+            pipe = self._redis().pipeline(transaction=True)
+            for pk, row_deltas in deltas.items():
+                for field, delta in row_deltas.items():
+                    pipe.hincrby(self.key(pk), field, delta)
+            pipe.sadd(self.dirty_key, *deltas)
+            pipe.execute()
+        except RedisError as e:
+            logger.warning("Counter buffer unavailable, writing %s %s directly: %s", self.name, list(deltas), e)
+            self.apply(deltas)
+
+    def pending(self, pks) -> dict:
+        """{pk: {field: delta}} of the deltas not flushed yet."""
+        pks = list(dict.fromkeys(pks))
+        if not pks:
+            return {}
+        try:
+            pipe = self._redis().pipeline(transaction=False)
+            for pk in pks:
+                pipe.hgetall(self.key(pk))
+            results = pipe.execute()
+        except RedisError as e:
+            logger.warning("Could not read pending %s counters: %s", self.name, e)
+            return {}
+        return {
+            pk: {field.decode(): int(delta) for field, delta in deltas.items()}
+            for pk, deltas in zip(pks, results)
+            if deltas
+        }
+
+    def merge(self, objs):
+        """
+        Add pending deltas to model instances or `.values()` rows in place.
+        Columns that weren't loaded (deferred, or not selected) are skipped.
+        """
+        objs = list(objs)
+        if not objs:
+            return objs
+        pk_field = self.model._meta.pk.attname
+        rows = isinstance(objs[0], dict)
+        pending = self.pending(obj[pk_field] if rows else getattr(obj, pk_field) for obj in objs)
+        if not pending:
+            return objs
+
+        for obj in objs:
+            deltas = pending.get(obj[pk_field] if rows else getattr(obj, pk_field), {})
+            if rows:
+                loaded = obj.keys()
+            else:
+                loaded = set(self.fields) - obj.get_deferred_fields() if deltas else ()
+            for field, delta in deltas.items():
+                if field not in loaded:
+                    continue
+                if rows:
+                    obj[field] = max(obj[field] + delta, 0)
+                else:
+                    setattr(obj, field, max(getattr(obj, field) + delta, 0))
+        return objs
+
+    def extra_assignments(self, table: str, values: str) -> list[str]:
+        """Additional `column = expression` SQL to set alongside the counters."""
+        return []
+
+    def apply(self, deltas: dict):
+        """Write {pk: {field: delta}} to the database in one UPDATE."""
+        if not deltas:
+            return
+        opts = self.model._meta
+        qn = connection.ops.quote_name
+        table, pk_column = qn(opts.db_table), qn(opts.pk.column)
+        columns = [qn(opts.get_field(field).column) for field in self.fields]
+
+        def clamped(column):
+            total = f"t.{column} + v.{column}"
+            return f"CASE WHEN {total} < 0 THEN 0 ELSE {total} END"
+
+        assignments = [f"{column} = {clamped(column)}" for column in columns]
+        assignments += self.extra_assignments("t", "v")
+        row = "(" + ", ".join(["%s"] * (len(columns) + 1)) + ")"
+        params = []
+        for pk, row_deltas in deltas.items():
+            params.append(pk)
+            params += [row_deltas.get(field, 0) for field in self.fields]
+        # A CTE instead of `FROM (VALUES ...) AS v(...)`, which SQLite can't alias.
+        sql = (
+            f"WITH v ({pk_column}, {', '.join(columns)}) AS (VALUES {', '.join([row] * len(deltas))}) "
+            f"UPDATE {table} AS t SET {', '.join(assignments)} FROM v WHERE t.{pk_column} = v.{pk_column}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def _take(self, batch_size: int) -> tuple[int, dict]:
+        """Pop up to `batch_size` dirty rows: (rows popped, {pk: {field: delta}})."""
+        conn = self._redis()
+        script = conn.register_script(_TAKE_SCRIPT)
+        result = script(keys=[self.dirty_key], args=[self.key_prefix, batch_size])
+        deltas = {}
+        for i in range(0, len(result), 2):
+            fields = result[i + 1]
+            row_deltas = {fields[j].decode(): int(fields[j + 1]) for j in range(0, len(fields), 2)}
+            if any(row_deltas.values()):
+                deltas[self.model._meta.pk.to_python(result[i].decode())] = row_deltas
+        return len(result) // 2, deltas
+
+    def _restore(self, deltas: dict):
+        self.incr_many(deltas)
+
+    def flush(self, batch_size: int | None = None, max_batches: int | None = None) -> int:
+        """
+        Write pending deltas to the database, `batch_size` rows per UPDATE.
+        Deltas of a batch that fails to write are put back.
+
+        :return: Number of rows updated
+        """
+        batch_size = batch_size or settings.COUNTER_FLUSH_BATCH_SIZE
+        flushed = batches = 0
+        while max_batches is None or batches < max_batches:
+            popped, deltas = self._take(batch_size)
+            if not popped:
+                break
+            try:
+                with transaction.atomic():
+                    self.apply(deltas)
+            except Exception:
+                self._restore(deltas)
+                raise
+            flushed += len(deltas)
+            batches += 1
+        return flushed
+
+
+def count_by(queryset, column: str, start: int, end: int) -> dict[int, int]:
+    """{id: number of rows} of `queryset` with `start <= column < end`, in one `GROUP BY`."""
+    return dict(
+        queryset.filter(**{f'{column}__gte': start, f'{column}__lt': end})
+        .order_by()
+        .values_list(column)
+        .annotate(n=Count('pk'))
+    )
+
+
+def correct(objs, counts: dict[str, dict], pending: dict) -> list:
+    """
+    Set each counter of `objs` to its recount (`counts`: {field: {pk: count}})
+    less the deltas still `pending` in Redis, in place.
+
+    :return: The objects that changed
+    """
+    corrected = []
+    for obj in objs:
+        deltas = pending.get(obj.pk, {})
+        changed = False
+        for field, field_counts in counts.items():
+            expected = field_counts.get(obj.pk, 0) - deltas.get(field, 0)
+            if getattr(obj, field) != expected:
+                setattr(obj, field, max(expected, 0))
+                changed = True
+        if changed:
+            corrected.append(obj)
+    return corrected
+
+
+def reconcile_ranges(
+    model,
+    reconcile_range,
+    checkpoint_key: str,
+    start_id: int | None = None,
+    range_size: int | None = None,
+    max_ranges: int | None = None,
+) -> dict:
+    """
+    Call `reconcile_range(start, end)` (returning the number of rows it
+    corrected) on consecutive id ranges of `model`, starting at `start_id` or
+    the checkpoint saved under `checkpoint_key`, until the end of the table or
+    `max_ranges` ranges.
+
+    :return: Summary with the ranges checked, rows corrected and next start id
+    """
+    range_size = range_size or settings.COUNTER_RECONCILE_RANGE_SIZE
+    start = start_id if start_id is not None else cache.get(checkpoint_key, 0)
+    max_id = model.objects.aggregate(max_id=Max('pk'))['max_id'] or 0
+    if start > max_id:
+        start = 0
+
+    ranges = corrected = 0
+    while start <= max_id and (max_ranges is None or ranges < max_ranges):
+        end = start + range_size
+        fixed = reconcile_range(start, end)
+        if fixed:
+            logger.info("Corrected counters of %s %s with ids in [%s, %s)",
+                        fixed, model._meta.verbose_name_plural, start, end)
+        corrected += fixed
+        ranges += 1
+        start = end
+        cache.set(checkpoint_key, start if start <= max_id else 0, timeout=None)
+
+    return {'ranges': ranges, 'corrected': corrected, 'next_start': start if start <= max_id else None}
+
+
+class ReconcileCommand(BaseCommand):
+    """
+    Base of the `reconcile_*_counters` commands. Subclasses set `noun` (what
+    the rows are called in the output) and `reconcile`, a staticmethod taking
+    the `reconcile_ranges()` options.
+    """
+    noun = "rows"
+    reconcile = None
+
+    def add_arguments(self, parser):
+        parser.add_argument("--start-id", type=int, default=None, help="Start here instead of the saved checkpoint.")
+        parser.add_argument("--from-start", action="store_true", help="Ignore the checkpoint and start at the first row.")
+        parser.add_argument("--range-size", type=int, default=None, help="Ids per GROUP BY range.")
+        parser.add_argument("--max-ranges", type=int, default=None, help="Stop after this many ranges.")
+
+    def handle(self, *args, **options):
+        start_id = 0 if options["from_start"] else options["start_id"]
+        result = self.reconcile(
+            start_id=start_id,
+            range_size=options["range_size"],
+            max_ranges=options["max_ranges"],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {result['ranges']} ranges, corrected {result['corrected']} {self.noun}."
+            + (f" Next run starts at id {result['next_start']}." if result["next_start"] is not None else "")
+        ))
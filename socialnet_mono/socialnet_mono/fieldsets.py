@@ -0,0 +1,70 @@
+"""
+Sparse fieldsets: `?fields=id,content` returns only the listed fields and
+`?omit=comments,tags` everything but the listed ones.
+
+Unselected fields are dropped from the serializer before it runs, so their
+`SerializerMethodField`s are never called, and views load only the columns
+the selected fields read (`only_columns()`).
+"""
+from rest_framework import serializers
+
+FIELDS_PARAM = 'fields'
+OMIT_PARAM = 'omit'
+
+
+def _names(value: str | None) -> set[str]:
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def requested_fieldset(request) -> tuple[set[str] | None, set[str]]:
+    """(names to include, or None for all of them; names to omit)"""
+    if request is None:
+        return None, set()
+    params = getattr(request, 'query_params', request.GET)
+    include = _names(params.get(FIELDS_PARAM))
+    return include or None, _names(params.get(OMIT_PARAM))
+
+
+def is_selected(name: str, fieldset: tuple[set[str] | None, set[str]]) -> bool:
+    include, omit = fieldset
+    return (include is None or name in include) and name not in omit
+
+
+class SparseFieldsetMixin:
+    """
+    ModelSerializer mixin that honours `?fields=` and `?omit=` on the request
+    in its context. Unknown names are ignored.
+
+    `property_columns` maps fields backed by a model property to the column
+    it reads, and `method_field_columns` lists the columns each method field
+    needs besides the primary key.
+    """
+    property_columns: dict[str, str] = {}
+    method_field_columns: dict[str, list[str]] = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = requested_fieldset(self.context.get('request'))
+        if fieldset == (None, set()):
+            return fields
+        return {name: field for name, field in fields.items() if is_selected(name, fieldset)}
+
+    @classmethod
+    def field_columns(cls, name: str, field) -> list[str]:
+        """The model columns (or `relation__column` lookups) a field reads."""
+        if isinstance(field, serializers.SerializerMethodField):
+            return cls.method_field_columns.get(name, [])
+        source = field.source
+        if '.' in source:
+            return [source.replace('.', '__')]
+        return [cls.property_columns.get(source, source)]
+
+    @classmethod
+    def only_columns(cls, request) -> list[str]:
+        """Columns to pass to `QuerySet.only()` for the fields the request selects."""
+        serializer = cls(context={'request': request})
+        columns = [cls.Meta.model._meta.pk.name]
+        for name, field in serializer.fields.items():
+            if not field.write_only:
+                columns += cls.field_columns(name, field)
+        return list(dict.fromkeys(columns))
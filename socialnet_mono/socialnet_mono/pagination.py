@@ -0,0 +1,194 @@
+import base64
+import json
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, LimitOffsetPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def keyset_filter(fields, position):
+    """Filter for rows that sort strictly after `position` in descending order."""
+    # (a, b) < (x, y)  <=>  a < x OR (a = x AND b < y)
+    condition = Q()
+    for i, field in enumerate(fields):
+        equal = {fields[j]: position[j] for j in range(i)}
+        condition |= Q(**equal, **{f'{field}__lt': position[i]})
+    return condition
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset ("seek") pagination with opaque cursors.
+
+    Pages are ordered newest first on `cursor_fields` (by default
+    `(created_at, id)`) and each page starts strictly after the position
+    encoded in the cursor, so the database can seek straight to it through an
+    index instead of scanning and discarding `offset` rows. No `COUNT(*)` is
+    run, the response only carries a link to the next page.
+
+    Views can key on other columns by setting `cursor_fields`. Fields named
+    `*_at` hold datetimes and all others integer ids; a cursor that doesn't
+    hold one value of the right type per field is rejected with a 404. Clients can opt
+    back into numbered pages with `?pagination=offset` (or by sending an
+    `offset`), which is delegated to `LimitOffsetPagination`.
+    """
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    mode_query_param = 'pagination'
+    cursor_fields = ('created_at', 'id')
+    offset_pagination_class = LimitOffsetPagination
+    invalid_cursor_message = 'Invalid cursor'
+
+    def __init__(self):
+        self.offset_paginator = None
+        self.next_position = None
+
+    def uses_offset(self, request):
+        return (
+            request.query_params.get(self.mode_query_param) == 'offset'
+            or self.offset_pagination_class.offset_query_param in request.query_params
+        )
+
+    def get_cursor_fields(self, view):
+        return getattr(view, 'cursor_fields', self.cursor_fields)
+
+    @staticmethod
+    def cursor_field_type(field):
+        return datetime if field.endswith('_at') else int
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if page_size <= 0:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        fields = self.get_cursor_fields(view)
+        queryset = queryset.order_by(*[f'-{field}' for field in fields])
+        if self.uses_offset(request):
+            self.offset_paginator = self.offset_pagination_class()
+            return self.offset_paginator.paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        position = self.decode_cursor(request, fields)
+        if position is not None:
+            queryset = queryset.filter(self.get_keyset_filter(fields, position))
+
+        results = list(queryset[:self.page_size + 1])
+        page = results[:self.page_size]
+        self.next_position = None
+        if len(results) > self.page_size:
+            last = page[-1]
+            if isinstance(last, dict):  # .values() rows
+                self.next_position = tuple(last[field] for field in fields)
+            else:
+                self.next_position = tuple(getattr(last, field) for field in fields)
+        return page
+
+    def set_page(self, request, page_size, next_position):
+        """Record a page that the view assembled itself (e.g. from a cache)."""
+        self.request = request
+        self.page_size = page_size
+        self.next_position = next_position
+
+    def get_keyset_filter(self, fields, position):
+        return keyset_filter(fields, position)
+
+    def decode_cursor(self, request, fields=None):
+        """
+        The position in the request's cursor, or None without a cursor. With
+        `fields`, the cursor must hold one value of each field's type.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if not isinstance(values, list) or not values:
+                raise ValueError(values)
+            if fields is None:
+                position = tuple(self._decode_value(value) for value in values)
+            elif len(values) != len(fields):
+                raise ValueError(values)
+            else:
+                position = tuple(
+                    self._decode_value(value, self.cursor_field_type(field)) for value, field in zip(values, fields)
+                )
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        values = [value.isoformat() if isinstance(value, datetime) else value for value in position]
+        return base64.urlsafe_b64encode(json.dumps(values).encode('ascii')).decode('ascii')
+
+    @staticmethod
+    def _decode_value(value, expected=None):
+        if isinstance(value, str) and expected in (None, datetime):
+            parsed = parse_datetime(value)
+            if parsed is None:
+                raise ValueError(value)
+            return parsed
+        if isinstance(value, bool) or not isinstance(value, int) or expected not in (None, int):
+            raise ValueError(value)
+        return value
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        if self.offset_paginator is not None:
+            return self.offset_paginator.get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.mode_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Set to "offset" to use limit/offset pagination instead.',
+                'schema': {'type': 'string', 'enum': ['offset']},
+            },
+        ]
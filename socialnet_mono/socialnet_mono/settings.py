@@ -77,6 +77,55 @@ CELERY_ACCEPT_CONTENT = ["json"]
 CELERY_TASK_SERIALIZER = "json"
 CELERY_RESULT_SERIALIZER = "json"
 CELERY_TIMEZONE = "UTC"
+CELERY_TASK_DEFAULT_QUEUE = "celery"
+# FaaS calls (see faas/tasks.py): fast text analysis and slow media processing get their own workers
+FAAS_TEXT_QUEUE = "faas_text"
+FAAS_MEDIA_QUEUE = "faas_media"
+FAAS_ASYNC_MAX_CONNECTIONS = 20  # per event loop, shared by concurrent enrichment calls
+# Send a post's text once to the composite enrich-post function instead of to each text function
+POST_ENRICHMENT_COMPOSITE = os.environ.get("POST_ENRICHMENT_COMPOSITE", "1") == "1"
+POST_ENRICHMENT_DEADLINE = 30  # seconds a post's enrichment calls may take together (see posts/enrichment.py)
+
+# FaaS callback queue (see faas/ingest.py)
+FAAS_CALLBACK_STREAM = "faas:callbacks"
+FAAS_CALLBACK_GROUP = "faas-callbacks"
+FAAS_CALLBACK_STREAM_MAXLEN = 100000  # safety bound on the unprocessed backlog
+FAAS_CALLBACK_BATCH_SIZE = 500
+FAAS_CALLBACK_WINDOW = 0.5  # seconds callbacks are collected for before a batch is applied
+FAAS_CALLBACK_CLAIM_IDLE = 60  # seconds before another worker takes over unacknowledged callbacks
+CELERY_BEAT_SCHEDULE = {
+    "flush-post-counters": {
+        "task": "posts.tasks.flush_post_counters",
+        "schedule": float(os.environ.get("COUNTER_FLUSH_INTERVAL", "5")),  # seconds
+        "options": {"expires": 30},
+    },
+    "reconcile-post-counters": {
+        "task": "posts.tasks.reconcile_post_counters",
+        "schedule": 60.0 * 10,
+        "options": {"expires": 60 * 10},
+    },
+    "flush-user-counters": {
+        "task": "users.tasks.flush_user_counters",
+        "schedule": float(os.environ.get("COUNTER_FLUSH_INTERVAL", "5")),  # seconds
+        "options": {"expires": 30},
+    },
+    "reconcile-user-counters": {
+        "task": "users.tasks.reconcile_user_counters",
+        "schedule": 60.0 * 10,
+        "options": {"expires": 60 * 10},
+    },
+    "rebuild-follow-suggestions": {
+        "task": "follows.tasks.rebuild_follow_suggestions",
+        "schedule": 60.0 * 60 * 6,
+        "options": {"expires": 60 * 60 * 6},
+    },
+}
+
+# Buffered counters (see socialnet_mono/counters.py): rows per flush UPDATE
+COUNTER_FLUSH_BATCH_SIZE = 500
+# Counter reconciliation (see posts/ and users/reconciliation.py): ids per GROUP BY range, ranges per periodic run
+COUNTER_RECONCILE_RANGE_SIZE = 10000
+COUNTER_RECONCILE_RANGES_PER_RUN = 20
 
 # Logging
 LOGGING = {
@@ -138,7 +187,7 @@ STORAGES = {
 # Rest Framework (JWT)
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "users.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
@@ -157,6 +206,11 @@ SIMPLE_JWT = {
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+# Slim user records for JWT authentication (see users/authentication.py)
+AUTH_USER_CACHE_TTL = 300  # seconds in Redis
+AUTH_USER_LOCAL_CACHE_TTL = 5  # seconds in each process, how long other processes may see a stale user
+AUTH_USER_LOCAL_CACHE_SIZE = 10000
+
 # Internationalization, Timezone
 LANGUAGE_CODE = "en-us"
 # The correct IANA identifier for Tehran's timezone is "Asia/Tehran".
@@ -214,3 +268,52 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 FAAS_URL = os.environ.get("FAAS_URL", "http://192.168.1.11:8080")
 FAAS_CALLBACK_URL = os.environ.get("FAAS_CALLBACK_URL", "http://192.168.1.7/api/faas/callback/")
+
+# FaaS HTTP transport (see faas/transport.py)
+FAAS_TIMEOUTS = {  # (connect, read) seconds per function
+    "default": (3.05, 30),
+    "activity-report": (3.05, 60),
+    "enrich-post": (3.05, 60),
+    "video-thumbnail": (3.05, 60),
+    "my-text-to-speech": (3.05, 60),
+}
+FAAS_MAX_RETRIES = 2
+FAAS_RETRY_BACKOFF = 0.2  # seconds, doubled per retry, with full jitter
+FAAS_RETRY_BACKOFF_MAX = 2.0
+FAAS_POOL_CONNECTIONS = 4  # gateway hosts kept pools for
+FAAS_POOL_MAXSIZE = int(os.environ.get("FAAS_POOL_MAXSIZE", "8"))  # keep-alive connections per host, >= worker threads
+FAAS_POOL_BLOCK = False  # beyond maxsize, open extra connections instead of waiting
+
+# Home timelines (materialized per-user feeds in Redis, see posts/timeline.py)
+TIMELINE_MAX_LENGTH = int(os.environ.get("TIMELINE_MAX_LENGTH", "800"))
+TIMELINE_TTL = int(os.environ.get("TIMELINE_TTL", str(60 * 60 * 24 * 7)))  # seconds since last read
+TIMELINE_FANOUT_BATCH_SIZE = 1000
+# Authors above this many followers are not fanned out, their posts are merged in at read time
+TIMELINE_FANOUT_FOLLOWER_THRESHOLD = int(os.environ.get("TIMELINE_FANOUT_FOLLOWER_THRESHOLD", "10000"))
+
+# Following ids cached in Redis (see follows/cache.py)
+FOLLOW_CACHE_TTL = int(os.environ.get("FOLLOW_CACHE_TTL", str(60 * 60 * 24)))
+
+# Who-to-follow suggestions (see follows/suggestions.py), rebuilt every 6 hours
+FOLLOW_SUGGESTIONS_SIZE = 50
+FOLLOW_SUGGESTIONS_MAX_FOLLOWING = 1000  # followings sampled per user when scoring
+FOLLOW_SUGGESTIONS_TTL = 60 * 60 * 24 * 2
+
+# Memory-mapped follow graph snapshots for batch jobs (see follows/graph.py), shared by all workers on a host
+FOLLOW_GRAPH_SNAPSHOT_DIR = os.environ.get("FOLLOW_GRAPH_SNAPSHOT_DIR", os.path.join(BASE_DIR, "var", "follow-graph"))
+
+# Ranked feed (?rank=score, see posts/ranking.py)
+FEED_RANK_WEIGHTS = {"likes_count": 1, "comments_count": 2, "reposts_count": 3, "shares_count": 3}  # integers
+FEED_RANK_DECAY_SECONDS = 45000  # a post this much newer ranks like one with e times the engagement
+FEED_RANK_WINDOW = 500  # newest candidate posts considered per ranked read
+FEED_RANK_AFFINITY_WEIGHT = 1.0
+FEED_RANK_AFFINITY_DAYS = 30
+FEED_RANK_CACHE_TTL = 60
+
+# Comment previews embedded in serialized posts (see posts/comments.py)
+COMMENT_PREVIEW_SIZE = 3
+COMMENT_PREVIEW_MAX_DEPTH = 2  # levels of replies previewed below a post
+
+# Per-user liked/bookmarked/reposted post id sets in Redis (see posts/memberships.py)
+ENGAGEMENT_SET_MAX_SIZE = 50000  # users with more rows of a kind are read from the database
+ENGAGEMENT_SET_TTL = 60 * 60 * 24
@@ -0,0 +1,150 @@
+"""
+JWT authentication without a user query per request.
+
+`CachedJWTAuthentication` resolves the token's user from a slim record (the
+columns authentication and most views read) cached in two tiers: a small
+in-process LRU for AUTH_USER_LOCAL_CACHE_TTL seconds, then the shared Redis
+cache for AUTH_USER_CACHE_TTL seconds. Only a miss in both reads the users
+table. `request.user` is a `User` with just those columns loaded; any other
+field is loaded from the database when first accessed.
+
+Saving or deleting a user (profile updates, deactivation, admin edits)
+invalidates the record in Redis and in the current process (see
+users/signals.py). Other processes drop their local copy within
+AUTH_USER_LOCAL_CACHE_TTL seconds. Updates that bypass `save()`, such as
+`QuerySet.update()`, must call `invalidate_user()` themselves.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from django_redis.exceptions import ConnectionInterrupted
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from users.models import User
+
+logger = logging.getLogger(__name__)
+
+SLIM_FIELDS = ('id', 'username', 'email', 'is_active', 'is_staff', 'is_superuser')
+# Stored with the record when tokens are revoked on password change, so the password hash itself isn't cached.
+_REVOKE_HASH = 'password_hash'
+
+
+class LocalCache:
+    """A thread-safe LRU whose entries also expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+local_cache = LocalCache(settings.AUTH_USER_LOCAL_CACHE_SIZE, settings.AUTH_USER_LOCAL_CACHE_TTL)
+
+
+def cache_key(user_id: int) -> str:
+    return f"auth:user:{user_id}"
+
+
+def _load_record(user_id: int) -> dict | None:
+    fields = [*SLIM_FIELDS, 'password'] if api_settings.CHECK_REVOKE_TOKEN else SLIM_FIELDS
+    user = User.objects.filter(id=user_id).only(*fields).first()
+    if user is None:
+        return None
+    record = {field: getattr(user, field) for field in SLIM_FIELDS}
+    if api_settings.CHECK_REVOKE_TOKEN:
+        record[_REVOKE_HASH] = get_md5_hash_password(user.password)
+    return record
+
+
+def get_user_record(user_id: int) -> dict | None:
+    """The slim record of a user, from the first cache tier that has it."""
+    record = local_cache.get(user_id)
+    if record is not None:
+        return record
+    try:
+        record = cache.get(cache_key(user_id))
+    except ConnectionInterrupted as e:
+        logger.warning("User cache unavailable for user %s: %s", user_id, e)
+        record = None
+    if record is None:
+        record = _load_record(user_id)
+        if record is None:
+            return None
+        try:
+            cache.set(cache_key(user_id), record, settings.AUTH_USER_CACHE_TTL)
+        except ConnectionInterrupted as e:
+            logger.warning("Could not cache user %s: %s", user_id, e)
+    local_cache.set(user_id, record)
+    return record
+
+
+def invalidate_user(user_id: int):
+    local_cache.delete(user_id)
+    try:
+        cache.delete(cache_key(user_id))
+    except ConnectionInterrupted as e:
+        logger.warning("Could not invalidate cached user %s: %s", user_id, e)
+
+
+def user_from_record(record: dict) -> User:
+    """A `User` with only the slim columns loaded, the rest are deferred."""
+    return User.from_db(DEFAULT_DB_ALIAS, list(SLIM_FIELDS), [record[field] for field in SLIM_FIELDS])
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """`JWTAuthentication` reading the user from the user cache instead of the database."""
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_FIELD != 'id':
+            return super().get_user(validated_token)
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidToken(_("Token contained no recognizable user identification")) from e
+
+        record = get_user_record(user_id)
+        if record is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if api_settings.CHECK_USER_IS_ACTIVE and not record['is_active']:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN:
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != record.get(_REVOKE_HASH):
+                raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return user_from_record(record)
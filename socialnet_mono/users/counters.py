@@ -0,0 +1,13 @@
+"""
+Buffered profile counters of users (see socialnet_mono/counters.py).
+
+Follows, unfollows and top-level posts are counted in Redis from the
+`Follow` and `Post` signals and flushed to `User` by the
+`users.tasks.flush_user_counters` periodic task.
+"""
+from socialnet_mono.counters import BufferedCounters
+from users.models import User
+
+COUNTER_FIELDS = ('followers_count', 'following_count', 'posts_count')
+
+user_counters = BufferedCounters(User, COUNTER_FIELDS, name="user")
@@ -0,0 +1,8 @@
+from users import reconciliation
+from socialnet_mono.counters import ReconcileCommand
+
+
+class Command(ReconcileCommand):
+    help = "Recount followers, followings and posts of users and fix the stored counters, in id ranges."
+    noun = "users"
+    reconcile = staticmethod(reconciliation.reconcile)
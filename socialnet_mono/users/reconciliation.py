@@ -0,0 +1,41 @@
+"""
+Recount the profile counters of users from the rows they count.
+
+Works like posts/reconciliation.py: the users table is walked in primary
+key ranges, each counter is recounted with one `GROUP BY` query per range,
+and rows whose stored counter (plus any delta still buffered in Redis)
+disagrees are corrected with `bulk_update`.
+"""
+from follows.models import Follow
+from posts.models import Post
+from socialnet_mono.counters import correct, count_by, reconcile_ranges
+from users.counters import user_counters
+from users.models import User
+
+CHECKPOINT_KEY = "counters:user:reconcile-checkpoint"
+
+# counter field -> (rows counted, column pointing at the user)
+SOURCES = {
+    'followers_count': (Follow.objects.all(), 'target_id'),
+    'following_count': (Follow.objects.all(), 'user_id'),
+    'posts_count': (Post.objects.filter(parent=None), 'author_id'),
+}
+
+
+def reconcile_range(start: int, end: int) -> int:
+    """
+    Correct the counters of users with `start <= id < end`.
+
+    :return: Number of users corrected
+    """
+    counts = {field: count_by(queryset, column, start, end) for field, (queryset, column) in SOURCES.items()}
+    users = list(User.objects.filter(id__gte=start, id__lt=end).order_by('id').only('id', *SOURCES))
+    corrected = correct(users, counts, user_counters.pending(user.id for user in users))
+    if corrected:
+        User.objects.bulk_update(corrected, list(SOURCES), batch_size=500)
+    return len(corrected)
+
+
+def reconcile(**options) -> dict:
+    """Reconcile ranges of users, see `reconcile_ranges()` for the options."""
+    return reconcile_ranges(User, reconcile_range, CHECKPOINT_KEY, **options)
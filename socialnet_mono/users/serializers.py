@@ -1,11 +1,13 @@
 from rest_framework import serializers
+from socialnet_mono.fieldsets import SparseFieldsetMixin
 from .models import User
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
-        fields = ['id', 'username', 'email', 'bio', 'avatar']
+        fields = ['id', 'username', 'email', 'bio', 'avatar', 'followers_count', 'following_count', 'posts_count']
+        read_only_fields = ['followers_count', 'following_count', 'posts_count']
 
 
 class UserProfileUpdateSerializer(serializers.ModelSerializer):
@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.authentication import invalidate_user
+from users.models import User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    # Now for this process, and again after commit in case a request re-cached the old row meanwhile.
+    invalidate_user(instance.pk)
+    transaction.on_commit(lambda: invalidate_user(instance.pk), robust=True)
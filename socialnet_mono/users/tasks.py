@@ -0,0 +1,17 @@
+from celery import shared_task
+from django.conf import settings
+
+from users import reconciliation
+from users.counters import user_counters
+
+
+@shared_task(ignore_result=True)
+def flush_user_counters():
+    """Write the profile counter deltas buffered in Redis to the users table."""
+    return user_counters.flush()
+
+
+@shared_task(ignore_result=True)
+def reconcile_user_counters():
+    """Recount a few id ranges of user counters, continuing from the last run."""
+    return reconciliation.reconcile(max_ranges=settings.COUNTER_RECONCILE_RANGES_PER_RUN)
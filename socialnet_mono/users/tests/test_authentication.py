@@ -0,0 +1,58 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.authentication import local_cache
+from users.models import User
+
+
+@pytest.fixture
+def client():
+    User.objects.create_user(username="ali", password="pass1234", email="ali@x.com")
+    client = APIClient()
+    resp = client.post(reverse("token_obtain_pair"), {"username": "ali", "password": "pass1234"}, format="json")
+    client.credentials(HTTP_AUTHORIZATION=f"Bearer {resp.data['access']}")
+    return client
+
+
+def _user_queries(client, url):
+    with CaptureQueriesContext(connection) as ctx:
+        resp = client.get(url)
+    return resp, [q for q in ctx.captured_queries if 'FROM "users_user"' in q["sql"]]
+
+
+@pytest.mark.django_db
+def test_authentication_reads_the_user_cache(client):
+    _, queries = _user_queries(client, reverse("my_posts"))
+    assert len(queries) == 1
+    resp, queries = _user_queries(client, reverse("my_posts"))
+    assert resp.status_code == 200
+    assert queries == []
+
+    # Redis tier, after this process's copy expired.
+    local_cache.clear()
+    _, queries = _user_queries(client, reverse("my_posts"))
+    assert queries == []
+
+
+@pytest.mark.django_db
+def test_saves_invalidate_the_cached_user(client):
+    client.get(reverse("my_posts"))
+    resp = client.patch(reverse("profile_edit"), {"bio": "new bio"}, format="json")
+    assert resp.status_code == 200
+    _, queries = _user_queries(client, reverse("my_posts"))
+    assert len(queries) == 1
+
+    user = User.objects.get(username="ali")
+    user.is_active = False
+    user.save()
+    resp = client.get(reverse("my_posts"))
+    assert resp.status_code == 401
+
+
+@pytest.mark.django_db
+def test_profile_reads_full_user(client):
+    client.patch(reverse("profile_edit"), {"bio": "hello"}, format="json")
+    resp = client.get(reverse("profile"))
+    assert (resp.data["username"], resp.data["bio"]) == ("ali", "hello")
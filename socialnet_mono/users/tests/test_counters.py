@@ -0,0 +1,59 @@
+import pytest
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework.test import APIClient
+from users.models import User
+from users.counters import user_counters
+from follows.models import Follow
+from posts.models import Post
+
+
+@pytest.fixture
+def users():
+    ali = User.objects.create_user(username="ali", password="pass", email="ali@x.com")
+    hassan = User.objects.create_user(username="hassan", password="pass", email="hassan@x.com")
+    return ali, hassan
+
+
+@pytest.mark.django_db
+def test_follows_and_posts_are_counted_and_flushed(users, django_capture_on_commit_callbacks):
+    ali, hassan = users
+    client = APIClient()
+    client.force_authenticate(ali)
+    with django_capture_on_commit_callbacks(execute=True):
+        client.post(reverse("follow_user", args=[hassan.id]))
+        post = Post.objects.create(author=ali, content="post")
+        Post.objects.create(author=ali, parent=post, content="comment")
+
+    # Pending deltas show up before they are flushed.
+    resp = client.get(reverse("profile"))
+    assert (resp.data["following_count"], resp.data["followers_count"], resp.data["posts_count"]) == (1, 0, 1)
+    resp = client.get(reverse("followers_list", args=[hassan.id]))
+    assert resp.data["results"][0]["following_count"] == 1
+
+    assert user_counters.flush() == 2
+    ali.refresh_from_db()
+    hassan.refresh_from_db()
+    assert (ali.following_count, ali.posts_count, hassan.followers_count) == (1, 1, 1)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        client.delete(reverse("unfollow_user", args=[hassan.id]))
+        post.delete()
+    user_counters.flush()
+    ali.refresh_from_db()
+    hassan.refresh_from_db()
+    assert (ali.following_count, ali.posts_count, hassan.followers_count) == (0, 0, 0)
+
+
+@pytest.mark.django_db
+def test_reconcile_user_counters_repairs_drift(users):
+    ali, hassan = users
+    Follow.objects.create(user=ali, target=hassan)
+    Post.objects.create(author=hassan, content="post")
+    User.objects.filter(id=ali.id).update(followers_count=7)
+
+    call_command("reconcile_user_counters", "--from-start", "--range-size", "1")
+    ali.refresh_from_db()
+    hassan.refresh_from_db()
+    assert (ali.followers_count, ali.following_count, ali.posts_count) == (0, 1, 0)
+    assert (hassan.followers_count, hassan.following_count, hassan.posts_count) == (1, 0, 1)
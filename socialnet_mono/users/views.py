@@ -4,6 +4,7 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from faas.interface import FaasService
 from .serializers import UserSerializer, UserProfileUpdateSerializer, UserRegistrationSerializer
+from .counters import user_counters
 from .models import User
 
 
@@ -13,7 +14,8 @@ class ProfileView(generics.RetrieveAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        # request.user only has the columns authentication caches.
+        return user_counters.merge([User.objects.get(pk=self.request.user.pk)])[0]
 
 
 class ProfileUpdateView(generics.UpdateAPIView):
@@ -22,7 +24,7 @@ class ProfileUpdateView(generics.UpdateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_object(self):
-        return self.request.user
+        return User.objects.get(pk=self.request.user.pk)
 
 
 class UserRegistrationView(generics.CreateAPIView):
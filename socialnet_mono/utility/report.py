@@ -2,6 +2,7 @@ from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import timedelta
 from posts.models import Post, Like, Repost
+from follows import cache as follow_cache
 from follows.models import Follow
 
 User = get_user_model()
@@ -30,7 +31,7 @@ def gather_user_analytics_data(user_id, days_back=30, previous_days_back=60):
     previous_period_end = current_time - timedelta(days=days_back)
 
     # Get follower counts
-    current_followers = Follow.objects.filter(target=user).count()
+    current_followers = follow_cache.get_follower_count(user.id)
     previous_followers = Follow.objects.filter(
         target=user,
         created_at__lt=previous_period_end